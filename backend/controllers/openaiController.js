@@ -344,7 +344,7 @@ const grade = async (rubric, essay, gradingPrompt, teacherId) => {
   // Fetch old graded essays for the specific teacher
   const oldEssays = await fetchOldGradedEssays(teacherId);
   console.log("oldessays", oldEssays);
-  let oldEssaysText = "";
+  const oldEssayTexts = [];
 
   // Extract text from each old graded essay
   for (let oldEssay of oldEssays) {
@@ -354,18 +354,20 @@ const grade = async (rubric, essay, gradingPrompt, teacherId) => {
     }
 
     if (extractedText) {
-      oldEssaysText += extractedText + "\n\n"; // Concatenate texts
+      oldEssayTexts.push(extractedText);
     }
   }
 
-  console.log(oldEssaysText);
+  console.log("Old essays extracted:", oldEssayTexts.length);
 
-  // Prepare the payload for the Python server
+  // Prepare the payload for the Python server. Sending the essays separately
+  // along with the teacher id lets it reuse the teacher's stored exemplar index.
   const payload = {
     rubric: rubricString,
     essay: essay,
     prompt: gradingInstructions,
-    old_essays: oldEssaysText,
+    old_essays: oldEssayTexts,
+    teacher_id: teacherId,
   };
 
   // Send the grading request to the Python server
@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+CATEGORY_PREFIXES = ('RL', 'RI', 'RF', 'W', 'SL', 'L')
+GRADES = ('K', '1', '2', '3', '4', '5', '6', '7', '8', '9-10', '11-12')
+
+
+def synthetic_standards(count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    (standard_id, description) pairs shaped like the CDE ELA standards.
+    """
+    rng = random.Random(seed)
+    words = ("determine", "analyze", "cite", "text", "evidence", "theme", "central", "idea", "explain",
+             "describe", "compare", "author", "point", "view", "support", "claims", "reasons", "details",
+             "summary", "structure", "meaning", "words", "phrases", "grade", "level", "topic")
+    standards = []
+    for i in range(count):
+        prefix = CATEGORY_PREFIXES[i % len(CATEGORY_PREFIXES)]
+        grade = GRADES[(i // len(CATEGORY_PREFIXES)) % len(GRADES)]
+        number = i // (len(CATEGORY_PREFIXES) * len(GRADES)) + 1
+        description = " ".join(rng.choice(words) for _ in range(rng.randint(12, 40))).capitalize() + "."
+        standards.append((f"{prefix}.{grade}.{number}", description))
+    return standards
+
+
+def render_page(standards: List[Tuple[str, str]], page: int, total_pages: int) -> str:
+    sections = []
+    for standard_id, description in standards:
+        sections.append(
+            '<div style="padding-left:3px; padding-right:3px;">'
+            f'<h4><a href="/cacs/standard?id={standard_id}">{standard_id}</a></h4>'
+            '<div class="row"><div class="col-md-6"><b>English Language Arts</b></div>'
+            '<div class="col-md-6"><b></b></div></div>'
+            f'<div style="white-space: pre-wrap;">{description}</div>'
+            '</div>'
+        )
+    return (
+        '<html><head><title>Content Standards</title></head><body>'
+        '<div class="navbar">' + '<a href="#">Menu</a>' * 50 + '</div>'
+        f'<div class="row"><div class="col-md-4 text-right">Page {page + 1} of {total_pages}</div></div>'
+        + "".join(sections) +
+        '<footer>' + '<p>California Department of Education</p>' * 20 + '</footer>'
+        '</body></html>'
+    )
+
+
+def fake_criteria(standard_id: str) -> List[Dict]:
+    levels = ("Exceeds", "Meets", "Approaching", "Partially meets", "Does not meet")
+    return [
+        {"point": 5 - i, "description": f"{level} {standard_id}: generated indicator {5 - i}"}
+        for i, level in enumerate(levels)
+    ]
+
+
+def create_server(port: int = 0, standards: int = 1200, latency_ms: float = 0.0, fail_rate: float = 0.0,
+                  fail_status: int = 503, seed: int = 0, completion_latency_ms: float = 0.0,
+                  completion_drop_rate: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Local stand-in for the CDE standards search (GET /cacs/ela?page=&perpage=)
+    and for the OpenAI chat completions used to write rubric criteria
+    (POST /v1/chat/completions).
+
+    Pages are deterministic for a given seed. Every request waits latency_ms,
+    and a fail_rate share of them answers with fail_status, so the scraper
+    can be exercised against slow or flaky servers offline. Pages carry an
+    ETag and Last-Modified and answer matching conditional requests with
+    304. GET /stats reports request counts, the peak number in flight and
+    the request rate.
+
+    Completions answer every "Standard ID: ..." in the prompt with a JSON
+    object of fake criteria after completion_latency_ms, leaving out a
+    completion_drop_rate share of the standards when there are several.
+
+    Args:
+        port (int): Port to listen on, 0 for any free port
+        standards (int): Total standards across all pages
+        latency_ms (float): Delay added to each request
+        fail_rate (float): Probability in [0, 1] that a request fails
+        fail_status (int): HTTP status returned for injected failures
+        seed (int): Seed for the content and the failure injection
+        completion_latency_ms (float): Delay added to each completion
+        completion_drop_rate (float): Share of standards left out of batched answers
+    """
+    catalog = synthetic_standards(standards, seed)
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    stats: Dict = {"requests": 0, "failures": 0, "not_modified": 0, "in_flight": 0, "peak_in_flight": 0,
+                   "completions": 0, "completions_in_flight": 0, "peak_completions_in_flight": 0,
+                   "started": []}
+    last_modified = "Mon, 06 Jan 2025 00:00:00 GMT"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8",
+                 headers: Dict[str, str] = None):
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/stats":
+                with lock:
+                    started = stats["started"]
+                    span = started[-1] - started[0] if len(started) > 1 else 0.0
+                    body = {key: value for key, value in stats.items() if key != "started"}
+                    body["requests_per_second"] = round((len(started) - 1) / span, 3) if span else 0.0
+                self.send(200, json.dumps(body), "application/json")
+                return
+            if url.path != "/cacs/ela":
+                self.send(404, "Not found")
+                return
+
+            with lock:
+                stats["requests"] += 1
+                stats["in_flight"] += 1
+                stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+                stats["started"].append(time.monotonic())
+                failed = rng.random() < fail_rate
+                if failed:
+                    stats["failures"] += 1
+            try:
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                if failed:
+                    self.send(fail_status, "Injected failure",
+                              headers={"Retry-After": "0"} if fail_status in (429, 503) else None)
+                    return
+                query = parse_qs(url.query)
+                # Like the real site, the last page/perpage parameters win.
+                page = int(query.get("page", ["0"])[-1])
+                per_page = int(query.get("perpage", ["100"])[-1])
+                total_pages = max(1, -(-len(catalog) // per_page))
+                body = render_page(catalog[page * per_page:(page + 1) * per_page], page, total_pages)
+                etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:16] + '"'
+                if (self.headers.get("If-None-Match") == etag
+                        or self.headers.get("If-Modified-Since") == last_modified):
+                    with lock:
+                        stats["not_modified"] += 1
+                    self.send(304, "", headers={"ETag": etag})
+                    return
+                self.send(200, body, headers={"ETag": etag, "Last-Modified": last_modified})
+            finally:
+                with lock:
+                    stats["in_flight"] -= 1
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/v1/chat/completions":
+                self.send(404, "Not found")
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))))
+            with lock:
+                stats["completions"] += 1
+                stats["completions_in_flight"] += 1
+                stats["peak_completions_in_flight"] = max(stats["peak_completions_in_flight"],
+                                                          stats["completions_in_flight"])
+            try:
+                if completion_latency_ms:
+                    time.sleep(completion_latency_ms / 1000)
+                standard_ids = re.findall(r"Standard ID: (\S+)", request["messages"][-1]["content"])
+                with lock:
+                    if len(standard_ids) > 1:
+                        standard_ids = [sid for sid in standard_ids if rng.random() >= completion_drop_rate]
+                content = json.dumps({standard_id: fake_criteria(standard_id) for standard_id in standard_ids})
+                self.send(200, json.dumps({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "gpt-4"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }), "application/json")
+            finally:
+                with lock:
+                    stats["completions_in_flight"] -= 1
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+def serve_in_thread(port: int = 0, **options) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the fake site on a daemon thread.
+
+    Returns:
+        tuple: (server, base_url) where base_url is ready for scrape_all_pages
+    """
+    server = create_server(port, **options)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/cacs/ela?order=0&mingrade=0&maxgrade=12&dl=0"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve fake CDE ELA standards pages for offline scraper runs.")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--standards", type=int, default=1200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--completion-latency-ms", type=float, default=0.0)
+    parser.add_argument("--completion-drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = create_server(args.port, args.standards, args.latency_ms, args.fail_rate, args.fail_status, args.seed,
+                           args.completion_latency_ms, args.completion_drop_rate)
+    print(f"Serving fake CDE standards on http://127.0.0.1:{args.port}/cacs/ela?order=0&mingrade=0&maxgrade=12&dl=0")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import contextvars
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+import metrics
+
+
+class Overloaded(Exception):
+    """
+    A gate turned a request away; retry_after is the suggested wait in seconds.
+    """
+
+    def __init__(self, gate: str, reason: str, retry_after: int):
+        super().__init__(f"{gate} is at capacity ({reason}), retry in {retry_after}s")
+        self.gate = gate
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+# Monotonic time by which the request handled on this thread must finish, if any.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+def start_deadline(seconds: Optional[float]) -> None:
+    _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def time_left(deadline: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds until the deadline (the current request's unless one is given),
+    None when there is none. Raises DeadlineExceeded once it has passed.
+    """
+    deadline = _deadline.get() if deadline is None else deadline
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left
+
+
+class AdmissionGate:
+    """
+    Concurrency limit with a bounded wait queue for one class of endpoints.
+
+    At most `limit` requests run at once. Up to `queue_size` more wait for a
+    slot, each until its deadline; a request arriving at a full queue, or
+    still waiting when its deadline passes, is turned away with Overloaded.
+    Retry-After is estimated from the recent service time and the backlog.
+
+    Args:
+        name (str): Label used in stats and metrics
+        limit (int): Requests running at once
+        queue_size (int): Requests allowed to wait for a slot
+        deadline (float): Seconds a request may take, waiting included; 0 for none
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, deadline: float = 0.0):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.deadline = deadline
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._service_seconds = 1.0
+        self._stats = {"admitted": 0, "rejected_full": 0, "rejected_timeout": 0, "peak_waiting": 0}
+
+    def retry_after(self) -> int:
+        with self._cond:
+            backlog = (self._waiting + 1) / self.limit
+            return max(1, math.ceil(backlog * self._service_seconds))
+
+    def _reject(self, reason: str) -> Overloaded:
+        self._stats[f"rejected_{reason}"] += 1
+        metrics.ADMISSION_REJECTIONS.labels(self.name, reason).inc()
+        return Overloaded(self.name, reason, self.retry_after())
+
+    def acquire(self, deadline: Optional[float] = None) -> "Admission":
+        """
+        Takes a slot, waiting for one until the deadline if the queue has room.
+
+        Raises:
+            Overloaded: The queue is full or the deadline passed while waiting
+        """
+        with self._cond:
+            if self._running >= self.limit or self._waiting:
+                if self._waiting >= self.queue_size:
+                    raise self._reject("full")
+                self._waiting += 1
+                self._stats["peak_waiting"] = max(self._stats["peak_waiting"], self._waiting)
+                try:
+                    while self._running >= self.limit:
+                        timeout = None if deadline is None else deadline - time.monotonic()
+                        if timeout is not None and timeout <= 0:
+                            raise self._reject("timeout")
+                        self._cond.wait(timeout)
+                finally:
+                    self._waiting -= 1
+            self._running += 1
+            self._stats["admitted"] += 1
+        return Admission(self)
+
+    def _release(self, seconds: float) -> None:
+        with self._cond:
+            self._running -= 1
+            # Moving average, so Retry-After follows the current load.
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * seconds
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "name": self.name,
+                "limit": self.limit,
+                "queue_size": self.queue_size,
+                "deadline": self.deadline,
+                "running": self._running,
+                "waiting": self._waiting,
+                "avg_service_seconds": round(self._service_seconds, 3),
+                **self._stats,
+            }
+
+
+class Admission:
+    """
+    A slot held in an AdmissionGate. release() may be called more than once;
+    only the first call frees the slot.
+    """
+
+    def __init__(self, gate: AdmissionGate):
+        self.gate = gate
+        self.started = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.gate._release(time.monotonic() - self.started)
@@ -1,88 +1,385 @@
-from flask import Flask, request, jsonify
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from torch import cuda
-import torch
-import os
-import re
-from flask import Flask, request, jsonify
+import time
+
+# Measured from here so the startup log covers our own imports as well.
+STARTUP_BEGAN = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify
 import os
 import re
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.chains.question_answering import load_qa_chain
-from langchain.schema import Document
-import openai
-from concurrent.futures import ThreadPoolExecutor
-from cachetools import LRUCache, cached
-from joblib import Parallel, delayed
-import numpy as np
-import faiss
+import zlib
+from concurrent.futures import TimeoutError, as_completed
+from contextlib import contextmanager
+from collections import namedtuple
+from bisect import bisect_right
+import json
+import threading
 import logging
 from dotenv import load_dotenv
+from admission import AdmissionGate, DeadlineExceeded, Overloaded
+import admission
+from batching import MicroBatcher
+from result_cache import ResultCache, normalize_text
+import metrics
+from metrics import stage
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-faiss.omp_set_num_threads(1)
-
 
 application = Flask(__name__)
 
 # Access token for model authentication
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 
+# Set to false on pods that only serve /grade-essay so they never load the model,
+# or on detection-only pods to skip the grading libraries.
+DETECTION_ENABLED = os.getenv("DETECTION_ENABLED", "true").lower() != "false"
+GRADING_ENABLED = os.getenv("GRADING_ENABLED", "true").lower() != "false"
+# When to load the model: "background" (warm-up thread at startup), "eager"
+# (before the module finishes importing) or "lazy" (on the first request).
+DETECTION_WARMUP = os.getenv("DETECTION_WARMUP", "background")
+
+# Seconds spent in each startup phase, reported by /readyz.
+startup_timings = {}
+
+@contextmanager
+def startup_phase(name):
+    started = time.perf_counter()
+    yield
+    startup_timings[name] = round(time.perf_counter() - started, 3)
+    logging.info(f"Startup phase {name} took {startup_timings[name]:.3f}s")
+
 # Load model and tokenizer
-device = 'cuda' if cuda.is_available() else 'cpu'
-tokenizer = AutoTokenizer.from_pretrained("PirateXX/AI-Content-Detector", use_auth_token=ACCESS_TOKEN)
-model = AutoModelForSequenceClassification.from_pretrained("PirateXX/AI-Content-Detector", use_auth_token=ACCESS_TOKEN)
-model.to(device)
+# Hub id or local directory of the classifier; benchmark.py points this at a small stand-in.
+MODEL_NAME = os.getenv("DETECTION_MODEL", "PirateXX/AI-Content-Detector")
+# Inference precision for the classifier: fp32, int8 (dynamic quantization) or bf16.
+DETECTION_PRECISION = os.getenv("DETECTION_PRECISION", "fp32")
+# torch intra-op threads; 0 keeps torch's default of one per core.
+DETECTION_THREADS = int(os.getenv("DETECTION_THREADS", "0"))
+
+# Populated by ensure_detector() the first time the model is needed.
+device = None
+tokenizer = None
+model = None
+model_precision = None
+detector_state = "disabled" if not DETECTION_ENABLED else "pending"
+_detector_lock = threading.Lock()
+
+def detection_device():
+    global device
+    if device is None:
+        from torch import cuda
+        device = 'cuda' if cuda.is_available() else 'cpu'
+    return device
+
+def load_detector(precision=DETECTION_PRECISION):
+    with startup_phase("import_transformers"):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        from precision import apply_precision
+        if DETECTION_THREADS:
+            torch.set_num_threads(DETECTION_THREADS)
+    with startup_phase("load_tokenizer"):
+        detector_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, token=ACCESS_TOKEN)
+    with startup_phase("load_model"):
+        detector_model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, token=ACCESS_TOKEN)
+        detector_model.to(detection_device())
+        detector_model.eval()
+    with startup_phase("apply_precision"):
+        detector_model, applied = apply_precision(detector_model, precision, detection_device())
+    logging.info(f"Loaded {MODEL_NAME} for inference in {applied}")
+    return detector_tokenizer, detector_model, applied
+
+def ensure_detector():
+    global tokenizer, model, model_precision, detector_state
+    if model is not None:
+        return
+    if not DETECTION_ENABLED:
+        raise RuntimeError("AI detection is disabled on this server")
+    with _detector_lock:
+        if model is not None:
+            return
+        detector_state = "loading"
+        try:
+            loaded_tokenizer, loaded_model, applied = load_detector()
+        except Exception:
+            detector_state = "failed"
+            raise
+        tokenizer, model_precision = loaded_tokenizer, applied
+        model = loaded_model
+        detector_state = "loaded"
+
+def warm_up_detector():
+    global detector_state
+    try:
+        ensure_detector()
+        # The first forward pass allocates kernels and buffers; pay for it
+        # before the server reports ready instead of on a user request.
+        with startup_phase("warmup_forward"):
+            score_document("This is a short warm-up essay. It makes sure the model has run once.")
+        detector_state = "ready"
+    except Exception as e:
+        detector_state = "failed"
+        logging.error(f"AI detection model failed to load: {str(e)}")
+
+_grading_loaded = False
+
+def load_grading_dependencies():
+    global _grading_loaded
+    if _grading_loaded:
+        return
+    with startup_phase("import_grading"):
+        import faiss
+        faiss.omp_set_num_threads(1)
+    _grading_loaded = True
+
+def warm_up():
+    start_grading_job_workers()
+    if GRADING_ENABLED:
+        load_grading_dependencies()
+    if DETECTION_ENABLED:
+        warm_up_detector()
+    if GRADING_ENABLED and os.path.exists(STANDARDS_PATH):
+        try:
+            with startup_phase("index_standards"):
+                get_standards_index()
+        except Exception as e:
+            logging.error(f"Could not index the standards in {STANDARDS_PATH}: {str(e)}")
+    startup_timings["total"] = round(time.perf_counter() - STARTUP_BEGAN, 3)
+    logging.info(f"Startup finished in {startup_timings['total']:.3f}s: {startup_timings}")
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[^A-Z].[.?]) +(?=[A-Z])')
 
 def text_to_sentences(text):
     clean_text = text.replace('\n', ' ')
-    return re.split(r'(?<=[^A-Z].[.?]) +(?=[A-Z])', clean_text)
+    return SENTENCE_BOUNDARY.split(clean_text)
 
-def chunks_of_900(text, chunk_size=900):
-    sentences = text_to_sentences(text)
+def sentence_spans(text):
+    # Same boundaries as text_to_sentences, as (start, end) character offsets.
+    clean_text = text.replace('\n', ' ')
+    spans = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(clean_text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(clean_text)))
+    return spans
+
+def chunk_spans_of_900(text, chunk_size=900):
+    # chunks_of_900 with the character range each chunk was cut from.
+    clean_text = text.replace('\n', ' ')
     chunks = []
     current_chunk = ""
-    for sentence in sentences:
+    chunk_start = chunk_end = 0
+    for start, end in sentence_spans(text):
+        sentence = clean_text[start:end]
         if len(current_chunk + sentence) <= chunk_size:
             if len(current_chunk) != 0:
                 current_chunk += " " + sentence
             else:
                 current_chunk += sentence
+                chunk_start = start
+            chunk_end = end
         else:
-            chunks.append(current_chunk)
+            chunks.append((chunk_start, chunk_end, current_chunk))
             current_chunk = sentence
-    chunks.append(current_chunk)
+            chunk_start, chunk_end = start, end
+    chunks.append((chunk_start, chunk_end, current_chunk))
     return chunks
 
+def chunks_of_900(text, chunk_size=900):
+    return [chunk for _, _, chunk in chunk_spans_of_900(text, chunk_size)]
+
+# In anchored chunking, roughly one sentence in this many is an anchor
+# besides the first sentence of each paragraph.
+ANCHOR_SENTENCE_RATE = 8
+
+def anchor_sentences(text, spans):
+    # Sentences a window may end before: paragraph starts, plus sentences whose
+    # own text hashes to an anchor. Both depend only on nearby text, so an edit
+    # leaves the anchors elsewhere in the document where they were.
+    anchors = set()
+    for index, (start, end) in enumerate(spans):
+        if index and "\n" in text[spans[index - 1][1]:start]:
+            anchors.add(index)
+        elif zlib.crc32(normalize_text(text[start:end]).encode("utf-8")) % ANCHOR_SENTENCE_RATE == 0:
+            anchors.add(index)
+    return anchors
+
+def token_windows(text, max_tokens=None, stride=0, anchored=False):
+    """
+    Tokenizes the text once and packs whole sentences into windows of at most
+    max_tokens tokens (the model limit by default). A sentence longer than a
+    window is split at token boundaries. With stride > 0, each window repeats
+    up to that many trailing tokens of the previous one for context.
+
+    With anchored=True a window that is at least half full also ends before
+    the next anchor sentence (see anchor_sentences). Window boundaries then
+    follow the content rather than the distance from the start, so after an
+    edit the windows realign at the next anchor and the unchanged windows
+    match the previous revision's.
+
+    Returns a list of (start, end, token_ids) with character offsets into text.
+    """
+    ensure_detector()
+    limit = max_tokens or tokenizer.model_max_length - 2
+    stride = max(0, min(stride, limit - 1))
+    with stage("tokenize"):
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    ids = encoding["input_ids"]
+    offsets = encoding["offset_mapping"]
+    if not ids:
+        return []
+
+    # Token range [first, last) covered by each sentence.
+    with stage("split"):
+        spans = sentence_spans(text)
+        starts = [start for start, _ in spans]
+        anchors = anchor_sentences(text, spans) if anchored else set()
+    bounds = []
+    for position, (char_start, _) in enumerate(offsets):
+        sentence = bisect_right(starts, char_start) - 1
+        if bounds and bounds[-1][0] == sentence:
+            bounds[-1][2] = position + 1
+        else:
+            bounds.append([sentence, position, position + 1])
+    sentences = [(first, last) for _, first, last in bounds]
+    closes_before = [sentence in anchors for sentence, _, _ in bounds]
+
+    windows = []
+    def emit(first, last):
+        windows.append((offsets[first][0], offsets[last - 1][1], ids[first:last]))
+
+    window_start = window_end = None
+    for index, (first, last) in enumerate(sentences):
+        if window_start is not None and last - window_start <= limit:
+            if not (closes_before[index] and 2 * (window_end - window_start) >= limit):
+                window_end = last
+                continue
+        if window_start is not None:
+            emit(window_start, window_end)
+            # Carry whole trailing sentences forward as overlap, up to stride tokens.
+            back = index - 1
+            while (back >= 0 and sentences[back][0] >= window_start
+                   and window_end - sentences[back][0] <= stride
+                   and last - sentences[back][0] <= limit):
+                first = sentences[back][0]
+                back -= 1
+        if last - first > limit:
+            # A single sentence longer than the window: cut it at token boundaries.
+            while last - first > limit:
+                emit(first, first + limit)
+                first += limit - stride
+        window_start, window_end = first, last
+    emit(window_start, window_end)
+    return windows
+
+# "anchored" packs sentences into model-sized token windows that also end at
+# content-defined anchors, so a revised draft keeps most of its windows and
+# their cached scores; "tokens" packs without anchors; "chars" keeps the
+# original 900-character chunks.
+DETECTION_CHUNKING = os.getenv("DETECTION_CHUNKING", "anchored")
+# Window size in tokens for "anchored" and "tokens" chunking, 0 for the model's own limit.
+DETECTION_WINDOW_TOKENS = int(os.getenv("DETECTION_WINDOW_TOKENS", "0"))
+# Tokens of overlap between consecutive windows.
+DETECTION_WINDOW_STRIDE = int(os.getenv("DETECTION_WINDOW_STRIDE", "0"))
+
+# Upper bound on how many chunks go through the classifier in one forward pass.
+DETECTION_BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "8"))
+# How long a partially filled cross-request batch waits for more chunks.
+DETECTION_MAX_WAIT_MS = float(os.getenv("DETECTION_MAX_WAIT_MS", "10"))
+
+def encode_chunks(chunks):
+    # Tokenize every chunk in one call, then frame each one exactly like the
+    # original single-chunk path did so the scores are unchanged.
+    ensure_detector()
+    with stage("tokenize"):
+        encoded = tokenizer(chunks)["input_ids"]
+    max_tokens = tokenizer.model_max_length - 2
+    return [
+        [tokenizer.bos_token_id] + tokens[:max_tokens] + [tokenizer.eos_token_id]
+        for tokens in encoded
+    ]
+
+def predict_encoded(encoded, batch_size=DETECTION_BATCH_SIZE, detector_model=None):
+    # Sort by length so each padded batch wastes as little compute as possible,
+    # then scatter the scores back into the caller's order.
+    import torch
+    ensure_detector()
+    order = sorted(range(len(encoded)), key=lambda i: len(encoded[i]))
+    reals = [0.0] * len(encoded)
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        width = max(len(encoded[i]) for i in batch)
+        input_ids = torch.full((len(batch), width), tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, i in enumerate(batch):
+            input_ids[row, :len(encoded[i])] = torch.tensor(encoded[i], dtype=torch.long)
+            attention_mask[row, :len(encoded[i])] = 1
+
+        with stage("forward"), torch.no_grad():
+            logits = (detector_model or model)(input_ids.to(device), attention_mask=attention_mask.to(device))[0]
+            probs = logits.float().softmax(dim=-1)
+
+        for row, i in enumerate(batch):
+            fake, real = probs[row].detach().cpu().numpy().tolist()
+            reals[i] = real
+
+    return reals
+
+def predict_batch(queries, batch_size=DETECTION_BATCH_SIZE):
+    if not queries:
+        return []
+    return predict_encoded(encode_chunks(queries), batch_size=batch_size)
+
 def predict(query):
-    tokens = tokenizer.encode(query)
-    all_tokens = len(tokens)
-    tokens = tokens[:tokenizer.model_max_length - 2]
-    used_tokens = len(tokens)
-    tokens = torch.tensor([tokenizer.bos_token_id] + tokens + [tokenizer.eos_token_id]).unsqueeze(0)
-    mask = torch.ones_like(tokens)
-
-    with torch.no_grad():
-        logits = model(tokens.to(device), attention_mask=mask.to(device))[0]
-        probs = logits.softmax(dim=-1)
-
-    fake, real = probs.detach().cpu().flatten().numpy().tolist()
-    return real
-
-def find_real_prob(text):
-    chunks_of_text = chunks_of_900(text)
-    results = []
-    for chunk in chunks_of_text:
-        output = predict(chunk)
-        results.append([output, len(chunk)])
+    return predict_batch([query])[0]
+
+# Chunks from concurrent requests share forward passes through this queue.
+def predict_detection_batch(encoded):
+    metrics.DETECTION_BATCH_SIZE.observe(len(encoded))
+    return predict_encoded(encoded, batch_size=len(encoded))
+
+detection_batcher = MicroBatcher(
+    predict_detection_batch,
+    max_batch_size=DETECTION_BATCH_SIZE,
+    max_wait_ms=DETECTION_MAX_WAIT_MS,
+    name="detection",
+)
 
+# A piece of a document ready for the classifier. start/end are character
+# offsets into the document, weight is its share of the length-weighted average.
+DetectionChunk = namedtuple("DetectionChunk", ["start", "end", "weight", "input_ids"])
+
+def split_for_detection(text):
+    ensure_detector()
+    if DETECTION_CHUNKING == "chars" or not tokenizer.is_fast:
+        # Empty chunks carry no weight in the average, so skip scoring them.
+        with stage("split"):
+            spans = [span for span in chunk_spans_of_900(text) if span[2]]
+        encoded = encode_chunks([chunk for _, _, chunk in spans]) if spans else []
+        return [
+            DetectionChunk(start, end, len(chunk), input_ids)
+            for (start, end, chunk), input_ids in zip(spans, encoded)
+        ]
+
+    windows = token_windows(text, DETECTION_WINDOW_TOKENS or None, DETECTION_WINDOW_STRIDE,
+                            anchored=DETECTION_CHUNKING == "anchored")
+    return [
+        DetectionChunk(start, end, end - start, [tokenizer.bos_token_id] + ids + [tokenizer.eos_token_id])
+        for start, end, ids in windows
+        if end > start
+    ]
+
+def aggregate_real_prob(results):
     ans = 0
     cnt = 0
     for prob, length in results:
@@ -91,18 +388,675 @@ def find_real_prob(text):
     real_prob = ans / cnt
     return {"Real": real_prob, "Fake": 1-real_prob}
 
+def chunk_scores(chunks, outputs):
+    return [
+        {"start": chunk.start, "end": chunk.end, "Real": output}
+        for chunk, output in zip(chunks, outputs)
+    ]
+
+def score_document(text, detector_model=None):
+    # Scores one document directly, bypassing the shared batcher.
+    chunks = split_for_detection(text)
+    outputs = predict_encoded([chunk.input_ids for chunk in chunks], detector_model=detector_model)
+    return aggregate_real_prob([[output, chunk.weight] for output, chunk in zip(outputs, chunks)])
+
+def find_real_prob(text, include_chunks=False):
+    chunks = split_for_detection(text)
+    metrics.DETECTION_CHUNKS.observe(len(chunks))
+    # Time this request spent waiting on shared forward passes, queueing included.
+    with stage("inference"):
+        outputs, reused = score_chunks(chunks) if chunks else ([], 0)
+    with stage("aggregate"):
+        results = [[output, chunk.weight] for output, chunk in zip(outputs, chunks)]
+        result = aggregate_real_prob(results)
+    result["chunks_reused"] = reused
+    result["chunks_computed"] = len(chunks) - reused
+    if include_chunks:
+        result["chunks"] = chunk_scores(chunks, outputs)
+    return result
+
+# Adaptive mode (opt-in per request) stops scoring once the 95% confidence
+# interval of the length-weighted Real score is within +/- this margin.
+DETECTION_ADAPTIVE_MARGIN = float(os.getenv("DETECTION_ADAPTIVE_MARGIN", "0.05"))
+# Chunks scored before the interval is trusted at all.
+DETECTION_ADAPTIVE_MIN_CHUNKS = int(os.getenv("DETECTION_ADAPTIVE_MIN_CHUNKS", "8"))
+# Two-sided 95% Student t critical values for 1..30 degrees of freedom; small
+# samples need the wider interval or they stop too early on mixed documents.
+T_CRITICAL_95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+def t_critical_95(degrees_of_freedom):
+    if degrees_of_freedom <= len(T_CRITICAL_95):
+        return T_CRITICAL_95[degrees_of_freedom - 1]
+    return 1.96 + 2.4 / degrees_of_freedom
+
+def stratified_order(count):
+    # Coarse to fine: the middle chunk, then the middles of each half, and so
+    # on. Each level visits its ranges in bit-reversed order, so any prefix of
+    # the order, even one that stops partway through a level, is spread
+    # across the whole document.
+    order = []
+    ranges = [(0, count - 1)]
+    level = 0
+    while any(low <= high for low, high in ranges):
+        for position in range(len(ranges)):
+            reversed_position = int(format(position, f"0{level}b")[::-1], 2) if level else 0
+            low, high = ranges[reversed_position]
+            if low <= high:
+                order.append((low + high) // 2)
+        # Empty halves are kept so every level has exactly 2 ** level ranges.
+        ranges = [half for low, high in ranges
+                  for half in ((low, (low + high) // 2 - 1), ((low + high) // 2 + 1, high))]
+        level += 1
+    return order
+
+def weighted_estimate(results, population):
+    # Length-weighted mean of the scored chunks and the half-width of its 95%
+    # interval, treating them as a sample without replacement from population
+    # chunks (ratio estimator with finite population correction).
+    n = len(results)
+    total_weight = sum(weight for _, weight in results)
+    estimate = sum(prob * weight for prob, weight in results) / total_weight
+    if n >= population:
+        return estimate, 0.0
+    if n < 2:
+        return estimate, float("inf")
+    mean_weight = total_weight / n
+    residuals = sum((weight * (prob - estimate)) ** 2 for prob, weight in results) / (n - 1)
+    variance = (1 - n / population) * residuals / (n * mean_weight ** 2)
+    return estimate, t_critical_95(n - 1) * variance ** 0.5
+
+def exact_adaptive_summary(chunk_count):
+    # What adaptive scoring reports once every chunk has been scored.
+    return {"chunks_scored": chunk_count, "chunks_total": chunk_count, "margin": 0.0, "confidence": 0.95}
+
+def adaptive_real_prob(text, include_chunks=False, margin=None, min_chunks=None):
+    margin = DETECTION_ADAPTIVE_MARGIN if margin is None else margin
+    min_chunks = max(2, DETECTION_ADAPTIVE_MIN_CHUNKS if min_chunks is None else min_chunks)
+    chunks = split_for_detection(text)
+    if not chunks:
+        result = find_real_prob(text, include_chunks=include_chunks)
+        result["adaptive"] = exact_adaptive_summary(0)
+        return result
+    metrics.DETECTION_CHUNKS.observe(len(chunks))
+    order = stratified_order(len(chunks))
+    scored = {}
+    reused = 0
+    half_width = float("inf")
+    step = min_chunks
+    while len(scored) < len(chunks):
+        batch = order[len(scored):len(scored) + step]
+        with stage("inference"):
+            outputs, batch_reused = score_chunks([chunks[i] for i in batch])
+        scored.update(zip(batch, outputs))
+        reused += batch_reused
+        # Later rounds fill whole forward passes.
+        step = max(DETECTION_BATCH_SIZE, 1)
+        with stage("aggregate"):
+            results = [[scored[i], chunks[i].weight] for i in scored]
+            estimate, half_width = weighted_estimate(results, len(chunks))
+        if half_width <= margin:
+            break
+
+    result = {"Real": estimate, "Fake": 1 - estimate,
+              "chunks_reused": reused, "chunks_computed": len(scored) - reused}
+    result["adaptive"] = {
+        "chunks_scored": len(scored),
+        "chunks_total": len(chunks),
+        "margin": half_width,
+        "confidence": 0.95,
+    }
+    if include_chunks:
+        indexes = sorted(scored)
+        result["chunks"] = chunk_scores([chunks[i] for i in indexes], [scored[i] for i in indexes])
+    return result
+
+def detection_model_identity():
+    # Anything that changes the scores for a given text belongs in here, so
+    # that cached results are never served for a different model or chunking.
+    ensure_detector()
+    revision = getattr(model.config, "_commit_hash", None) or "local"
+    if DETECTION_CHUNKING == "chars" or not tokenizer.is_fast:
+        chunking = "chars900"
+    else:
+        chunking = f"tokens{DETECTION_WINDOW_TOKENS or tokenizer.model_max_length - 2}s{DETECTION_WINDOW_STRIDE}"
+        if DETECTION_CHUNKING == "anchored":
+            chunking = f"anchored{ANCHOR_SENTENCE_RATE}-{chunking}"
+    return f"{MODEL_NAME}@{revision}/{model_precision}:{chunking}"
+
+# Finished Real/Fake results and chunk counts keyed by the text the chunker
+# sees. Setting DETECTION_CACHE_DB shares the cache between processes and restarts.
+detection_cache = ResultCache(
+    "ai-detection",
+    max_entries=int(os.getenv("DETECTION_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("DETECTION_CACHE_TTL", "604800")),
+    db_path=os.getenv("DETECTION_CACHE_DB") or None,
+    max_disk_entries=int(os.getenv("DETECTION_CACHE_DB_MAX_ENTRIES", "100000")),
+)
+
+def detection_cache_key(text):
+    identity = detection_model_identity()
+    # Character chunking reads newlines as spaces; token windows see every
+    # whitespace character, so two paragraphings can score differently.
+    if identity.endswith(":chars900"):
+        text = text.replace('\n', ' ')
+    return detection_cache.make_key(identity, text)
+
+def cache_document_result(key, result):
+    # The chunk count lets a later hit answer with the same fields as a fresh score.
+    detection_cache.set(key, {"Real": result["Real"], "Fake": result["Fake"],
+                              "chunks": result["chunks_reused"] + result["chunks_computed"]})
+
+def cached_document_result(cached):
+    # Every chunk of a cached document counts as reused.
+    return {"Real": cached["Real"], "Fake": cached["Fake"],
+            "chunks_reused": cached["chunks"], "chunks_computed": 0}
+
+# Real scores of single chunks, keyed by the token ids the classifier sees, so
+# a revised draft only runs the model on the chunks that changed. Shares
+# DETECTION_CACHE_DB with the document cache.
+chunk_score_cache = ResultCache(
+    "ai-detection-chunks",
+    max_entries=int(os.getenv("DETECTION_CHUNK_CACHE_SIZE", "16384")),
+    ttl_seconds=float(os.getenv("DETECTION_CACHE_TTL", "604800")),
+    db_path=os.getenv("DETECTION_CACHE_DB") or None,
+    max_disk_entries=int(os.getenv("DETECTION_CACHE_DB_MAX_ENTRIES", "100000")),
+)
+
+def chunk_score_keys(chunks):
+    identity = detection_model_identity()
+    return [
+        chunk_score_cache.make_key(identity, " ".join(map(str, chunk.input_ids)))
+        for chunk in chunks
+    ]
+
+def cached_chunk_scores(chunks):
+    # Known scores for the chunks (None where unknown) and their cache keys.
+    keys = chunk_score_keys(chunks)
+    scores = [chunk_score_cache.get(key) for key in keys]
+    for score in scores:
+        metrics.CACHE_REQUESTS.labels("ai-detection-chunks", "miss" if score is None else "hit").inc()
+    return scores, keys
+
+def score_chunks(chunks):
+    """
+    Real score of every chunk, running the classifier only on chunks that
+    have not been scored before.
+
+    Returns:
+        tuple: (scores in chunk order, number of chunks reused from the cache)
+    """
+    scores, keys = cached_chunk_scores(chunks)
+    missing = [i for i, score in enumerate(scores) if score is None]
+    if missing:
+        try:
+            # Chunks still queued when the deadline passes are withdrawn.
+            outputs = detection_batcher.map([chunks[i].input_ids for i in missing], timeout=admission.time_left())
+        except TimeoutError:
+            raise DeadlineExceeded("Request deadline exceeded")
+        for i, output in zip(missing, outputs):
+            scores[i] = output
+            chunk_score_cache.set(keys[i], output)
+    return scores, len(chunks) - len(missing)
+
+def detect_text(text, include_chunks=False, adaptive=False):
+    key = detection_cache_key(text)
+    # Per-chunk scores are not cached, so asking for them always rescores.
+    # An exact cached score also answers adaptive requests.
+    cached = None if include_chunks else detection_cache.get(key)
+    if not include_chunks:
+        metrics.CACHE_REQUESTS.labels("ai-detection", "miss" if cached is None else "hit").inc()
+    if cached is not None:
+        result = cached_document_result(cached)
+        if adaptive:
+            result["adaptive"] = exact_adaptive_summary(cached["chunks"])
+        return result
+    if adaptive:
+        result = adaptive_real_prob(text, include_chunks=include_chunks)
+        # Estimates are not cached; a document scored in full is exact.
+        if result["adaptive"]["chunks_scored"] == result["adaptive"]["chunks_total"]:
+            cache_document_result(key, result)
+    else:
+        result = find_real_prob(text, include_chunks=include_chunks)
+        cache_document_result(key, result)
+    return result
+
+# Largest request body in bytes; bigger bodies are refused with 413.
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(10 * 1024 * 1024)))
+application.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES or None
+# Longest text in characters accepted per document or essay; 0 for no limit.
+MAX_TEXT_CHARS = int(os.getenv("MAX_TEXT_CHARS", "100000"))
+
+# Per endpoint: requests running at once, requests waiting for a slot (more
+# are refused with 429 and Retry-After) and seconds each request may take,
+# waiting included. Grading holds its threads for the whole OpenAI call, so
+# its running plus waiting requests should stay below GUNICORN_THREADS to
+# leave detection a thread even during a grading surge.
+DETECTION_CONCURRENCY = int(os.getenv("DETECTION_CONCURRENCY", "4"))
+DETECTION_QUEUE = int(os.getenv("DETECTION_QUEUE", "16"))
+DETECTION_DEADLINE = float(os.getenv("DETECTION_DEADLINE", "30"))
+DETECTION_BATCH_CONCURRENCY = int(os.getenv("DETECTION_BATCH_CONCURRENCY", "1"))
+DETECTION_BATCH_QUEUE = int(os.getenv("DETECTION_BATCH_QUEUE", "2"))
+DETECTION_BATCH_DEADLINE = float(os.getenv("DETECTION_BATCH_DEADLINE", "300"))
+GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "2"))
+GRADING_QUEUE = int(os.getenv("GRADING_QUEUE", "2"))
+GRADING_DEADLINE = float(os.getenv("GRADING_DEADLINE", "110"))
+admission_gates = {
+    "ai_detection": AdmissionGate("ai-detection", DETECTION_CONCURRENCY, DETECTION_QUEUE, DETECTION_DEADLINE),
+    "ai_detection_batch": AdmissionGate("ai-detection-batch", DETECTION_BATCH_CONCURRENCY, DETECTION_BATCH_QUEUE,
+                                        DETECTION_BATCH_DEADLINE),
+    "grade_essays": AdmissionGate("grade-essay", GRADING_CONCURRENCY, GRADING_QUEUE, GRADING_DEADLINE),
+}
+
+def text_too_long(text):
+    return MAX_TEXT_CHARS and len(text) > MAX_TEXT_CHARS
+
+def text_too_long_error():
+    return jsonify({"error": f"Text longer than {MAX_TEXT_CHARS} characters"}), 413
+
+# Adds a Server-Timing header with each request's stage durations, for
+# lining requests up with the Node server's logs.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+@application.before_request
+def start_request_timer():
+    g.started_at = time.perf_counter()
+    metrics.begin_request()
+
+@application.before_request
+def admit_request():
+    # Flask also enforces MAX_CONTENT_LENGTH while reading, but refusing by the
+    # declared length keeps oversized bodies out of the queues altogether.
+    if MAX_REQUEST_BYTES and (request.content_length or 0) > MAX_REQUEST_BYTES:
+        return jsonify({"error": f"Request body larger than {MAX_REQUEST_BYTES} bytes"}), 413
+    gate = admission_gates.get(request.endpoint)
+    admission.start_deadline(gate.deadline if gate else None)
+    if gate is not None:
+        try:
+            g.admission = gate.acquire(admission.current_deadline())
+        except Overloaded as e:
+            logging.warning(str(e))
+            return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+
+@application.after_request
+def release_admission(response):
+    # Streamed responses keep their slot until the last byte has been sent.
+    if g.get("admission") is not None:
+        response.call_on_close(g.admission.release)
+    return response
+
+@application.teardown_request
+def clear_deadline(exc):
+    # Streams keep their own copy; anything run later on this thread, another
+    # request's view or a test, must not inherit this request's deadline.
+    admission.start_deadline(None)
+
+@application.errorhandler(DeadlineExceeded)
+def deadline_exceeded(e):
+    logging.warning(f"{request.path}: {str(e)}")
+    return jsonify({"error": str(e)}), 504
+
+@application.after_request
+def record_request_timing(response):
+    started = g.get("started_at")
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        # The route pattern, not the path, so job ids do not become labels.
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(elapsed)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = metrics.server_timing_header(elapsed)
+    return response
+
+@application.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+@application.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness only: the process is up and serving requests.
+    return jsonify({"status": "ok"})
+
+@application.route('/readyz', methods=['GET'])
+def readyz():
+    # Readiness: the model is loaded and has run once (or detection is off).
+    # In "lazy" mode everything loads on first use, so the server is always ready.
+    ready = DETECTION_WARMUP == "lazy" or (
+        detector_state in ("ready", "disabled") and (_grading_loaded or not GRADING_ENABLED)
+    )
+    body = {"ready": ready, "detection": detector_state, "grading": _grading_loaded, "startup": startup_timings}
+    return jsonify(body), 200 if ready else 503
+
+def detection_unavailable():
+    return jsonify({"error": "AI detection is disabled on this server"}), 503
+
 @application.route('/ai-detection', methods=['POST'])
 def ai_detection():
+    if not DETECTION_ENABLED:
+        return detection_unavailable()
     data = request.json
     text = data.get('text', '')
     if not text:
         return jsonify({"error": "No text provided"}), 400
+    if text_too_long(text):
+        return text_too_long_error()
+    metrics.REQUEST_TEXT_CHARS.labels("ai-detection").observe(len(text))
     
-    result = find_real_prob(text)
+    result = detect_text(text, include_chunks=bool(data.get('include_chunks')),
+                         adaptive=bool(data.get('adaptive')))
     return jsonify(result)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Largest number of documents accepted by one /ai-detection/batch request.
+DETECTION_MAX_BATCH_DOCUMENTS = int(os.getenv("DETECTION_MAX_BATCH_DOCUMENTS", "200"))
+
+@application.route('/ai-detection/batch', methods=['POST'])
+def ai_detection_batch():
+    if not DETECTION_ENABLED:
+        return detection_unavailable()
+    data = request.get_json(silent=True) or {}
+    documents = data.get('documents') if isinstance(data, dict) else None
+    if not isinstance(documents, list) or not documents:
+        return jsonify({"error": "No documents provided"}), 400
+    if len(documents) > DETECTION_MAX_BATCH_DOCUMENTS:
+        return jsonify({"error": f"At most {DETECTION_MAX_BATCH_DOCUMENTS} documents per batch"}), 400
+    # The stream runs after this function returns, so keep the deadline here.
+    deadline = admission.current_deadline()
+
+    def ndjson(payload):
+        return json.dumps(payload) + "\n"
+
+    def finish_document(entry):
+        scores = entry["scores"]
+        for i, future in zip(entry["missing"], entry["futures"]):
+            scores[i] = future.result()
+            chunk_score_cache.set(entry["keys"][i], scores[i])
+        with stage("aggregate"):
+            results = [[score, chunk.weight] for score, chunk in zip(scores, entry["chunks"])]
+            result = aggregate_real_prob(results)
+        result["chunks_reused"] = len(scores) - len(entry["missing"])
+        result["chunks_computed"] = len(entry["missing"])
+        cache_document_result(entry["key"], result)
+        # Copies of the same text later in the batch were scored along with it.
+        copy = cached_document_result({**result, "chunks": len(scores)})
+        return "".join([ndjson({"id": entry["id"], **result})] +
+                       [ndjson({"id": doc_id, **copy}) for doc_id in entry["copies"]])
+
+    def document_error(entry, message):
+        return "".join(ndjson({"id": doc_id, "error": message}) for doc_id in [entry["id"]] + entry["copies"])
+
+    def generate():
+        # Queue the chunks of every document up front so they share batches,
+        # then emit each document as soon as its last chunk has been scored.
+        pending = {}
+        owners = {}
+        # Cache key -> pending entry, so a text sent twice is only scored once.
+        queued = {}
+        for position, document in enumerate(documents):
+            doc_id = document.get('id', position) if isinstance(document, dict) else position
+            text = document.get('text') if isinstance(document, dict) else None
+            if not isinstance(text, str) or not text:
+                yield ndjson({"id": doc_id, "error": "No text provided"})
+                continue
+            if text_too_long(text):
+                yield ndjson({"id": doc_id, "error": f"Text longer than {MAX_TEXT_CHARS} characters"})
+                continue
+            metrics.REQUEST_TEXT_CHARS.labels("ai-detection-batch").observe(len(text))
+            cache_key = detection_cache_key(text)
+            if cache_key in queued:
+                queued[cache_key]["copies"].append(doc_id)
+                continue
+            cached_result = detection_cache.get(cache_key)
+            metrics.CACHE_REQUESTS.labels("ai-detection", "miss" if cached_result is None else "hit").inc()
+            if cached_result is not None:
+                yield ndjson({"id": doc_id, **cached_document_result(cached_result)})
+                continue
+            try:
+                chunks = split_for_detection(text)
+                if not chunks:
+                    yield ndjson({"id": doc_id, "error": "No text provided"})
+                    continue
+                metrics.DETECTION_CHUNKS.observe(len(chunks))
+                # Chunks scored before (earlier drafts) are not sent to the model again.
+                scores, keys = cached_chunk_scores(chunks)
+                missing = [i for i, score in enumerate(scores) if score is None]
+                futures = detection_batcher.submit([chunks[i].input_ids for i in missing]) if missing else []
+            except Exception as e:
+                logging.error(f"Failed to queue document {doc_id} for AI detection: {str(e)}")
+                yield ndjson({"id": doc_id, "error": str(e)})
+                continue
+            entry = {
+                "id": doc_id,
+                "key": cache_key,
+                "chunks": chunks,
+                "scores": scores,
+                "keys": keys,
+                "missing": missing,
+                "futures": futures,
+                "remaining": len(futures),
+                "copies": [],
+            }
+            if not futures:
+                yield finish_document(entry)
+                continue
+            pending[position] = entry
+            queued[cache_key] = entry
+            for future in futures:
+                owners[future] = position
+
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for future in as_completed(owners, timeout=timeout):
+                entry = pending[owners[future]]
+                entry["remaining"] -= 1
+                if entry["remaining"]:
+                    continue
+                try:
+                    yield finish_document(entry)
+                except Exception as e:
+                    logging.error(f"AI detection failed for document {entry['id']}: {str(e)}")
+                    yield document_error(entry, str(e))
+        except TimeoutError:
+            unfinished = [entry for entry in pending.values() if entry["remaining"]]
+            logging.warning(f"AI detection batch deadline exceeded with {len(unfinished)} documents unfinished")
+            for entry in unfinished:
+                yield document_error(entry, "Request deadline exceeded")
+        finally:
+            # Past the deadline, or the client hung up: nobody wants the rest.
+            detection_batcher.cancel(list(owners))
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@application.route('/ai-detection/stats', methods=['GET'])
+def ai_detection_stats():
+    return jsonify({"batcher": detection_batcher.stats(), "cache": detection_cache.stats(),
+                    "chunk_cache": chunk_score_cache.stats(),
+                    "admission": [gate.stats() for gate in admission_gates.values()]})
+
+# Where per-teacher exemplar indexes are kept between requests.
+EXEMPLAR_STORE_DIR = os.getenv("EXEMPLAR_STORE_DIR", "exemplar_store")
+# How many of the closest old essay passages are considered for the prompt.
+GRADING_TOP_K = int(os.getenv("GRADING_TOP_K", "8"))
+# Old essays longer than this many tokens are split into passages.
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "800"))
+# Token budget for the retrieved passages placed in the grading prompt.
+GRADING_CONTEXT_TOKENS = int(os.getenv("GRADING_CONTEXT_TOKENS", "3000"))
+embedder = None
+exemplar_store = None
+_grading_lock = threading.Lock()
+
+def get_embedder():
+    # One cached embedder per process; EMBEDDING_BACKEND picks OpenAI or the local one.
+    global embedder
+    if embedder is None:
+        with _grading_lock:
+            if embedder is None:
+                from embeddings import make_embedder
+                embedder = make_embedder()
+    return embedder
+
+def get_exemplar_store():
+    global exemplar_store
+    if exemplar_store is None:
+        from exemplar_store import ExemplarStore
+        # Vectors from different embedding models cannot share an index.
+        model_dir = re.sub(r'[^A-Za-z0-9_.-]', '_', get_embedder().model_name)
+        with _grading_lock:
+            if exemplar_store is None:
+                exemplar_store = ExemplarStore(os.path.join(EXEMPLAR_STORE_DIR, model_dir))
+    return exemplar_store
+
+# Rubric template written by webscraperCADOE.py. It is indexed on first use
+# (or during warm-up) and reindexed whenever the file changes.
+STANDARDS_PATH = os.getenv("STANDARDS_PATH", "../ela_standards.json")
+# Standards returned by POST /standards/search when the request gives no k.
+STANDARDS_TOP_K = int(os.getenv("STANDARDS_TOP_K", "5"))
+standards_store = None
+
+def get_standards_index():
+    global standards_store
+    if standards_store is None:
+        load_grading_dependencies()
+        from standards_index import StandardsStore
+        embedding_model = get_embedder()
+        with _grading_lock:
+            if standards_store is None:
+                standards_store = StandardsStore(STANDARDS_PATH, embedding_model.embed_documents)
+    return standards_store.current()
+
+def build_grading_messages(rubric, essay, prompt, old_essays, teacher_id=None):
+    # Retrieves the closest old essay passages; returns None when none are relevant.
+    load_grading_dependencies()
+    from exemplar_store import ExemplarIndex, content_hash
+    from passages import pack_context, split_passages
+
+    # old_essays is either one concatenated string or a list of essays.
+    if isinstance(old_essays, str):
+        old_essays = [old_essays]
+    old_essays = [text for text in old_essays if isinstance(text, str) and text.strip()]
+    passages = [
+        passage
+        for text in old_essays
+        for passage in split_passages(text, PASSAGE_MAX_TOKENS)
+    ]
+
+    embedding_model = get_embedder()
+
+    def embed_documents(texts):
+        with stage("embed"):
+            return embedding_model.embed_documents(texts)
+
+    # The index stage includes embedding any passages the index has not seen.
+    with stage("index"):
+        if teacher_id:
+            logging.info(f"Loading the teacher's exemplar index and embedding any new passages ({len(passages)} from {len(old_essays)} essays).")
+            exemplars = get_exemplar_store().get(teacher_id, passages, embed_documents)
+        else:
+            logging.info("No teacher id given, embedding old essay passages for this request only.")
+            exemplars = ExemplarIndex()
+            exemplars.add(passages, embed_documents)
+
+    logging.info("Embedding the current essay.")
+    with stage("embed"):
+        essay_embedding = embedding_model.embed_query(essay)
+
+    logging.info("Performing similarity search.")
+    # Only essays the caller still lists count; the stored index may hold older
+    # ones. The index keeps hashes only, so the texts come from this request.
+    by_hash = {}
+    for text in passages:
+        by_hash.setdefault(content_hash(text), text)
+    with stage("search"):
+        hits = exemplars.search(essay_embedding, k=GRADING_TOP_K, only=list(by_hash))
+    if not hits and old_essays:
+        return None
+
+    context, used = pack_context([by_hash[h] for h, _ in hits], GRADING_CONTEXT_TOKENS)
+    metrics.GRADING_PASSAGES.observe(used)
+    logging.info(f"Using {used} of {len(hits)} relevant passages from {len(old_essays)} old essays.")
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": f"Previous Essays and Feedback to Follow: {context}\n\nEssay: {essay}\n\nRubric: {rubric}"}
+    ]
+
+def wants_stream(data):
+    return bool(data.get('stream')) or request.accept_mimetypes.best == 'text/event-stream'
+
+def stream_feedback(messages):
+    from openai_clients import stream_chat_completion
+
+    # The events are generated after the view returns, so take the deadline now.
+    deadline = admission.current_deadline()
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def generate():
+        # Send something right away so proxies and the browser open the stream.
+        yield ": grading\n\n"
+        parts = []
+        try:
+            with stage("llm"):
+                for delta in stream_chat_completion(deadline=deadline, model="gpt-4o", messages=messages,
+                                                    max_tokens=3000):
+                    parts.append(delta)
+                    yield sse("token", {"delta": delta})
+        except Exception as e:
+            logging.error(f"An error occurred while streaming grading feedback: {str(e)}")
+            yield sse("error", {"error": str(e)})
+            return
+        logging.info("Grading completed successfully.")
+        yield sse("done", {"feedback": "".join(parts)})
+
+    # X-Accel-Buffering stops nginx from holding the events back.
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@application.route('/standards', methods=['GET'])
+def list_standards():
+    # Optional filters: grade ("5", "K", "9-10") and ID prefix ("W", "W.5").
+    try:
+        found = get_standards_index().filter(request.args.get('grade'), request.args.get('prefix'))
+        return jsonify({"count": len(found), "standards": [standard.to_dict() for standard in found]})
+    except Exception as e:
+        logging.error(f"An error occurred while listing standards: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@application.route('/standards/stats', methods=['GET'])
+def standards_stats():
+    get_standards_index()
+    return jsonify({**standards_store.stats, "embeddings": get_embedder().stats()})
+
+@application.route('/standards/<standard_id>', methods=['GET'])
+def get_standard(standard_id):
+    standard = get_standards_index().get(standard_id)
+    if standard is None:
+        return jsonify({"error": "Standard not found"}), 404
+    return jsonify(standard.to_dict())
+
+@application.route('/standards/search', methods=['POST'])
+def search_standards():
+    # Top-k standards for an assignment prompt, optionally within a grade and/or ID prefix.
+    try:
+        data = request.json or {}
+        prompt = data.get('prompt', '')
+        if not isinstance(prompt, str) or not prompt.strip():
+            return jsonify({"error": "prompt must be a non-empty string"}), 400
+        k = data.get('k', STANDARDS_TOP_K)
+        if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+            return jsonify({"error": "k must be a positive integer"}), 400
+
+        index = get_standards_index()
+        with stage("embed"):
+            query_vector = get_embedder().embed_query(prompt)
+        with stage("search"):
+            results = index.search(query_vector, k, data.get('grade'), data.get('prefix'))
+        return jsonify({"standards": [{**standard.to_dict(), "score": round(score, 4)}
+                                      for standard, score in results]})
+    except Exception as e:
+        logging.error(f"An error occurred while searching standards: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
 @application.route('/grade-essay', methods=['POST'])
 def grade_essays():
@@ -114,65 +1068,199 @@ def grade_essays():
         essay = data.get('essay', '')
         prompt = data.get('prompt', '')
         old_essays = data.get('old_essays', '')
+        teacher_id = data.get('teacher_id')
         
         if not rubric or not essay or not prompt:
             logging.error("Missing data for grading: rubric, essay, or prompt.")
             return jsonify({"error": "Missing data for grading"}), 400
-        
-        openai.api_key = os.getenv('OPENAI_API_KEY')
-        
-        logging.info("Initializing OpenAI Embeddings.")
-        embedding_model = OpenAIEmbeddings(openai_api_key=os.environ['OPENAI_API_KEY'])
+        if text_too_long(essay):
+            return text_too_long_error()
+        metrics.REQUEST_TEXT_CHARS.labels("grade-essay").observe(len(essay))
 
-        logging.info("Creating documents from old essays.")
-        documents = [Document(page_content=old_essays)]
-        doc_texts = [doc.page_content for doc in documents]
-        
-        logging.info("Generating embeddings for old essays.")
-        embeddings = embedding_model.embed_documents(doc_texts)
-        embeddings_np = np.array(embeddings, dtype='float32')
-        
-        logging.info("Setting up FAISS index.")
-        embedding_dimension = embeddings_np.shape[1]
-        index = faiss.IndexFlatL2(embedding_dimension) 
-        faiss.normalize_L2(embeddings_np)
-        index.add(embeddings_np)
-        
-        logging.info("Embedding the current essay.")
-        essay_embedding = embedding_model.embed_query(essay)
-        essay_embedding_np = np.array([essay_embedding], dtype='float32')
-        faiss.normalize_L2(essay_embedding_np)
-
-        logging.info("Performing similarity search.")
-        distances, indices = index.search(essay_embedding_np, k=1)
-        client = openai.OpenAI(api_key=os.environ['OPENAI_API_KEY'])
-
-        if indices.size > 0 and indices[0][0] != -1:
-            relevant_doc_index = indices[0][0]
-            context = doc_texts[relevant_doc_index]
-            logging.info(f"Found relevant context from old essays at index {relevant_doc_index}.")
-            print(context)
-            
-            logging.info("Generating grading feedback using GPT-4o.")
-            response = client.chat.completions.create(
+        messages = build_grading_messages(rubric, essay, prompt, old_essays, teacher_id)
+        if messages is None:
+            logging.warning("No relevant context found.")
+            return jsonify({"error": "No relevant context found."})
+
+        # Retrieval may have used up the deadline; then nobody is waiting for the answer.
+        admission.time_left()
+
+        if wants_stream(data):
+            logging.info("Streaming grading feedback from GPT-4o.")
+            return stream_feedback(messages)
+
+        from openai_clients import chat_completion
+
+        logging.info("Generating grading feedback using GPT-4o.")
+        with stage("llm"):
+            response = chat_completion(
                 model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": f"Previous Essays and Feedback to Follow: {context}\n\nEssay: {essay}\n\nRubric: {rubric}"}
-                ],
+                messages=messages,
                 max_tokens=3000
             )
-            
-            feedback = response.choices[0].message.content
-            logging.info("Grading completed successfully.")
-            return jsonify({"feedback": feedback})
-        else:
-            logging.warning("No relevant context found.")
-            return jsonify({"error": "No relevant context found."})
+        
+        feedback = response.choices[0].message.content
+        logging.info("Grading completed successfully.")
+        return jsonify({"feedback": feedback})
+    except DeadlineExceeded as e:
+        return deadline_exceeded(e)
     except Exception as e:
         logging.error(f"An error occurred during the grading process: {str(e)}")
         return jsonify({"error": str(e)}), 500
     
+# SQLite file that keeps queued grading jobs across restarts.
+GRADING_JOB_DB = os.getenv("GRADING_JOB_DB", "grading_jobs.db")
+# Grading jobs run at once in each server process.
+GRADING_JOB_WORKERS = int(os.getenv("GRADING_JOB_WORKERS", "4"))
+# Seconds a running job may go without finishing before it is handed to another worker.
+GRADING_JOB_LEASE = float(os.getenv("GRADING_JOB_LEASE", "900"))
+GRADING_JOB_MAX_ATTEMPTS = int(os.getenv("GRADING_JOB_MAX_ATTEMPTS", "3"))
+# Seconds finished jobs stay available for polling.
+GRADING_JOB_RETENTION = float(os.getenv("GRADING_JOB_RETENTION", "604800"))
+# Largest number of essays accepted in one POST /grade-jobs.
+GRADING_MAX_BATCH_JOBS = int(os.getenv("GRADING_MAX_BATCH_JOBS", "500"))
+GRADING_JOB_FIELDS = ('rubric', 'essay', 'prompt', 'old_essays', 'teacher_id')
+# Start this process's job workers at startup, so jobs left queued by a restart
+# resume on their own. gunicorn.conf.py turns it off for the master and starts
+# them in each worker after the fork instead.
+GRADING_JOB_AUTOSTART = os.getenv("GRADING_JOB_AUTOSTART", "true").lower() != "false"
+# Open GET /grade-jobs/batch/<id>?stream connections per process (each holds a
+# thread), and seconds one stays open before the client is told to reconnect.
+GRADING_STREAM_CONCURRENCY = int(os.getenv("GRADING_STREAM_CONCURRENCY", "2"))
+GRADING_STREAM_DEADLINE = float(os.getenv("GRADING_STREAM_DEADLINE", "300"))
+grading_stream_gate = AdmissionGate("grade-jobs-stream", GRADING_STREAM_CONCURRENCY, 0, GRADING_STREAM_DEADLINE)
+job_queue = None
+
+def run_grading_job(payload):
+    from openai_clients import chat_completion
+
+    messages = build_grading_messages(payload['rubric'], payload['essay'], payload['prompt'],
+                                      payload.get('old_essays', ''), payload.get('teacher_id'))
+    if messages is None:
+        raise ValueError("No relevant context found.")
+    with stage("llm"):
+        response = chat_completion(model="gpt-4o", messages=messages, max_tokens=3000)
+    return {"feedback": response.choices[0].message.content}
+
+def get_job_queue():
+    global job_queue
+    if job_queue is None:
+        from grading_jobs import JobQueue
+        with _grading_lock:
+            if job_queue is None:
+                job_queue = JobQueue(GRADING_JOB_DB, run_grading_job, workers=GRADING_JOB_WORKERS,
+                                     lease_seconds=GRADING_JOB_LEASE, max_attempts=GRADING_JOB_MAX_ATTEMPTS,
+                                     retention_seconds=GRADING_JOB_RETENTION)
+    job_queue.start()
+    return job_queue
+
+def start_grading_job_workers():
+    if not (GRADING_ENABLED and GRADING_JOB_AUTOSTART):
+        return
+    try:
+        get_job_queue()
+    except Exception as e:
+        logging.error(f"Could not start the grading job workers: {str(e)}")
+
+@application.route('/grade-jobs', methods=['POST'])
+def submit_grading_jobs():
+    # Accepts one grading payload, or {"jobs": [...]} where fields given at the
+    # top level (rubric, prompt, old_essays, teacher_id) are shared by every job.
+    try:
+        data = request.json or {}
+        entries = data.get('jobs')
+        if entries is None:
+            entries = [{'essay': data.get('essay'), 'id': data.get('id')}]
+        if not isinstance(entries, list) or not entries:
+            return jsonify({"error": "jobs must be a non-empty list"}), 400
+        if len(entries) > GRADING_MAX_BATCH_JOBS:
+            return jsonify({"error": f"At most {GRADING_MAX_BATCH_JOBS} jobs per request"}), 413
+
+        shared = {field: data[field] for field in GRADING_JOB_FIELDS if field in data and field != 'essay'}
+        payloads = []
+        for position, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                return jsonify({"error": f"Job {position} is not an object"}), 400
+            payload = {field: entry[field] for field in GRADING_JOB_FIELDS if entry.get(field) is not None}
+            merged = {**shared, **payload}
+            if not merged.get('rubric') or not merged.get('essay') or not merged.get('prompt'):
+                return jsonify({"error": f"Missing data for grading job {position}: rubric, essay, or prompt"}), 400
+            if isinstance(merged['essay'], str) and text_too_long(merged['essay']):
+                return jsonify({"error": f"Essay of grading job {position} is longer than {MAX_TEXT_CHARS} characters"}), 413
+            payloads.append(payload)
+
+        batch = get_job_queue().submit(shared, payloads, refs=[entry.get('id') for entry in entries])
+        logging.info(f"Queued {len(payloads)} grading jobs in batch {batch['batch_id']}.")
+        return jsonify(batch), 202
+    except Exception as e:
+        logging.error(f"An error occurred while queueing grading jobs: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@application.route('/grade-jobs/<job_id>', methods=['GET'])
+def get_grading_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@application.route('/grade-jobs/batch/<batch_id>', methods=['GET'])
+def get_grading_batch(batch_id):
+    from grading_jobs import FINISHED
+
+    queue = get_job_queue()
+    jobs = queue.get_batch(batch_id)
+    if jobs is None:
+        return jsonify({"error": "Batch not found"}), 404
+
+    if request.args.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+        # Every open stream holds a thread, so they get a gate of their own.
+        try:
+            slot = grading_stream_gate.acquire()
+        except Overloaded as e:
+            return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+        deadline = time.monotonic() + GRADING_STREAM_DEADLINE if GRADING_STREAM_DEADLINE else None
+
+        def generate():
+            # One "job" event per job as it finishes, then "done" once all have.
+            # A stream open past its deadline ends with "timeout"; reconnecting
+            # replays the jobs that had already finished.
+            reported = set()
+            while True:
+                if deadline is not None and time.monotonic() >= deadline:
+                    yield f"event: timeout\ndata: {json.dumps({'batch_id': batch_id, 'finished': len(reported)})}\n\n"
+                    return
+                current = queue.get_batch(batch_id) or []
+                for job in current:
+                    if job["status"] in FINISHED and job["job_id"] not in reported:
+                        reported.add(job["job_id"])
+                        yield f"event: job\ndata: {json.dumps(job)}\n\n"
+                if len(reported) == len(current):
+                    yield f"event: done\ndata: {json.dumps({'batch_id': batch_id, 'jobs': len(current)})}\n\n"
+                    return
+                yield ": waiting\n\n"
+                time.sleep(1)
+
+        response = Response(generate(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        response.call_on_close(slot.release)
+        return response
+
+    counts = {}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+    return jsonify({"batch_id": batch_id, "counts": counts, "jobs": jobs})
+
+@application.route('/grade-jobs/stats', methods=['GET'])
+def grading_job_stats():
+    return jsonify({**get_job_queue().stats(), "stream_admission": grading_stream_gate.stats()})
+
+if DETECTION_WARMUP == "eager":
+    warm_up()
+elif DETECTION_WARMUP == "background":
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+else:
+    # Models wait for the first request in lazy mode, queued jobs should not.
+    start_grading_job_workers()
 
 if __name__ == '__main__':
     application.run(host='0.0.0.0', port=5001)
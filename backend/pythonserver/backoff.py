@@ -0,0 +1,20 @@
+import random
+from typing import Optional
+
+
+def retry_delay(retry_after: Optional[str], attempt: int, base: float, cap: float) -> float:
+    """
+    Seconds to wait before the next try of a failed request, where attempt
+    counts the retries already made. A usable Retry-After from the server
+    wins; otherwise full-jitter exponential backoff. Never more than cap.
+
+    Also used by the scraper (backend/scraper_http.py) as pythonserver.backoff,
+    so keep it free of server imports.
+    """
+    if retry_after:
+        try:
+            return max(0.0, min(float(retry_after), cap))
+        except ValueError:
+            pass
+    # Full jitter keeps clients that failed together from retrying together.
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,170 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+
+class MicroBatcher:
+    """
+    Collects work items from concurrent callers into shared batches.
+
+    A single worker thread pulls items off a queue and hands them to
+    `predict_fn` in groups of at most `max_batch_size`. A batch is flushed as
+    soon as it is full, or once `max_wait_ms` has passed since its first item
+    arrived, whichever comes first. Every caller gets back one Future per item.
+
+    Args:
+        predict_fn (Callable): Takes a list of items, returns a list of results in the same order
+        max_batch_size (int): Largest batch handed to predict_fn
+        max_wait_ms (float): How long a partially filled batch waits for more items
+        name (str): Label used in logs and stats
+    """
+
+    def __init__(self, predict_fn: Callable[[List], List], max_batch_size: int = 8,
+                 max_wait_ms: float = 10.0, name: str = "batcher"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self._batches = 0
+        self._items = 0
+        self._peak_queue_depth = 0
+        self._cancelled = 0
+        self._batch_sizes = Counter()
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so a child process starts its own worker.
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit(self, items: List) -> List[Future]:
+        """
+        Queues items for batched prediction.
+
+        Args:
+            items (list): Inputs accepted by predict_fn
+
+        Returns:
+            List[Future]: One future per item, resolved with that item's result
+        """
+        self._ensure_worker()
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+
+        depth = self._queue.qsize()
+        if depth > self._peak_queue_depth:
+            self._peak_queue_depth = depth
+        return futures
+
+    def map(self, items: List, timeout: Optional[float] = None) -> List:
+        """
+        Queues items and blocks until all of their results are available.
+
+        If they are not all in within timeout seconds, the items still
+        waiting in the queue are withdrawn and TimeoutError is raised.
+        """
+        futures = self.submit(items)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            return [
+                future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+                for future in futures
+            ]
+        except BaseException:
+            self.cancel(futures)
+            raise
+
+    def cancel(self, futures: List[Future]) -> int:
+        """
+        Withdraws queued items nobody is waiting for; items already in a
+        running batch finish anyway.
+
+        Returns:
+            int: Number of items withdrawn
+        """
+        cancelled = sum(1 for future in futures if future.cancel())
+        if cancelled:
+            with self._lock:
+                self._cancelled += cancelled
+        return cancelled
+
+    def _collect(self) -> List:
+        item = self._queue.get()
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # Drop work whose caller has already given up on it.
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+
+            try:
+                results = self.predict_fn([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logging.error(f"{self.name} batch of {len(batch)} failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def stats(self) -> Dict:
+        """
+        Returns queue depth and batch fill counters for monitoring.
+        """
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            sizes = dict(sorted(self._batch_sizes.items()))
+            cancelled = self._cancelled
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "peak_queue_depth": self._peak_queue_depth,
+            "batches": batches,
+            "items": items,
+            "cancelled": cancelled,
+            "avg_batch_size": items / batches if batches else 0.0,
+            "avg_batch_fill": items / (batches * self.max_batch_size) if batches else 0.0,
+            "batch_sizes": sizes,
+        }
@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+TARGETS = ("chunks_of_900", "predict", "find_real_prob", "ai_detection", "grade_essay")
+
+WORDS = (
+    "the a an and but or because although when while after before if then so also however therefore "
+    "student teacher school class essay story book author character history science experiment data "
+    "evidence argument reason example community family friend summer winter city river forest animal "
+    "plant water energy change problem solution idea question answer result conclusion paragraph "
+    "think believe show explain describe compare improve learn understand remember discover create "
+    "important different difficult interesting clear strong many several every most some few new old "
+    "first second finally really very often always never usually quickly slowly carefully together"
+).split()
+
+
+def synthetic_essay(rng: random.Random) -> str:
+    """
+    One fake student essay. Word counts follow a log-normal distribution with
+    a median near 450 words, like typical middle and high school submissions.
+    """
+    target = int(min(2500, max(60, rng.lognormvariate(6.1, 0.55))))
+    paragraphs = []
+    written = 0
+    while written < target:
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            length = rng.randint(6, 28)
+            words = [rng.choice(WORDS) for _ in range(length)]
+            sentences.append(" ".join(words).capitalize() + rng.choice(".....?"))
+            written += length
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def synthetic_corpus(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [synthetic_essay(rng) for _ in range(size)]
+
+
+def build_tiny_model(path: str, corpus: Sequence[str]) -> str:
+    """
+    Saves a small randomly initialized RoBERTa classifier with a tokenizer
+    trained on corpus. Scores are meaningless, but it exercises the same code
+    (tokenization, windows, padding, batching) as the real detector at a
+    fraction of the cost, with no download.
+    """
+    import torch
+    from tokenizers import ByteLevelBPETokenizer
+    from tokenizers.processors import RobertaProcessing
+    from transformers import PreTrainedTokenizerFast, RobertaConfig, RobertaForSequenceClassification
+
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(corpus, vocab_size=2000,
+                            special_tokens=["<s>", "<pad>", "</s>", "<unk>", "<mask>"])
+    bpe._tokenizer.post_processor = RobertaProcessing(("</s>", bpe.token_to_id("</s>")),
+                                                      ("<s>", bpe.token_to_id("<s>")))
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe._tokenizer, bos_token="<s>", eos_token="</s>",
+                                        pad_token="<pad>", unk_token="<unk>", mask_token="<mask>",
+                                        model_max_length=512)
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = RobertaConfig(vocab_size=len(tokenizer), hidden_size=128, num_hidden_layers=2,
+                           num_attention_heads=2, intermediate_size=512, max_position_embeddings=514,
+                           pad_token_id=tokenizer.pad_token_id, bos_token_id=tokenizer.bos_token_id,
+                           eos_token_id=tokenizer.eos_token_id, num_labels=2)
+    RobertaForSequenceClassification(config).save_pretrained(path)
+    return path
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def run_target(call: Callable[[int], None], requests: int, concurrency: int, warmup: int) -> Dict:
+    """
+    Calls call(i) for i in range(requests) from concurrency threads and
+    summarizes per-call latency (milliseconds) and overall throughput.
+    """
+    # Warm-up calls use the indices after the measured ones.
+    for i in range(warmup):
+        call(requests + i)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            call(i)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(timed, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "requests": requests,
+        "errors": len(errors),
+        "seconds": round(wall, 4),
+        "throughput_per_s": round(len(latencies) / wall, 3) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float) -> Dict:
+    """
+    Relative change of each target against a previous run. Positive latency
+    changes and negative throughput changes are regressions.
+    """
+    comparison = {}
+    for target, current in results.items():
+        previous = baseline.get("results", {}).get(target)
+        if not previous:
+            continue
+        entry = {}
+        for field in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s"):
+            if previous.get(field):
+                entry[field] = round((current[field] - previous[field]) / previous[field], 4)
+        entry["regressed"] = (
+            entry.get("p95_ms", 0.0) > max_regression or entry.get("throughput_per_s", 0.0) < -max_regression
+        )
+        comparison[target] = entry
+    return comparison
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the detection and grading paths offline.")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--requests", type=int, default=100, help="Measured calls per target")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured calls per target")
+    parser.add_argument("--model", default="tiny",
+                        help='"tiny" for a small random stand-in classifier, or a model directory / cached hub id')
+    parser.add_argument("--openai-latency-ms", type=float, default=300.0, help="Latency of the fake OpenAI server")
+    parser.add_argument("--old-essays", type=int, default=20, help="Old essays sent with each /grade-essay call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON here")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Exit 1 if p95 latency grows or throughput drops by more than this fraction")
+    args = parser.parse_args()
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    # Unique essays for every call of every target, so neither the result cache
+    # nor the chunk score cache answers. Each target owns a fixed slice (by its
+    # place in TARGETS), so it scores the same essays whichever targets run.
+    per_target = args.requests + args.warmup
+    corpus = synthetic_corpus(per_target * len(TARGETS) + args.old_essays, args.seed)
+    workdir = tempfile.mkdtemp(prefix="tallyrus-benchmark-")
+
+    from fake_openai import serve_in_thread
+
+    fake_server, fake_url = serve_in_thread(latency_ms=args.openai_latency_ms)
+    model = build_tiny_model(os.path.join(workdir, "model"), corpus) if args.model == "tiny" else args.model
+    os.environ.update({
+        "DETECTION_MODEL": model,
+        "DETECTION_WARMUP": "eager",
+        "OPENAI_BASE_URL": fake_url,
+        "OPENAI_API_KEY": "benchmark",
+        "EMBEDDING_BACKEND": "local",
+        "EMBEDDING_CACHE_PATH": "",
+        "EXEMPLAR_STORE_DIR": os.path.join(workdir, "exemplar_store"),
+        "GRADING_JOB_DB": os.path.join(workdir, "grading_jobs.db"),
+        "DETECTION_CACHE_DB": "",
+    })
+    if args.model != "tiny":
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    import application
+    from werkzeug.serving import make_server
+    import httpx
+
+    app_server = make_server("127.0.0.1", 0, application.application, threaded=True)
+    threading.Thread(target=app_server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{app_server.server_port}"
+    client = httpx.Client(limits=httpx.Limits(max_connections=args.concurrency * 2), timeout=300)
+
+    old_essays = corpus[-args.old_essays:] if args.old_essays else []
+    first_chunks = [application.chunks_of_900(text)[0] for text in corpus]
+
+    def post(path, payload):
+        response = client.post(base_url + path, json=payload)
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise RuntimeError(body["error"])
+
+    calls = {
+        "chunks_of_900": lambda i: application.chunks_of_900(corpus[i]),
+        "predict": lambda i: application.predict(first_chunks[i]),
+        "find_real_prob": lambda i: application.find_real_prob(corpus[i]),
+        "ai_detection": lambda i: post("/ai-detection", {"text": corpus[i]}),
+        "grade_essay": lambda i: post("/grade-essay", {
+            "rubric": "Thesis, evidence, organization, conventions",
+            "essay": corpus[i],
+            "prompt": "Grade this essay against the rubric.",
+            "old_essays": old_essays,
+            "teacher_id": "benchmark-teacher",
+        }),
+    }
+
+    results = {}
+    for target in targets:
+        print(f"Running {target}...", file=sys.stderr)
+        offset = TARGETS.index(target) * per_target
+        results[target] = run_target(lambda i, call=calls[target]: call(offset + i),
+                                     args.requests, args.concurrency, args.warmup)
+
+    import torch
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "model": args.model,
+            "detection_precision": application.model_precision,
+            "detection_chunking": application.DETECTION_CHUNKING,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "openai_latency_ms": args.openai_latency_ms,
+            "old_essays": args.old_essays,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(results, json.load(f), args.max_regression)
+        regressed = any(entry["regressed"] for entry in report["comparison"].values())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    client.close()
+    app_server.shutdown()
+    fake_server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
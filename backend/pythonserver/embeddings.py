@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from metrics import CACHE_REQUESTS
+from sqlite_util import thread_connection
+
+
+class HashingEmbeddingBackend:
+    """
+    Deterministic local embedder for tests, benchmarks and air-gapped runs.
+
+    Words and word bigrams are hashed into `dimension` signed buckets and the
+    result is L2-normalized, so texts that share vocabulary end up close
+    together. No network access and no model download.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+        self.model_name = f"local-hashing-{dimension}"
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimension
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[row, bucket] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+
+class OpenAIEmbeddingBackend:
+    """
+    OpenAI embeddings through the process-wide pooled client in openai_clients.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model_name = model or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        from openai_clients import create_embeddings
+
+        return create_embeddings(texts, self.model_name)
+
+
+class CachedEmbedder:
+    """
+    Embedding front end that remembers every vector it has produced.
+
+    Vectors are stored as float32 blobs in SQLite keyed by (model name, text
+    hash), so repeated texts never reach the backend again, across requests,
+    processes and restarts. Cache misses from one call are deduplicated and
+    sent to the backend as a single batch.
+
+    Args:
+        backend: Object with embed_documents(texts) and a model_name attribute
+        cache_path (str, optional): SQLite file, None to cache in memory for this process only
+    """
+
+    # SQLite limits the number of bound parameters per statement.
+    LOOKUP_BATCH = 500
+
+    def __init__(self, backend, cache_path: Optional[str] = None):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.cache_path = cache_path or ":memory:"
+        self._shared = None
+        self._table_ready = False
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._backend_calls = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.cache_path == ":memory:":
+            # An in-memory database is private to its connection, so share one.
+            if self._shared is None:
+                self._shared = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+                self._create_table(self._shared)
+            return self._shared
+        conn = thread_connection(self.cache_path, timeout=5)
+        if not self._table_ready:
+            self._create_table(conn)
+            self._table_ready = True
+        return conn
+
+    @staticmethod
+    def _create_table(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash))"
+        )
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        conn = self._connect()
+        with self._lock:
+            for start in range(0, len(hashes), self.LOOKUP_BATCH):
+                batch = hashes[start:start + self.LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype="float32")
+        return found
+
+    def _store(self, items: Dict[str, np.ndarray]) -> None:
+        conn = self._connect()
+        with self._lock:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(self.model_name, h, vector.astype("float32").tobytes()) for h, vector in items.items()],
+            )
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        hashes = [self.text_hash(text) for text in texts]
+        try:
+            cached = self._lookup(list(set(hashes)))
+        except sqlite3.Error as e:
+            logging.error(f"Embedding cache read failed: {str(e)}")
+            cached = {}
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = text
+
+        hits = sum(1 for h in hashes if h in cached)
+        with self._lock:
+            self._hits += hits
+            self._misses += len(missing)
+        CACHE_REQUESTS.labels("embeddings", "hit").inc(hits)
+        CACHE_REQUESTS.labels("embeddings", "miss").inc(len(missing))
+        if missing:
+            vectors = self.backend.embed_documents(list(missing.values()))
+            with self._lock:
+                self._backend_calls += 1
+            fresh = {h: np.asarray(vector, dtype="float32") for h, vector in zip(missing, vectors)}
+            cached.update(fresh)
+            try:
+                self._store(fresh)
+            except sqlite3.Error as e:
+                logging.error(f"Embedding cache write failed: {str(e)}")
+
+        return [cached[h].tolist() for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "hits": self._hits,
+                "misses": self._misses,
+                "backend_calls": self._backend_calls,
+            }
+
+
+def make_embedder(backend: Optional[str] = None, cache_path: Optional[str] = None) -> CachedEmbedder:
+    """
+    Builds the embedder selected by EMBEDDING_BACKEND ("openai" or "local").
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "openai")
+    if backend == "local":
+        embedding_backend = HashingEmbeddingBackend(int(os.getenv("EMBEDDING_DIMENSION", "256")))
+    elif backend == "openai":
+        embedding_backend = OpenAIEmbeddingBackend()
+    else:
+        raise ValueError(f"Unknown embedding backend {backend!r}")
+    if cache_path is None:
+        cache_path = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+    return CachedEmbedder(embedding_backend, cache_path or None)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from cachetools import LRUCache
+
+from result_cache import normalize_text
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class ExemplarIndex:
+    """
+    FAISS index over previously graded essays, deduplicated by content hash.
+
+    Vectors are L2-normalized before they are added, so L2 distance ranks
+    results the same way cosine similarity would. Position i in the index
+    holds the vector for hashes[i]. The essays themselves are not kept:
+    callers map the hashes search returns back to the texts they hold.
+    """
+
+    def __init__(self, index=None, hashes: Optional[List[str]] = None):
+        self.index = index
+        self.hashes = hashes or []
+        self.positions = {h: i for i, h in enumerate(self.hashes)}
+
+    def missing(self, texts: Sequence[str]) -> bool:
+        return any(content_hash(text) not in self.positions for text in texts)
+
+    def copy(self) -> "ExemplarIndex":
+        index = faiss.clone_index(self.index) if self.index is not None else None
+        return ExemplarIndex(index, list(self.hashes))
+
+    def add(self, texts: Sequence[str], embed_fn: EmbedFn) -> int:
+        """
+        Embeds and adds only the texts that are not in the index yet.
+
+        Returns:
+            int: Number of texts that were embedded and added
+        """
+        new_texts = []
+        new_hashes = []
+        for text in texts:
+            h = content_hash(text)
+            if h in self.positions or h in new_hashes:
+                continue
+            new_texts.append(text)
+            new_hashes.append(h)
+        if not new_texts:
+            return 0
+
+        vectors = np.array(embed_fn(new_texts), dtype="float32")
+        faiss.normalize_L2(vectors)
+        if self.index is None:
+            self.index = faiss.IndexFlatL2(vectors.shape[1])
+        self.index.add(vectors)
+        for h in new_hashes:
+            self.positions[h] = len(self.hashes)
+            self.hashes.append(h)
+        return len(new_texts)
+
+    def search(self, query_vector: Sequence[float], k: int = 1,
+               only: Optional[Sequence[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (content hash, distance) pairs closest to the query.
+
+        Args:
+            query_vector: Embedding of the essay being graded
+            k (int): Number of results
+            only (list, optional): Restrict results to texts with these content hashes
+        """
+        if self.index is None or self.index.ntotal == 0:
+            return []
+        query = np.array([query_vector], dtype="float32")
+        faiss.normalize_L2(query)
+
+        params = None
+        if only is not None:
+            ids = np.array(sorted({self.positions[h] for h in only if h in self.positions}), dtype="int64")
+            if len(ids) == 0:
+                return []
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+            k = min(k, len(ids))
+        k = min(k, self.index.ntotal)
+
+        distances, indices = self.index.search(query, k, params=params)
+        return [
+            (self.hashes[i], float(d))
+            for d, i in zip(distances[0], indices[0])
+            if i != -1
+        ]
+
+
+class ExemplarStore:
+    """
+    Persistent per-teacher ExemplarIndex files under root_dir.
+
+    Each teacher gets index.faiss (memory-mapped on load) and meta.json with
+    the content hashes, never the students' essays. Writes go to a temporary file followed by
+    an atomic rename, and a worker reloads a teacher's index whenever another
+    process has rewritten it.
+    """
+
+    def __init__(self, root_dir: str, max_loaded: int = 256):
+        self.root_dir = root_dir
+        self._loaded = LRUCache(maxsize=max_loaded)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _teacher_dir(self, teacher_id: str) -> str:
+        # Teacher ids come from the request, so never use them as a path directly.
+        name = hashlib.sha256(str(teacher_id).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.root_dir, name)
+
+    def _lock(self, teacher_id: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(teacher_id, threading.Lock())
+
+    def _load(self, teacher_id: str) -> ExemplarIndex:
+        directory = self._teacher_dir(teacher_id)
+        meta_path = os.path.join(directory, "meta.json")
+        index_path = os.path.join(directory, "index.faiss")
+
+        # A writer renames index.faiss just before meta.json, so a mismatch
+        # usually means we caught it in between; read once more before giving up.
+        for _ in range(2):
+            try:
+                mtime = os.path.getmtime(meta_path)
+            except OSError:
+                mtime = None
+            with self._guard:
+                cached = self._loaded.get(teacher_id)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            if mtime is None:
+                exemplars = ExemplarIndex()
+                break
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+            exemplars = ExemplarIndex(index, meta["hashes"])
+            if index.ntotal == len(exemplars.hashes):
+                break
+        else:
+            logging.warning(f"Exemplar index for {directory} is out of sync with its metadata, rebuilding")
+            exemplars = ExemplarIndex()
+
+        with self._guard:
+            self._loaded[teacher_id] = (mtime, exemplars)
+        return exemplars
+
+    def _save(self, teacher_id: str, exemplars: ExemplarIndex) -> None:
+        directory = self._teacher_dir(teacher_id)
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, "index.faiss")
+        meta_path = os.path.join(directory, "meta.json")
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+        faiss.write_index(exemplars.index, index_path + suffix)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump({"hashes": exemplars.hashes}, f)
+        # The index goes first: meta.json's mtime is what readers watch.
+        os.replace(index_path + suffix, index_path)
+        os.replace(meta_path + suffix, meta_path)
+        with self._guard:
+            self._loaded[teacher_id] = (os.path.getmtime(meta_path), exemplars)
+
+    def get(self, teacher_id: str, texts: Sequence[str], embed_fn: EmbedFn) -> ExemplarIndex:
+        """
+        Returns the teacher's index after adding any of texts it has not seen.
+
+        New texts go into a copy that then replaces the cached index, so
+        requests still searching the previous one are never disturbed.
+        """
+        with self._lock(teacher_id):
+            exemplars = self._load(teacher_id)
+            if exemplars.missing(texts):
+                exemplars = exemplars.copy()
+                added = exemplars.add(texts, embed_fn)
+                self._save(teacher_id, exemplars)
+                logging.info(f"Added {added} new exemplars; teacher index now holds {len(exemplars.hashes)}")
+            return exemplars
@@ -0,0 +1,180 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+from embeddings import HashingEmbeddingBackend
+
+
+def create_app(latency_ms: float = 0.0, fail_rate: float = 0.0, fail_status: int = 429,
+               embedding_dimension: int = 1536, seed: int = 0, token_latency_ms: float = 0.0,
+               fail_first: int = 0, retry_after: float = 0.0) -> Flask:
+    """
+    Minimal stand-in for the OpenAI chat completions and embeddings APIs.
+
+    Responses are deterministic for a given input. Every request waits
+    latency_ms, and the first fail_first requests plus a fail_rate share of
+    the rest answer with fail_status, so clients can be exercised against
+    rate limits and outages offline.
+    Chat requests with "stream": true get the reply word by word as
+    server-sent chunks, token_latency_ms apart. GET /stats reports request
+    counts and the peak number in flight.
+
+    Args:
+        latency_ms (float): Delay added to each request
+        fail_rate (float): Probability in [0, 1] that a request fails
+        fail_status (int): HTTP status returned for injected failures
+        embedding_dimension (int): Length of returned embedding vectors
+        seed (int): Seed for the failure injection
+        token_latency_ms (float): Delay between streamed chunks
+        fail_first (int): Number of requests, counted from startup, that always fail
+        retry_after (float): Retry-After seconds sent with injected 429s
+    """
+    app = Flask(__name__)
+    embedder = HashingEmbeddingBackend(embedding_dimension)
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    stats = {"chat": 0, "embeddings": 0, "failures": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    def begin(endpoint):
+        with lock:
+            stats[endpoint] += 1
+            stats["in_flight"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+            failed = stats["chat"] + stats["embeddings"] <= fail_first or rng.random() < fail_rate
+            if failed:
+                stats["failures"] += 1
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return failed
+
+    def end():
+        with lock:
+            stats["in_flight"] -= 1
+
+    def failure():
+        response = jsonify({"error": {"message": "Injected failure", "type": "fake_error"}})
+        response.status_code = fail_status
+        if fail_status == 429:
+            response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    def stream_chunks(digest, model, content):
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if i and token_latency_ms:
+                time.sleep(token_latency_ms / 1000)
+            chunk = {
+                "id": f"chatcmpl-{digest}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": "stop" if i == len(words) - 1 else None,
+                }],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        streaming = False
+        try:
+            if begin("chat"):
+                return failure()
+            data = request.json
+            last = data["messages"][-1]["content"]
+            digest = hashlib.sha256(last.encode("utf-8")).hexdigest()[:12]
+            content = f"Fake feedback {digest} for a {len(last.split())}-word prompt."
+            if data.get("stream"):
+                response = Response(stream_chunks(digest, data.get("model", "gpt-4o"), content),
+                                    mimetype="text/event-stream")
+                # The chunks are sent after this returns; the request is in
+                # flight until the body has been sent or the client hangs up.
+                response.call_on_close(end)
+                streaming = True
+                return response
+            return jsonify({
+                "id": f"chatcmpl-{digest}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": data.get("model", "gpt-4o"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": len(last.split()), "completion_tokens": 8, "total_tokens": len(last.split()) + 8},
+            })
+        finally:
+            if not streaming:
+                end()
+
+    @app.route('/v1/embeddings', methods=['POST'])
+    def embeddings():
+        try:
+            if begin("embeddings"):
+                return failure()
+            data = request.json
+            texts = data["input"]
+            if isinstance(texts, str):
+                texts = [texts]
+            vectors = embedder.embed_documents(texts)
+            return jsonify({
+                "object": "list",
+                "model": data.get("model", "text-embedding-ada-002"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": vector}
+                    for i, vector in enumerate(vectors)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+        finally:
+            end()
+
+    @app.route('/stats', methods=['GET'])
+    def get_stats():
+        with lock:
+            return jsonify(dict(stats))
+
+    return app
+
+
+def serve_in_thread(port: int = 0, **options):
+    """
+    Runs the stub on a background thread.
+
+    Returns:
+        tuple: The werkzeug server (call shutdown() when done) and its base URL
+        for OPENAI_BASE_URL
+    """
+    server = make_server("127.0.0.1", port, create_app(**options), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAI API for tests and benchmarks.")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--embedding-dimension", type=int, default=1536)
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.fail_rate, args.fail_status, args.embedding_dimension,
+                     token_latency_ms=args.token_latency_ms)
+    print(f"Set OPENAI_BASE_URL=http://127.0.0.1:{args.port}/v1")
+    app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
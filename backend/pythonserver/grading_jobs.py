@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlite_util import thread_connection
+
+JobHandler = Callable[[Dict], Dict]
+
+FINISHED = ("done", "failed")
+
+
+class JobQueue:
+    """
+    Persistent grading job queue in SQLite with a pool of worker threads.
+
+    Jobs are submitted in batches; fields shared by a batch (rubric, prompt,
+    old essays) are stored once on the batch and merged into each job's own
+    payload when it runs. A worker claims a job by leasing it for
+    lease_seconds. Jobs whose lease ran out (the process died mid-job) go
+    back to the queue until they have been attempted max_attempts times,
+    so work survives restarts. Several processes may share one database.
+
+    Args:
+        db_path (str): SQLite file holding the queue
+        handler: Called with a job's merged payload, returns its result dict
+        workers (int): Number of worker threads in this process
+        lease_seconds (float): How long a claimed job may run before another worker may take it over
+        max_attempts (int): Claims allowed per job before it is marked failed
+        retention_seconds (float): How long finished jobs are kept
+    """
+
+    # How often idle workers look for jobs submitted by other processes.
+    POLL_SECONDS = 1.0
+
+    def __init__(self, db_path: str, handler: JobHandler, workers: int = 4, lease_seconds: float = 900,
+                 max_attempts: int = 3, retention_seconds: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.handler = handler
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self._wakeup = threading.Condition()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._connect().executescript(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            " id TEXT PRIMARY KEY, shared TEXT NOT NULL, created REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, batch_id TEXT NOT NULL, ref TEXT, position INTEGER NOT NULL,"
+            " status TEXT NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL,"
+            " created REAL NOT NULL, started REAL, finished REAL);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);"
+            "CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id, position);"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = thread_connection(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def start(self) -> None:
+        """
+        Starts this process's workers. Safe to call on every request; a
+        forked child starts its own pool since threads do not survive fork.
+        """
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f"grading-job-{i}", daemon=True).start()
+            self._started_pid = os.getpid()
+            logging.info(f"Started {self.workers} grading job workers")
+
+    def submit(self, shared: Dict, payloads: Sequence[Dict], refs: Optional[Sequence] = None) -> Dict:
+        """
+        Queues one job per payload.
+
+        Returns:
+            dict: batch_id and the jobs as [{"job_id", "ref"}] in submission order
+        """
+        refs = refs or [None] * len(payloads)
+        now = time.time()
+        batch_id = uuid.uuid4().hex
+        jobs = [{"job_id": uuid.uuid4().hex, "ref": ref} for ref in refs]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO batches (id, shared, created) VALUES (?, ?, ?)",
+                         (batch_id, json.dumps(shared), now))
+            conn.executemany(
+                "INSERT INTO jobs (id, batch_id, ref, position, status, payload, created)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                [
+                    (job["job_id"], batch_id, None if job["ref"] is None else json.dumps(job["ref"]),
+                     position, json.dumps(payload), now)
+                    for position, (job, payload) in enumerate(zip(jobs, payloads))
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._wakeup:
+            self._wakeup.notify(len(jobs))
+        return {"batch_id": batch_id, "jobs": jobs}
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs that used up their attempts while being retried are given up on.
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Gave up after repeated interrupted attempts',"
+                " finished = ? WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT jobs.*, batches.shared FROM jobs JOIN batches ON batches.id = jobs.batch_id"
+                " WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY created, position LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, started = ?"
+                    " WHERE id = ?",
+                    (now + self.lease_seconds, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finish(self, job_id: str, result: Optional[Dict], error: Optional[str]) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, lease_until = NULL WHERE id = ?",
+            ("failed" if error else "done", None if result is None else json.dumps(result),
+             error, time.time(), job_id),
+        )
+
+    def _prune(self) -> None:
+        conn = self._connect()
+        cutoff = time.time() - self.retention_seconds
+        conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (cutoff,))
+        conn.execute("DELETE FROM batches WHERE NOT EXISTS (SELECT 1 FROM jobs WHERE jobs.batch_id = batches.id)")
+
+    def _work(self) -> None:
+        last_prune = 0.0
+        while True:
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                logging.error(f"Could not claim a grading job: {str(e)}")
+                row = None
+            if row is None:
+                if time.time() - last_prune > 3600:
+                    last_prune = time.time()
+                    try:
+                        self._prune()
+                    except sqlite3.Error as e:
+                        logging.error(f"Could not prune grading jobs: {str(e)}")
+                with self._wakeup:
+                    self._wakeup.wait(self.POLL_SECONDS)
+                continue
+
+            payload = {**json.loads(row["shared"]), **json.loads(row["payload"])}
+            started = time.perf_counter()
+            try:
+                result, error = self.handler(payload), None
+            except Exception as e:
+                result, error = None, str(e)
+                logging.error(f"Grading job {row['id']} failed: {error}")
+            try:
+                self._finish(row["id"], result, error)
+            except sqlite3.Error as e:
+                # The lease runs out and another worker retries the job.
+                logging.error(f"Could not record the result of grading job {row['id']}: {str(e)}")
+                continue
+            logging.info(f"Grading job {row['id']} finished in {time.perf_counter() - started:.2f}s")
+
+    @staticmethod
+    def _ref(stored: Optional[str]):
+        # Refs are stored as JSON so 7 comes back as 7, not "7". Rows queued
+        # before that hold the plain string.
+        if stored is None:
+            return None
+        try:
+            return json.loads(stored)
+        except ValueError:
+            return stored
+
+    @staticmethod
+    def _describe(row: sqlite3.Row) -> Dict:
+        job = {
+            "job_id": row["id"],
+            "batch_id": row["batch_id"],
+            "ref": JobQueue._ref(row["ref"]),
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT id, batch_id, ref, status, attempts, created, started, finished, result, error"
+            " FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return self._describe(row) if row is not None else None
+
+    def get_batch(self, batch_id: str) -> Optional[List[Dict]]:
+        rows = self._connect().execute(
+            "SELECT id, batch_id, ref, status, attempts, created, started, finished, result, error"
+            " FROM jobs WHERE batch_id = ? ORDER BY position",
+            (batch_id,),
+        ).fetchall()
+        return [self._describe(row) for row in rows] or None
+
+    def stats(self) -> Dict:
+        counts = dict(self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": self.workers, **{status: counts.get(status, 0)
+                                            for status in ("queued", "running", "done", "failed")}}
@@ -0,0 +1,77 @@
+# Production serving: gunicorn -c gunicorn.conf.py application:application
+#
+# The app is imported and the detector loaded and warmed up once in the
+# master process. Workers are forked from it afterwards, so they share the
+# model weights copy-on-write instead of each loading their own copy.
+import gc
+import logging
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("GUNICORN_WORKERS", str(min(os.cpu_count() or 1, 4))))
+# Threads let one worker batch concurrent detection requests together and
+# keep serving while others wait on OpenAI or stream responses. Grading may
+# hold GRADING_CONCURRENCY + GRADING_QUEUE of them; the rest stay free for detection.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot build up; the jitter
+# keeps them from all restarting at the same moment.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+# Heartbeat files on tmpfs, so a slow container disk cannot stall workers.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Inference threads per worker: the cores split between workers, unless set.
+worker_torch_threads = int(os.getenv("DETECTION_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+
+# Metrics from every worker are written under PROMETHEUS_MULTIPROC_DIR and
+# summed by /metrics; start each run from an empty directory.
+metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if metrics_dir:
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):
+        if name.endswith(".db"):
+            os.remove(os.path.join(metrics_dir, name))
+
+# Load the model before forking rather than in a background thread, and keep
+# the master to one torch thread so no OpenMP pool exists when it forks.
+os.environ["DETECTION_WARMUP"] = "eager"
+os.environ["DETECTION_THREADS"] = "1"
+# Grading job workers are threads too: none in the master, each worker starts its own.
+os.environ["GRADING_JOB_AUTOSTART"] = "false"
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so collections
+    # in the workers do not write to (and un-share) the master's pages.
+    gc.freeze()
+    server.log.info(f"Forking {workers} workers with {worker_torch_threads} torch threads each")
+
+
+def post_fork(server, worker):
+    os.environ["DETECTION_THREADS"] = str(worker_torch_threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(worker_torch_threads)
+    application = sys.modules.get("application")
+    if application is not None and application.GRADING_ENABLED:
+        try:
+            application.get_job_queue()
+        except Exception as e:
+            server.log.error(f"Could not start grading job workers in worker {worker.pid}: {str(e)}")
+
+
+def worker_exit(server, worker):
+    logging.info(f"Worker {worker.pid} exiting after {worker.nr} requests")
+
+
+def child_exit(server, worker):
+    if metrics_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,108 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+# With PROMETHEUS_MULTIPROC_DIR set (as under gunicorn) prometheus_client
+# keeps values in files there, and /metrics sums them over all workers.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+STAGE_SECONDS = Histogram(
+    "tallyrus_stage_seconds",
+    "Time spent in each stage of AI detection and grading",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+REQUEST_SECONDS = Histogram(
+    "tallyrus_request_seconds",
+    "HTTP request latency until the response starts",
+    ["endpoint", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+REQUEST_TEXT_CHARS = Histogram(
+    "tallyrus_request_text_chars",
+    "Characters of text submitted per document",
+    ["endpoint"],
+    buckets=(100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+)
+DETECTION_CHUNKS = Histogram(
+    "tallyrus_detection_chunks",
+    "Classifier chunks per scored document",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+DETECTION_BATCH_SIZE = Histogram(
+    "tallyrus_detection_batch_size",
+    "Chunks per classifier forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+CACHE_REQUESTS = Counter(
+    "tallyrus_cache_requests",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+OPENAI_REQUESTS = Counter(
+    "tallyrus_openai_requests",
+    "OpenAI API calls by endpoint and outcome (ok, retry or error)",
+    ["endpoint", "outcome"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "tallyrus_admission_rejections",
+    "Requests turned away with 429 by endpoint gate and reason (full queue or timeout)",
+    ["gate", "reason"],
+)
+GRADING_PASSAGES = Histogram(
+    "tallyrus_grading_context_passages",
+    "Old essay passages packed into each grading prompt",
+    buckets=(0, 1, 2, 4, 8, 16, 32),
+)
+
+# Stage timings of the request being handled on this thread, if any.
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a block into tallyrus_stage_seconds and, inside a request, into
+    that request's Server-Timing entries. Repeated stages add up.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def begin_request() -> None:
+    _request_timings.set({})
+
+
+def request_timings() -> Dict[str, float]:
+    return _request_timings.get() or {}
+
+
+def server_timing_header(total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in request_timings().items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def render():
+    """
+    Returns the Prometheus text exposition body and its content type.
+    """
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
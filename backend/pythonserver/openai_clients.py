@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+import openai
+
+import admission
+from admission import DeadlineExceeded
+from backoff import retry_delay
+from metrics import OPENAI_REQUESTS
+
+# Point at a compatible server instead of api.openai.com, e.g. fake_openai.py in tests.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Keep-alive connections shared by every request in this process.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+# Requests allowed in flight at once, per endpoint.
+OPENAI_CONCURRENCY = {
+    "chat": int(os.getenv("OPENAI_CHAT_CONCURRENCY", "8")),
+    "embeddings": int(os.getenv("OPENAI_EMBEDDING_CONCURRENCY", "4")),
+}
+# Retries on 429/5xx/connection errors, with full-jitter exponential backoff.
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+# The API rejects embedding requests with more inputs than this.
+EMBEDDING_REQUEST_LIMIT = 2048
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_stats = {"requests": 0, "retries": 0, "failures": 0}
+
+
+def get_client() -> openai.OpenAI:
+    """
+    Process-wide OpenAI client over one keep-alive connection pool.
+
+    A forked worker builds its own client, since sockets inherited from the
+    parent cannot be shared safely.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                http_client = openai.DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                    ),
+                )
+                _client = openai.OpenAI(
+                    api_key=os.environ["OPENAI_API_KEY"],
+                    base_url=OPENAI_BASE_URL,
+                    timeout=OPENAI_TIMEOUT,
+                    # Retries happen in call_with_retries so they respect the semaphores.
+                    max_retries=0,
+                    http_client=http_client,
+                )
+                _semaphores.clear()
+                _client_pid = os.getpid()
+    return _client
+
+
+def _semaphore(endpoint: str) -> threading.BoundedSemaphore:
+    with _lock:
+        if endpoint not in _semaphores:
+            _semaphores[endpoint] = threading.BoundedSemaphore(OPENAI_CONCURRENCY.get(endpoint, 4))
+        return _semaphores[endpoint]
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying after error, or None if it should not be retried.
+    """
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after")
+    elif isinstance(error, openai.APIConnectionError):
+        retry_after = None
+    else:
+        return None
+    return retry_delay(retry_after, attempt, OPENAI_BACKOFF_BASE, OPENAI_BACKOFF_MAX)
+
+
+def _backoff(endpoint: str, error: Exception, attempt: int, deadline: Optional[float] = None) -> None:
+    # Re-raises errors that should not (or can no longer) be retried, otherwise sleeps.
+    delay = _retry_delay(error, attempt)
+    past_deadline = delay is not None and deadline is not None and time.monotonic() + delay >= deadline
+    if delay is None or attempt >= OPENAI_MAX_RETRIES or past_deadline:
+        with _lock:
+            _stats["failures"] += 1
+        OPENAI_REQUESTS.labels(endpoint, "error").inc()
+        if past_deadline:
+            raise DeadlineExceeded("Request deadline exceeded before OpenAI could be retried") from error
+        raise error
+    with _lock:
+        _stats["retries"] += 1
+    OPENAI_REQUESTS.labels(endpoint, "retry").inc()
+    logging.warning(f"OpenAI {endpoint} request failed ({str(error)}), retry {attempt + 1} in {delay:.2f}s")
+    time.sleep(delay)
+
+
+def _acquire(endpoint: str, deadline: Optional[float]) -> threading.BoundedSemaphore:
+    # Waits for a concurrency slot, but not past the deadline.
+    semaphore = _semaphore(endpoint)
+    if not semaphore.acquire(timeout=admission.time_left(deadline)):
+        raise DeadlineExceeded(f"Request deadline exceeded waiting for an OpenAI {endpoint} slot")
+    return semaphore
+
+
+def _with_deadline(kwargs: Dict, deadline: Optional[float]) -> Dict:
+    # An attempt may not outlast the request it serves.
+    left = admission.time_left(deadline)
+    if left is None:
+        return kwargs
+    return {**kwargs, "timeout": min(left, kwargs.get("timeout") or OPENAI_TIMEOUT)}
+
+
+def call_with_retries(endpoint: str, fn: Callable, *args, **kwargs):
+    """
+    Calls fn under the endpoint's concurrency limit, retrying rate limits,
+    server errors and dropped connections. The slot is released while
+    backing off so other requests can use it.
+
+    Inside a request with a deadline (see admission.py), waiting for a slot,
+    each attempt's timeout and the backoff between attempts all stop at the
+    deadline, and DeadlineExceeded is raised instead of trying again.
+    """
+    deadline = admission.current_deadline()
+    attempt = 0
+    while True:
+        semaphore = _acquire(endpoint, deadline)
+        try:
+            with _lock:
+                _stats["requests"] += 1
+            result, error = fn(*args, **_with_deadline(kwargs, deadline)), None
+        except Exception as e:
+            error = e
+        finally:
+            semaphore.release()
+        if error is None:
+            OPENAI_REQUESTS.labels(endpoint, "ok").inc()
+            return result
+        _backoff(endpoint, error, attempt, deadline)
+        attempt += 1
+
+
+def chat_completion(**kwargs):
+    return call_with_retries("chat", get_client().chat.completions.create, **kwargs)
+
+
+def stream_chat_completion(deadline: Optional[float] = None, **kwargs) -> Iterator[str]:
+    """
+    Yields the completion's text as it is generated.
+
+    Opening the stream is retried like any other call; once tokens have
+    been yielded a failure is raised to the caller. The chat concurrency
+    slot is held until the stream ends. The stream is cut off with
+    DeadlineExceeded once deadline (a time.monotonic() value, usually the
+    request's, captured before the response started) has passed.
+    """
+    # Building the client resets the semaphores, so do it before taking a slot.
+    client = get_client()
+    attempt = 0
+    while True:
+        semaphore = _acquire("chat", deadline)
+        try:
+            with _lock:
+                _stats["requests"] += 1
+            stream = client.chat.completions.create(stream=True, **_with_deadline(kwargs, deadline))
+            OPENAI_REQUESTS.labels("chat", "ok").inc()
+            break
+        except Exception as e:
+            semaphore.release()
+            _backoff("chat", e, attempt, deadline)
+            attempt += 1
+
+    try:
+        for chunk in stream:
+            admission.time_left(deadline)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+        semaphore.release()
+
+
+def create_embeddings(texts: Sequence[str], model: str) -> List[List[float]]:
+    vectors = []
+    for start in range(0, len(texts), EMBEDDING_REQUEST_LIMIT):
+        response = call_with_retries(
+            "embeddings",
+            get_client().embeddings.create,
+            model=model,
+            input=list(texts[start:start + EMBEDDING_REQUEST_LIMIT]),
+        )
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return vectors
+
+
+def stats() -> Dict:
+    with _lock:
+        return dict(_stats)
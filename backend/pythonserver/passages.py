@@ -0,0 +1,119 @@
+import logging
+import re
+import threading
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+# Blank lines separate essays in the legacy concatenated old_essays string
+# and separate feedback blocks inside a graded essay.
+BLOCK_BOUNDARY = re.compile(r'\n\s*\n')
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.?!])\s+')
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.encoding_for_model("gpt-4o")
+                except Exception as e:
+                    # tiktoken downloads its vocabulary on first use; offline we estimate instead.
+                    _encoding_failed = True
+                    logging.warning(f"tiktoken encoding unavailable, estimating token counts: {str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Number of GPT-4o tokens in text, or a 4-characters-per-token estimate
+    when the tiktoken vocabulary cannot be loaded.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_long_block(block: str, max_tokens: int) -> List[str]:
+    # A single block over the limit is cut at sentence ends, then packed back up.
+    pieces = []
+    current = []
+    current_tokens = 0
+    for sentence in SENTENCE_BOUNDARY.split(block):
+        tokens = count_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+@lru_cache(maxsize=4096)
+def _split_passages(text: str, max_tokens: int) -> Tuple[str, ...]:
+    text = text.strip()
+    if not text:
+        return ()
+    if count_tokens(text) <= max_tokens:
+        return (text,)
+
+    passages = []
+    for block in BLOCK_BOUNDARY.split(text):
+        block = block.strip()
+        if not block:
+            continue
+        if count_tokens(block) <= max_tokens:
+            passages.append(block)
+        else:
+            passages.extend(_split_long_block(block, max_tokens))
+    return tuple(passages)
+
+
+def split_passages(text: str, max_tokens: int) -> List[str]:
+    """
+    Splits one old essay into retrieval passages.
+
+    An essay that fits in max_tokens is a single passage. A longer one (or
+    a legacy string holding several essays) is split into its blank-line
+    separated blocks, so each essay or feedback block is retrieved on its
+    own; blocks still over the limit are cut at sentence boundaries.
+
+    Args:
+        text (str): Essay text, possibly with teacher feedback
+        max_tokens (int): Largest passage size in tokens
+
+    Returns:
+        list: Passages in document order
+    """
+    return list(_split_passages(text, max_tokens))
+
+
+def pack_context(passages: Sequence[str], budget: int, separator: str = "\n\n") -> Tuple[str, int]:
+    """
+    Joins passages in ranked order while they fit in budget tokens.
+
+    A passage that does not fit is skipped so a smaller, lower-ranked one
+    can still use the remaining space.
+
+    Returns:
+        tuple: The packed context and the number of passages it holds
+    """
+    separator_tokens = count_tokens(separator)
+    chosen = []
+    used = 0
+    for passage in passages:
+        tokens = count_tokens(passage) + (separator_tokens if chosen else 0)
+        if used + tokens > budget:
+            continue
+        chosen.append(passage)
+        used += tokens
+    return separator.join(chosen), len(chosen)
@@ -0,0 +1,134 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+import torch
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+
+def bf16_supported(device: str) -> bool:
+    """
+    Whether bf16 matmuls run natively here rather than being emulated (and slower).
+    """
+    if device == "cuda":
+        return torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def apply_precision(model, precision: str, device: str):
+    """
+    Converts a loaded fp32 classifier to the requested inference precision.
+
+    Args:
+        model: fp32 model already moved to device and in eval mode
+        precision (str): One of "fp32", "int8" (dynamic quantization of Linear layers) or "bf16"
+        device (str): Device the model lives on
+
+    Returns:
+        tuple: The converted model and the precision actually applied, which
+        falls back to "fp32" when the requested mode is unavailable
+    """
+    if precision not in PRECISIONS:
+        logging.warning(f"Unknown precision {precision!r}, using fp32")
+        return model, "fp32"
+
+    if precision == "int8":
+        if device != "cpu":
+            logging.warning("int8 dynamic quantization is CPU only, using fp32")
+            return model, "fp32"
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8), "int8"
+
+    if precision == "bf16":
+        if not bf16_supported(device):
+            logging.warning("bf16 is not supported natively on this machine, using fp32")
+            return model, "fp32"
+        return model.to(torch.bfloat16), "bf16"
+
+    return model, "fp32"
+
+
+def model_size_mb(model) -> float:
+    """
+    Approximate in-memory size of the model's parameters and buffers.
+    """
+    def tensor_bytes(value):
+        # Quantized Linear layers keep their weights in (weight, bias) tuples.
+        if isinstance(value, (tuple, list)):
+            return sum(tensor_bytes(item) for item in value)
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        return 0
+
+    return sum(tensor_bytes(value) for value in model.state_dict().values()) / (1024 * 1024)
+
+
+def compare_scores(texts: List[str], reference: List[float], candidate: List[float],
+                   threshold: float = 0.5) -> Dict:
+    """
+    Summarizes how far candidate Real scores drift from the fp32 reference.
+    A verdict flip is a text that lands on the other side of threshold.
+    """
+    diffs = [abs(a - b) for a, b in zip(reference, candidate)]
+    flips = [
+        index for index, (a, b) in enumerate(zip(reference, candidate))
+        if (a >= threshold) != (b >= threshold)
+    ]
+    return {
+        "documents": len(texts),
+        "max_abs_diff": max(diffs) if diffs else 0.0,
+        "mean_abs_diff": sum(diffs) / len(diffs) if diffs else 0.0,
+        "verdict_flips": len(flips),
+        "flipped_documents": flips,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare AI detection scores at a reduced precision against fp32.")
+    parser.add_argument("--precision", choices=[p for p in PRECISIONS if p != "fp32"], default="int8")
+    parser.add_argument("--corpus", default="fixtures/detection_corpus.json",
+                        help="JSON list of {id, text} documents")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Largest acceptable absolute difference in the Real score")
+    args = parser.parse_args()
+
+    # Both models are loaded explicitly below; skip the server's own warm-up.
+    os.environ["DETECTION_WARMUP"] = "lazy"
+    import application
+
+    with open(args.corpus, encoding="utf-8") as f:
+        texts = [document["text"] for document in json.load(f)]
+
+    results = {}
+    for precision in ("fp32", args.precision):
+        tokenizer, model, applied = application.load_detector(precision)
+        if applied != precision:
+            print(f"{precision} is not available on this machine", file=sys.stderr)
+            return 2
+        started = time.perf_counter()
+        scores = [application.score_document(text, detector_model=model)["Real"] for text in texts]
+        results[precision] = {
+            "scores": scores,
+            "seconds": time.perf_counter() - started,
+            "size_mb": model_size_mb(model),
+        }
+
+    report = compare_scores(texts, results["fp32"]["scores"], results[args.precision]["scores"])
+    report["precision"] = args.precision
+    report["speedup"] = results["fp32"]["seconds"] / max(results[args.precision]["seconds"], 1e-9)
+    report["size_mb"] = {precision: round(result["size_mb"], 1) for precision, result in results.items()}
+    print(json.dumps(report, indent=2))
+
+    ok = report["verdict_flips"] == 0 and report["max_abs_diff"] <= args.tolerance
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
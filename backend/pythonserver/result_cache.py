@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Optional
+
+from cachetools import LRUCache, TTLCache
+
+from sqlite_util import thread_connection
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC unicode with whitespace runs collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class ResultCache:
+    """
+    Two-tier cache for JSON-serializable results keyed by content hash.
+
+    The memory tier is a bounded LRU with a TTL and is private to the process.
+    The optional SQLite tier is shared by every process pointing at the same
+    file and survives restarts; it is trimmed to `max_disk_entries` rows by
+    least recent access and expires rows older than `ttl_seconds`.
+
+    Args:
+        name (str): Namespace mixed into every key so caches can share a file
+        max_entries (int): Size of the in-memory LRU tier, 0 to go without it
+        ttl_seconds (float): Age after which an entry is treated as a miss, 0 to disable
+        db_path (str, optional): SQLite file for the shared tier, None to disable it
+        max_disk_entries (int): Row limit for the SQLite tier
+        timer (callable): Clock for entry ages in seconds; tests pass a fake one
+    """
+
+    # Only check the on-disk row limit every so many writes.
+    PRUNE_EVERY = 100
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl_seconds: float = 0,
+                 db_path: Optional[str] = None, max_disk_entries: int = 100000,
+                 timer: Callable[[], float] = time.time):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.timer = timer
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+
+        # cachetools refuses every value once maxsize is 0, so no tier at all.
+        if max_entries <= 0:
+            self._memory = None
+        elif ttl_seconds > 0:
+            self._memory = TTLCache(maxsize=max_entries, ttl=ttl_seconds, timer=timer)
+        else:
+            self._memory = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._writes = 0
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+        if self.db_path:
+            self._connect()
+
+    def make_key(self, *parts: str) -> str:
+        """
+        Hashes the namespace and the given parts into a fixed-size key.
+        """
+        digest = hashlib.sha256(self.name.encode("utf-8"))
+        for part in parts:
+            digest.update(b"\0")
+            digest.update(part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        try:
+            conn = thread_connection(self.db_path, timeout=5)
+            if not self._table_ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+                self._table_ready = True
+        except sqlite3.Error as e:
+            logging.error(f"Could not open result cache {self.db_path}: {str(e)}")
+            return None
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Looks a key up in memory, then on disk. Disk hits are promoted to memory.
+        """
+        with self._lock:
+            if self._memory is not None and key in self._memory:
+                self._memory_hits += 1
+                return self._memory[key]
+
+        value = self._disk_get(key) if self.db_path else None
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            if self._memory is not None:
+                self._memory[key] = value
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self._memory is not None:
+            with self._lock:
+                self._memory[key] = value
+        if self.db_path:
+            self._disk_set(key, value)
+
+    def _disk_get(self, key: str) -> Optional[Any]:
+        conn = self._connect()
+        if conn is None:
+            return None
+        now = self.timer()
+        try:
+            row = conn.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds > 0 and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logging.error(f"Result cache read failed: {str(e)}")
+            return None
+
+    def _disk_set(self, key: str, value: Any) -> None:
+        conn = self._connect()
+        if conn is None:
+            return
+        now = self.timer()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.PRUNE_EVERY == 0
+            if prune:
+                self._prune(conn, now)
+        except sqlite3.Error as e:
+            logging.error(f"Result cache write failed: {str(e)}")
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds > 0:
+            conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,),
+            )
+
+    def stats(self) -> Dict:
+        """
+        Returns hit/miss counters for monitoring.
+        """
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "name": self.name,
+                "memory_entries": len(self._memory) if self._memory is not None else 0,
+                "memory_max_entries": self._memory.maxsize if self._memory is not None else 0,
+                "disk_enabled": bool(self.db_path),
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": (self._memory_hits + self._disk_hits) / lookups if lookups else 0.0,
+            }
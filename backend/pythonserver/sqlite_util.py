@@ -0,0 +1,31 @@
+import os
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def thread_connection(path: str, timeout: float = 30.0) -> sqlite3.Connection:
+    """
+    This thread's connection to the SQLite file at path, opened in WAL mode on
+    first use. sqlite3 connections cannot be shared between threads or carried
+    across a fork, so every thread of every process gets its own.
+
+    Args:
+        path (str): Database file
+        timeout (float): Seconds to wait on another connection's write lock
+
+    Returns:
+        sqlite3.Connection: Autocommit connection, reused by later calls from this thread
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = conn
+    return conn
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+# Criteria written by the scraper's fallback, e.g.
+# "Meets the standard - W.5.1: Demonstrates proficient understanding of <description>".
+FALLBACK_CRITERION = re.compile(r"^[^:]* - (\S+): .*? of (.+)$", re.S)
+
+
+class Standard(NamedTuple):
+    id: str
+    grade: str
+    prefix: str
+    category: str
+    description: str
+
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+
+def normalize_grade(grade: str) -> str:
+    """
+    "Grade 5", "grade5", "05" -> "5"; "Kindergarten" -> "K"; "9-10" stays as is.
+    """
+    grade = re.sub(r"^grade\s*", "", str(grade).strip(), flags=re.I)
+    if grade.lower() in ("k", "kindergarten"):
+        return "K"
+    return grade.lstrip("0") or grade
+
+
+def description_hash(description: str) -> str:
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+
+def read_standards(path: str) -> List[Standard]:
+    """
+    Standards from a rubric template written by webscraperCADOE.py.
+
+    Categories list their standards under "Standards". Files scraped before
+    that field existed are read from the fallback criteria text instead;
+    categories with model-written criteria and no "Standards" list are
+    skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        template = json.load(f)
+
+    standards: Dict[str, Standard] = {}
+    for category in template.get("values", []):
+        name = category.get("name", "")
+        pairs = [(item.get("id"), item.get("description")) for item in category.get("Standards", [])]
+        if "Standards" not in category:
+            for criterion in category.get("Criteria", []):
+                match = FALLBACK_CRITERION.match(criterion.get("description", ""))
+                if match:
+                    pairs.append((match.group(1), match.group(2)))
+        for standard_id, description in pairs:
+            if not standard_id or not description or standard_id in standards:
+                continue
+            parts = standard_id.split(".")
+            grade = normalize_grade(parts[1]) if len(parts) > 1 else ""
+            standards[standard_id] = Standard(standard_id, grade, parts[0], name.split(" - ", 1)[-1], description)
+    return list(standards.values())
+
+
+class StandardsIndex:
+    """
+    Immutable snapshot of the scraped standards.
+
+    Lookups by standard ID, grade and ID prefix ("W", "W.5") are dictionary
+    reads. Descriptions are embedded into a FAISS inner-product index over
+    L2-normalized vectors, so search scores are cosine similarities.
+
+    Args:
+        standards (list): Standards in file order
+        vectors (np.ndarray): One embedding per standard
+    """
+
+    def __init__(self, standards: Sequence[Standard], vectors: np.ndarray):
+        self.standards = list(standards)
+        self.vectors = vectors
+        self.by_id: Dict[str, int] = {}
+        self.by_grade: Dict[str, List[int]] = {}
+        self.by_prefix: Dict[str, List[int]] = {}
+        for position, standard in enumerate(self.standards):
+            self.by_id[standard.id] = position
+            self.by_grade.setdefault(standard.grade, []).append(position)
+            parts = standard.id.split(".")
+            for end in range(1, len(parts)):
+                self.by_prefix.setdefault(".".join(parts[:end]), []).append(position)
+
+        self.index = None
+        if len(self.standards):
+            self.index = faiss.IndexFlatIP(vectors.shape[1])
+            self.index.add(vectors)
+
+    def get(self, standard_id: str) -> Optional[Standard]:
+        position = self.by_id.get(standard_id)
+        return None if position is None else self.standards[position]
+
+    def _positions(self, grade: Optional[str] = None, prefix: Optional[str] = None) -> Optional[List[int]]:
+        # None means no filter; an empty list means nothing matches.
+        if grade is None and prefix is None:
+            return None
+        selected = None
+        if grade is not None:
+            selected = self.by_grade.get(normalize_grade(grade), [])
+        if prefix is not None:
+            by_prefix = self.by_prefix.get(str(prefix).rstrip("."), [])
+            selected = by_prefix if selected is None else sorted(set(selected) & set(by_prefix))
+        return selected
+
+    def filter(self, grade: Optional[str] = None, prefix: Optional[str] = None) -> List[Standard]:
+        positions = self._positions(grade, prefix)
+        if positions is None:
+            return list(self.standards)
+        return [self.standards[position] for position in positions]
+
+    def search(self, query_vector: Sequence[float], k: int = 5, grade: Optional[str] = None,
+               prefix: Optional[str] = None) -> List[Tuple[Standard, float]]:
+        """
+        Returns up to k (standard, cosine similarity) pairs, best first,
+        optionally restricted to a grade and/or ID prefix.
+        """
+        if self.index is None or k <= 0:
+            return []
+        query = np.array([query_vector], dtype="float32")
+        faiss.normalize_L2(query)
+
+        params = None
+        positions = self._positions(grade, prefix)
+        if positions is not None:
+            if not positions:
+                return []
+            ids = np.array(positions, dtype="int64")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+            k = min(k, len(ids))
+        k = min(k, self.index.ntotal)
+
+        scores, indices = self.index.search(query, k, params=params)
+        return [
+            (self.standards[i], float(score))
+            for score, i in zip(scores[0], indices[0])
+            if i != -1
+        ]
+
+
+class StandardsStore:
+    """
+    Keeps a StandardsIndex in step with the scraper's output file.
+
+    Every access compares the file's size and modification time with the
+    ones the current index was built from. When they differ the file is read
+    again and a new index is built; descriptions that were already embedded
+    keep their vectors, so only new or reworded standards reach embed_fn.
+    The new index replaces the old one in a single assignment, and requests
+    that arrive during a rebuild keep answering from the old one.
+
+    Args:
+        path (str): The rubric template written by webscraperCADOE.py
+        embed_fn (callable): Embeds a list of texts
+    """
+
+    def __init__(self, path: str, embed_fn: EmbedFn):
+        self.path = path
+        self.embed_fn = embed_fn
+        self._index: Optional[StandardsIndex] = None
+        self._signature = None
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.stats = {"standards": 0, "builds": 0, "embedded": 0, "reused": 0, "build_seconds": 0.0}
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _build(self, signature) -> None:
+        started = time.perf_counter()
+        standards = read_standards(self.path) if signature is not None else []
+
+        hashes = [description_hash(standard.description) for standard in standards]
+        missing = {}
+        for h, standard in zip(hashes, standards):
+            if h not in self._vectors and h not in missing:
+                missing[h] = standard.description
+        if missing:
+            vectors = np.array(self.embed_fn(list(missing.values())), dtype="float32")
+            faiss.normalize_L2(vectors)
+            self._vectors.update(zip(missing, vectors))
+
+        # Forget vectors of standards that are gone so the map tracks the file.
+        self._vectors = {h: self._vectors[h] for h in hashes}
+        matrix = np.array([self._vectors[h] for h in hashes], dtype="float32")
+        self._index = StandardsIndex(standards, matrix)
+        self._signature = signature
+        self.stats.update(standards=len(standards), builds=self.stats["builds"] + 1, embedded=len(missing),
+                          reused=len(standards) - len(missing),
+                          build_seconds=round(time.perf_counter() - started, 3))
+        logging.info(f"Indexed {len(standards)} standards from {self.path}: "
+                     f"{len(missing)} embedded, {len(standards) - len(missing)} reused")
+
+    def current(self) -> StandardsIndex:
+        """
+        Returns the index for the file as it is now, rebuilding it first if
+        the file changed.
+        """
+        signature = self._file_signature()
+        if self._index is not None and signature == self._signature:
+            return self._index
+        # Someone else is already rebuilding: the previous index will do.
+        if not self._lock.acquire(blocking=self._index is None):
+            return self._index
+        try:
+            if self._index is None or self._signature != signature:
+                try:
+                    self._build(signature)
+                except (OSError, ValueError) as e:
+                    # A broken file keeps the last good index until it is fixed.
+                    if self._index is None:
+                        raise
+                    logging.error(f"Could not reload standards from {self.path}: {str(e)}")
+                    self._signature = signature
+            return self._index
+        finally:
+            self._lock.release()
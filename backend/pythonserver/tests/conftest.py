@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+import time
+import types
+import urllib.request
+
+import pytest
+
+# The server modules live in pythonserver/, next to this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing application must not load the model, start job workers or open
+# files in the working directory.
+os.environ.setdefault("DETECTION_WARMUP", "lazy")
+os.environ.setdefault("GRADING_JOB_AUTOSTART", "false")
+os.environ.setdefault("DETECTION_CACHE_DB", "")
+
+
+@pytest.fixture(scope="session")
+def tiny_tokenizer():
+    """
+    Fast byte-level BPE tokenizer trained on the benchmark's synthetic essays.
+    Offsets are trimmed like RoBERTa's, and the 64-token model limit makes a
+    few paragraphs span several windows.
+    """
+    from tokenizers import ByteLevelBPETokenizer
+    from tokenizers.processors import RobertaProcessing
+    from transformers import PreTrainedTokenizerFast
+
+    from benchmark import synthetic_corpus
+
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(synthetic_corpus(50), vocab_size=1000, show_progress=False,
+                            special_tokens=["<s>", "<pad>", "</s>", "<unk>", "<mask>"])
+    bpe._tokenizer.post_processor = RobertaProcessing(("</s>", bpe.token_to_id("</s>")),
+                                                      ("<s>", bpe.token_to_id("<s>")))
+    return PreTrainedTokenizerFast(tokenizer_object=bpe._tokenizer, bos_token="<s>", eos_token="</s>",
+                                   pad_token="<pad>", unk_token="<unk>", mask_token="<mask>",
+                                   model_max_length=66)
+
+
+@pytest.fixture
+def detector(monkeypatch, tiny_tokenizer):
+    """
+    The application module with tiny_tokenizer in place of the detector's, so
+    chunking runs without loading the model.
+    """
+    import application
+
+    monkeypatch.setattr(application, "tokenizer", tiny_tokenizer)
+    monkeypatch.setattr(application, "model", object())
+    return application
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory):
+    """
+    The benchmark's small random RoBERTa classifier, loaded on the CPU.
+    Returns (path, tokenizer, model).
+    """
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    from benchmark import build_tiny_model, synthetic_corpus
+
+    path = build_tiny_model(str(tmp_path_factory.mktemp("tiny-model")), synthetic_corpus(50))
+    model = AutoModelForSequenceClassification.from_pretrained(path)
+    model.eval()
+    return path, AutoTokenizer.from_pretrained(path), model
+
+
+@pytest.fixture
+def scorer(monkeypatch, tiny_model):
+    """
+    The application module with tiny_model as the detector and empty
+    in-memory detection caches. Windows are 64 tokens so an essay spans
+    several chunks.
+    """
+    import application
+    from result_cache import ResultCache
+
+    path, tokenizer, model = tiny_model
+    monkeypatch.setattr(application, "MODEL_NAME", path)
+    monkeypatch.setattr(application, "device", "cpu")
+    monkeypatch.setattr(application, "tokenizer", tokenizer)
+    monkeypatch.setattr(application, "model", model)
+    monkeypatch.setattr(application, "model_precision", "fp32")
+    monkeypatch.setattr(application, "DETECTION_WINDOW_TOKENS", 64)
+    monkeypatch.setattr(application, "detection_cache", ResultCache("ai-detection"))
+    monkeypatch.setattr(application, "chunk_score_cache", ResultCache("ai-detection-chunks"))
+    return application
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """
+    Starts fake_openai with the given options and points openai_clients at
+    it. Backoff sleeps are recorded in start.sleeps instead of slept, and
+    start returns a reader for the server's /stats.
+    """
+    import openai_clients
+    from fake_openai import serve_in_thread
+
+    servers = []
+    sleeps = []
+
+    def start(**options):
+        server, base_url = serve_in_thread(**options)
+        servers.append(server)
+        monkeypatch.setattr(openai_clients, "OPENAI_BASE_URL", base_url)
+        monkeypatch.setattr(openai_clients, "_client", None)
+
+        def stats():
+            with urllib.request.urlopen(base_url[:-len("/v1")] + "/stats") as response:
+                return json.load(response)
+        return stats
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(openai_clients, "_stats", {"requests": 0, "retries": 0, "failures": 0})
+    monkeypatch.setattr(openai_clients, "time", types.SimpleNamespace(monotonic=time.monotonic, sleep=sleeps.append))
+    start.sleeps = sleeps
+    yield start
+    for server in servers:
+        server.shutdown()
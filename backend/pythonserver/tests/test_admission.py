@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+import application
+from admission import AdmissionGate, Overloaded
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_a_full_queue_is_rejected():
+    gate = AdmissionGate("test", limit=1, queue_size=0)
+    slot = gate.acquire()
+    with pytest.raises(Overloaded) as rejected:
+        gate.acquire()
+    assert rejected.value.reason == "full"
+    assert rejected.value.retry_after == 1
+    assert gate.stats()["rejected_full"] == 1
+
+    slot.release()
+    gate.acquire().release()
+
+
+def test_a_waiter_is_rejected_at_its_deadline():
+    gate = AdmissionGate("test", limit=1, queue_size=1)
+    slot = gate.acquire()
+    started = time.monotonic()
+    with pytest.raises(Overloaded) as rejected:
+        gate.acquire(deadline=started + 0.1)
+    assert rejected.value.reason == "timeout"
+    assert time.monotonic() - started >= 0.1
+    assert gate.stats()["rejected_timeout"] == 1
+    assert gate.stats()["waiting"] == 0
+    slot.release()
+
+
+def test_a_waiter_gets_the_released_slot():
+    gate = AdmissionGate("test", limit=1, queue_size=1)
+    slot = gate.acquire()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(gate.acquire(time.monotonic() + 5)))
+    waiter.start()
+    wait_for(lambda: gate.stats()["waiting"] == 1)
+
+    slot.release()
+    slot.release()
+    waiter.join(5)
+    assert admitted and gate.stats()["running"] == 1
+    admitted[0].release()
+    assert gate.stats()["running"] == 0
+
+
+def test_retry_after_grows_with_the_backlog():
+    gate = AdmissionGate("test", limit=1, queue_size=2)
+    slot = gate.acquire()
+    admitted = []
+    waiters = [threading.Thread(target=lambda: admitted.append(gate.acquire())) for _ in range(2)]
+    for waiter in waiters:
+        waiter.start()
+    wait_for(lambda: gate.stats()["waiting"] == 2)
+
+    # Two waiting plus this request, one at a time, one second each so far.
+    with pytest.raises(Overloaded) as rejected:
+        gate.acquire()
+    assert rejected.value.retry_after == 3
+
+    slot.release()
+    wait_for(lambda: len(admitted) == 1)
+    admitted[0].release()
+    wait_for(lambda: len(admitted) == 2)
+    admitted[1].release()
+
+
+def test_an_overloaded_endpoint_answers_429_with_retry_after(monkeypatch):
+    gate = AdmissionGate("ai-detection", limit=1, queue_size=0)
+    monkeypatch.setitem(application.admission_gates, "ai_detection", gate)
+    slot = gate.acquire()
+
+    response = application.application.test_client().post("/ai-detection", json={"text": "An essay."})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    slot.release()
@@ -0,0 +1,48 @@
+import json
+
+from benchmark import synthetic_corpus
+
+ESSAYS = synthetic_corpus(3, seed=5)
+
+
+def post_batch(client, documents):
+    # Closing the streamed response gives back its admission slot.
+    with client.post("/ai-detection/batch", json={"documents": documents}) as response:
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        return {line["id"]: line for line in map(json.loads, response.get_data(as_text=True).splitlines())}
+
+
+def test_every_document_gets_one_line(scorer, monkeypatch):
+    monkeypatch.setattr(scorer, "MAX_TEXT_CHARS", 5000)
+    lines = post_batch(scorer.application.test_client(), [
+        {"id": "first", "text": ESSAYS[0][:4000]},
+        {"id": "empty", "text": ""},
+        {"id": "long", "text": "word " * 1001},
+        "not a document",
+        {"text": ESSAYS[1][:4000]},
+    ])
+
+    assert lines.keys() == {"first", "empty", "long", 3, 4}
+    assert lines["empty"] == {"id": "empty", "error": "No text provided"}
+    assert lines["long"] == {"id": "long", "error": "Text longer than 5000 characters"}
+    assert lines[3] == {"id": 3, "error": "No text provided"}
+    for doc_id in ("first", 4):
+        assert 0 <= lines[doc_id]["Real"] <= 1
+        assert lines[doc_id]["chunks_computed"] > 0
+
+
+def test_a_text_sent_twice_is_scored_once(scorer):
+    items = scorer.detection_batcher.stats()["items"]
+    lines = post_batch(scorer.application.test_client(), [
+        {"id": "a", "text": ESSAYS[2]},
+        {"id": "b", "text": ESSAYS[2]},
+        {"id": "c", "text": ESSAYS[0]},
+        {"id": "d", "text": ESSAYS[2]},
+    ])
+
+    chunks = lines["a"]["chunks_computed"]
+    assert scorer.detection_batcher.stats()["items"] - items == chunks + lines["c"]["chunks_computed"]
+    for doc_id in ("b", "d"):
+        assert lines[doc_id] == {"id": doc_id, "Real": lines["a"]["Real"], "Fake": lines["a"]["Fake"],
+                                 "chunks_reused": chunks, "chunks_computed": 0}
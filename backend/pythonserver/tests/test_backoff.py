@@ -0,0 +1,15 @@
+from backoff import retry_delay
+
+
+def test_retry_after_wins_up_to_the_cap():
+    assert retry_delay("2.5", 0, base=0.5, cap=20) == 2.5
+    assert retry_delay("120", 0, base=0.5, cap=20) == 20
+    assert retry_delay("-3", 0, base=0.5, cap=20) == 0.0
+
+
+def test_without_retry_after_the_delay_is_jittered_and_grows():
+    for retry_after in (None, "", "Wed, 21 Oct 2015 07:28:00 GMT"):
+        for attempt in range(8):
+            delays = [retry_delay(retry_after, attempt, base=0.5, cap=20) for _ in range(50)]
+            assert all(0 <= delay <= min(20, 0.5 * 2 ** attempt) for delay in delays)
+            assert len(set(delays)) > 1
@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_items_are_batched_and_returned_in_order():
+    batches = []
+
+    def predict(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=50)
+    assert batcher.map(list(range(6))) == [0, 2, 4, 6, 8, 10]
+    assert all(len(batch) <= 4 for batch in batches)
+    assert [item for batch in batches for item in batch] == list(range(6))
+
+
+def test_queued_items_are_withdrawn_on_timeout():
+    started = threading.Event()
+    release = threading.Event()
+    predicted = []
+
+    def predict(items):
+        predicted.extend(items)
+        started.set()
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(predict, max_batch_size=1, max_wait_ms=0)
+    # "a" holds the worker, so "b" and "c" are still queued when map gives up.
+    running = batcher.submit(["a"])
+    assert started.wait(5)
+    with pytest.raises(TimeoutError):
+        batcher.map(["b", "c"], timeout=0.05)
+
+    release.set()
+    assert running[0].result(5) == "a"
+    assert batcher.map(["d"], timeout=5) == ["d"]
+    assert predicted == ["a", "d"]
+    assert batcher.stats()["cancelled"] == 2
+
+
+def test_a_failed_batch_fails_its_callers():
+    def predict(items):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(predict, max_batch_size=2, max_wait_ms=0)
+    with pytest.raises(ValueError):
+        batcher.map(["a"], timeout=5)
@@ -0,0 +1,100 @@
+import json
+
+from benchmark import synthetic_corpus
+
+ESSAY = synthetic_corpus(1, seed=3)[0]
+
+
+# Closing a response gives back its admission slot.
+def detect(client, text, **options):
+    with client.post("/ai-detection", json={"text": text, **options}) as response:
+        assert response.status_code == 200
+        return response.get_json()
+
+
+def detect_batch(client, documents):
+    with client.post("/ai-detection/batch", json={"documents": documents}) as response:
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_a_cache_hit_has_the_same_fields_as_a_fresh_score(scorer):
+    client = scorer.application.test_client()
+    fresh = detect(client, ESSAY)
+    cached = detect(client, ESSAY)
+
+    assert cached.keys() == fresh.keys()
+    assert cached["Real"] == fresh["Real"]
+    assert fresh["chunks_computed"] > 1
+    assert cached["chunks_reused"] == fresh["chunks_reused"] + fresh["chunks_computed"]
+    assert cached["chunks_computed"] == 0
+
+
+def test_a_batch_cache_hit_has_the_same_fields_as_a_fresh_score(scorer):
+    client = scorer.application.test_client()
+    [fresh] = detect_batch(client, [{"id": "a", "text": ESSAY}])
+    [cached] = detect_batch(client, [{"id": "a", "text": ESSAY}])
+
+    assert cached.keys() == fresh.keys()
+    assert cached["Real"] == fresh["Real"]
+    assert cached["chunks_reused"] == fresh["chunks_computed"]
+    assert cached["chunks_computed"] == 0
+    # The batch and single-document endpoints share the document cache.
+    assert detect(client, ESSAY).keys() == fresh.keys() - {"id"}
+
+
+# The longest of a few essays, so adaptive scoring has chunks to skip.
+LONG_ESSAY = max(synthetic_corpus(10, seed=4), key=len)
+
+
+def test_a_cached_adaptive_request_reports_an_exact_score(scorer):
+    client = scorer.application.test_client()
+    fresh = detect(client, LONG_ESSAY, adaptive=True)
+    detect(client, ESSAY)
+    cached = detect(client, ESSAY, adaptive=True)
+
+    assert cached.keys() == fresh.keys()
+    chunks = cached["chunks_reused"]
+    assert cached["adaptive"] == {"chunks_scored": chunks, "chunks_total": chunks,
+                                  "margin": 0.0, "confidence": 0.95}
+
+
+def test_adaptive_scoring_stops_once_the_interval_is_within_the_margin(scorer):
+    full = scorer.adaptive_real_prob(LONG_ESSAY, include_chunks=True, margin=0)
+    total = full["adaptive"]["chunks_total"]
+    assert total > 8
+    assert full["adaptive"] == {"chunks_scored": total, "chunks_total": total, "margin": 0.0, "confidence": 0.95}
+    assert abs(full["Real"] - scorer.find_real_prob(LONG_ESSAY)["Real"]) < 1e-9
+
+    # The interval after the first round, from the same scores in the same order.
+    order = scorer.stratified_order(total)
+    first = [[full["chunks"][i]["Real"], scorer.split_for_detection(LONG_ESSAY)[i].weight] for i in order[:4]]
+    estimate, half_width = scorer.weighted_estimate(first, total)
+
+    stopped = scorer.adaptive_real_prob(LONG_ESSAY, include_chunks=True, margin=half_width, min_chunks=4)
+    assert stopped["adaptive"]["chunks_scored"] == 4
+    assert stopped["adaptive"]["margin"] == half_width
+    assert stopped["Real"] == estimate
+    assert [chunk["start"] for chunk in stopped["chunks"]] == [full["chunks"][i]["start"] for i in sorted(order[:4])]
+
+    # A margin just inside that interval needs another round.
+    more = scorer.adaptive_real_prob(LONG_ESSAY, margin=half_width * 0.999, min_chunks=4)
+    assert more["adaptive"]["chunks_scored"] > 4
+    assert more["adaptive"]["margin"] <= half_width * 0.999
+
+
+def test_adaptive_scoring_needs_two_chunks_for_an_interval(scorer):
+    result = scorer.adaptive_real_prob(LONG_ESSAY, margin=float("inf"), min_chunks=0)
+    assert result["adaptive"]["chunks_scored"] == 2
+    assert result["adaptive"]["confidence"] == 0.95
+
+
+def test_a_revised_draft_reuses_the_scores_of_its_unchanged_windows(scorer):
+    client = scorer.application.test_client()
+    first = detect(client, ESSAY)
+    paragraphs = ESSAY.split("\n\n")
+    paragraphs[0] = "This opening sentence was added in the second draft. " + paragraphs[0]
+    revised = detect(client, "\n\n".join(paragraphs))
+
+    assert revised["chunks_reused"] > 0
+    assert revised["chunks_computed"] < first["chunks_computed"]
@@ -0,0 +1,51 @@
+import threading
+
+from embeddings import CachedEmbedder, HashingEmbeddingBackend
+from sqlite_util import thread_connection
+
+
+class CountingBackend(HashingEmbeddingBackend):
+    def __init__(self):
+        super().__init__(dimension=16)
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_repeated_texts_reach_the_backend_once():
+    backend = CountingBackend()
+    embedder = CachedEmbedder(backend)
+    first = embedder.embed_documents(["a cat", "a dog", "a cat"])
+    assert backend.texts == ["a cat", "a dog"]
+    assert first[0] == first[2]
+    assert embedder.embed_query("a dog") == first[1]
+    assert embedder.stats()["backend_calls"] == 1
+
+
+def test_the_file_cache_survives_a_new_embedder_and_other_threads(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    vectors = CachedEmbedder(CountingBackend(), path).embed_documents(["a cat", "a dog"])
+
+    backend = CountingBackend()
+    embedder = CachedEmbedder(backend, path)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(embedder.embed_documents(["a dog", "a cat"])))
+    thread.start()
+    thread.join(5)
+    assert results == [vectors[::-1]]
+    assert backend.texts == []
+
+
+def test_each_thread_gets_its_own_connection(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = thread_connection(path)
+    assert thread_connection(path) is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(thread_connection(path)))
+    thread.start()
+    thread.join(5)
+    assert other[0] is not conn
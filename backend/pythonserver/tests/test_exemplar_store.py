@@ -0,0 +1,58 @@
+import json
+
+from embeddings import HashingEmbeddingBackend
+from exemplar_store import ExemplarStore, content_hash
+
+ESSAYS = [
+    "The river shaped how the town grew, and the author shows it with maps.",
+    "Summer camp taught me to cook for twenty people at once.",
+    "My grandmother's garden is where I learned to be patient.",
+]
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.backend = HashingEmbeddingBackend(dimension=64)
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return self.backend.embed_documents(texts)
+
+
+def test_an_index_round_trips_through_disk_without_the_essays(tmp_path):
+    embed = CountingEmbedder()
+    exemplars = ExemplarStore(str(tmp_path)).get("teacher-1", ESSAYS, embed)
+    assert embed.calls == [ESSAYS]
+
+    query = embed.backend.embed_documents([ESSAYS[1]])[0]
+    hits = exemplars.search(query, k=2)
+    assert hits[0][0] == content_hash(ESSAYS[1])
+    assert hits[0][1] < 1e-6
+
+    # A new store (another worker, or after a restart) reads the same index.
+    reloaded = ExemplarStore(str(tmp_path)).get("teacher-1", ESSAYS, embed)
+    assert len(embed.calls) == 1
+    assert reloaded.hashes == [content_hash(essay) for essay in ESSAYS]
+    assert reloaded.search(query, k=2) == hits
+
+    [meta_path] = tmp_path.glob("*/meta.json")
+    assert json.loads(meta_path.read_text()) == {"hashes": reloaded.hashes}
+    for path in tmp_path.rglob("*"):
+        if path.is_file():
+            assert b"river" not in path.read_bytes()
+
+
+def test_only_new_essays_are_embedded_and_search_can_be_restricted(tmp_path):
+    store = ExemplarStore(str(tmp_path))
+    embed = CountingEmbedder()
+    store.get("teacher-1", ESSAYS[:2], embed)
+    exemplars = store.get("teacher-1", ESSAYS, embed)
+    assert embed.calls == [ESSAYS[:2], ESSAYS[2:]]
+
+    query = embed.backend.embed_documents([ESSAYS[1]])[0]
+    only = [content_hash(ESSAYS[0]), content_hash(ESSAYS[2])]
+    assert {h for h, _ in exemplars.search(query, k=3, only=only)} == set(only)
+    assert exemplars.search(query, k=3, only=[content_hash("never added")]) == []
+    # Teachers do not see each other's essays.
+    assert store.get("teacher-2", [], embed).search(query, k=3) == []
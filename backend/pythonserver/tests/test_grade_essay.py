@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+OLD_ESSAYS = [
+    "The author shows the river changing the town. Feedback: strong evidence, explain it more.",
+    "Summer camp taught me to cook. Feedback: clear story, the conclusion is rushed.",
+]
+REQUEST = {"rubric": "Evidence and organization", "essay": "The river shaped how the town grew.",
+           "prompt": "Give feedback like the examples.", "old_essays": OLD_ESSAYS}
+
+
+@pytest.fixture
+def grader(monkeypatch):
+    """
+    The application module with the local embedder, so only the chat
+    completion goes to (fake) OpenAI.
+    """
+    import application
+    from embeddings import make_embedder
+
+    monkeypatch.setattr(application, "embedder", make_embedder("local", cache_path=""))
+    return application
+
+
+def sse_events(body):
+    events = []
+    for block in body.split("\n\n"):
+        if block.startswith(":"):
+            events.append(("comment", block[1:].strip()))
+        elif block:
+            fields = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def grade_streamed(grader, **options):
+    # Closing the streamed response gives back its admission slot.
+    with grader.application.test_client().post("/grade-essay", **options) as response:
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        assert response.headers["Cache-Control"] == "no-cache"
+        return sse_events(response.get_data(as_text=True))
+
+
+def test_feedback_streams_as_token_events_then_done(grader, fake_openai):
+    fake_openai()
+    events = grade_streamed(grader, json=REQUEST, headers={"Accept": "text/event-stream"})
+
+    assert events[0] == ("comment", "grading")
+    names = [name for name, _ in events[1:]]
+    assert len(names) > 2
+    assert set(names[:-1]) == {"token"}
+    assert names[-1] == "done"
+    feedback = "".join(payload["delta"] for _, payload in events[1:-1])
+    assert feedback.startswith("Fake feedback")
+    assert events[-1][1] == {"feedback": feedback}
+
+
+def test_an_upstream_failure_ends_the_stream_with_an_error_event(grader, fake_openai):
+    fake_openai(fail_first=1, fail_status=400)
+    events = grade_streamed(grader, json={**REQUEST, "stream": True})
+
+    assert events[0] == ("comment", "grading")
+    assert [name for name, _ in events[1:]] == ["error"]
+    assert "Injected failure" in events[1][1]["error"]
+
+
+def test_a_teacher_index_supplies_the_request_passages_as_context(grader, monkeypatch, tmp_path):
+    from exemplar_store import ExemplarStore
+
+    monkeypatch.setattr(grader, "exemplar_store", ExemplarStore(str(tmp_path)))
+    grader.build_grading_messages("rubric", "An essay.", "prompt", OLD_ESSAYS, teacher_id="t")
+    # The stored index only has hashes; the texts come back from this request.
+    messages = grader.build_grading_messages("rubric", "An essay.", "prompt", OLD_ESSAYS[:1], teacher_id="t")
+    context = messages[1]["content"]
+    assert OLD_ESSAYS[0] in context
+    assert OLD_ESSAYS[1] not in context
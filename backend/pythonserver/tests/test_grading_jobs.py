@@ -0,0 +1,55 @@
+import threading
+import time
+
+from grading_jobs import JobQueue
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_a_job_whose_lease_lapsed_runs_again_exactly_once(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    # This process claims the job and dies before finishing it.
+    crashed = JobQueue(path, handler=None, workers=1, lease_seconds=0.2)
+    submitted = crashed.submit({"rubric": "r"}, [{"essay": "e"}], refs=[7])
+    job_id = submitted["jobs"][0]["job_id"]
+    assert crashed._claim()["id"] == job_id
+    assert crashed.get(job_id)["status"] == "running"
+    time.sleep(0.3)
+
+    calls = []
+    lock = threading.Lock()
+
+    def handler(payload):
+        with lock:
+            calls.append(payload)
+        return {"feedback": "ok"}
+
+    restarted = JobQueue(path, handler=handler, workers=2)
+    restarted.start()
+    wait_for(lambda: restarted.get(job_id)["status"] == "done")
+    time.sleep(2 * JobQueue.POLL_SECONDS)
+
+    job = restarted.get(job_id)
+    assert calls == [{"rubric": "r", "essay": "e"}]
+    assert job["attempts"] == 2
+    assert job["ref"] == 7
+    assert job["result"] == {"feedback": "ok"}
+    assert restarted._claim() is None
+
+
+def test_a_job_interrupted_max_attempts_times_is_given_up(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), handler=None, workers=1, lease_seconds=0.1, max_attempts=1)
+    job_id = queue.submit({}, [{"essay": "e"}])["jobs"][0]["job_id"]
+    assert queue._claim()["id"] == job_id
+    time.sleep(0.2)
+
+    assert queue._claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "Gave up after repeated interrupted attempts"
+    assert queue.stats()["failed"] == 1
@@ -0,0 +1,68 @@
+import gc
+import os
+import runpy
+import sys
+import types
+
+import pytest
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+@pytest.fixture
+def load_conf(monkeypatch):
+    """
+    Runs gunicorn.conf.py as gunicorn would and returns its settings. The
+    environment variables it sets are restored afterwards.
+    """
+    for name in ("DETECTION_WARMUP", "DETECTION_THREADS", "GRADING_JOB_AUTOSTART", "PROMETHEUS_MULTIPROC_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+
+    def load(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return runpy.run_path(CONF)
+    return load
+
+
+def test_the_app_is_preloaded_once_before_forking(load_conf):
+    conf = load_conf(GUNICORN_WORKERS="2")
+    assert conf["preload_app"] is True
+    assert conf["worker_class"] == "gthread"
+    assert conf["workers"] == 2
+    # The master loads the model eagerly on one thread, without job workers.
+    assert os.environ["DETECTION_WARMUP"] == "eager"
+    assert os.environ["DETECTION_THREADS"] == "1"
+    assert os.environ["GRADING_JOB_AUTOSTART"] == "false"
+    # Each worker gets its share of the cores unless DETECTION_THREADS says otherwise.
+    assert conf["worker_torch_threads"] == 4
+    assert load_conf(GUNICORN_WORKERS="2", DETECTION_THREADS="3")["worker_torch_threads"] == 3
+
+
+def test_stale_metrics_files_are_cleared(load_conf, tmp_path):
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    (tmp_path / "keep.txt").write_text("not metrics")
+    load_conf(PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["keep.txt"]
+
+
+def test_post_fork_sets_torch_threads_and_starts_job_workers(load_conf, monkeypatch):
+    import torch
+
+    conf = load_conf(GUNICORN_WORKERS="4")
+    started = []
+    monkeypatch.setitem(sys.modules, "application",
+                        types.SimpleNamespace(GRADING_ENABLED=True, get_job_queue=lambda: started.append(True)))
+    server = types.SimpleNamespace(log=types.SimpleNamespace(info=print, error=print))
+    threads = torch.get_num_threads()
+    try:
+        conf["when_ready"](server)
+        assert gc.get_freeze_count() > 0
+        conf["post_fork"](server, types.SimpleNamespace(pid=1234))
+        assert torch.get_num_threads() == 2
+    finally:
+        gc.unfreeze()
+        torch.set_num_threads(threads)
+    assert os.environ["DETECTION_THREADS"] == "2"
+    assert started == [True]
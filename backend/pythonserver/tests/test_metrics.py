@@ -0,0 +1,29 @@
+from benchmark import synthetic_corpus
+
+ESSAY = synthetic_corpus(1, seed=5)[0]
+
+
+def test_metrics_exposes_the_detection_series(scorer):
+    client = scorer.application.test_client()
+    with client.post("/ai-detection", json={"text": ESSAY}) as response:
+        assert response.status_code == 200
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'tallyrus_request_seconds_count{endpoint="/ai-detection",method="POST",status="200"}' in body
+    assert 'tallyrus_stage_seconds_count{stage="inference"}' in body
+    for series in ("tallyrus_request_text_chars", "tallyrus_detection_chunks",
+                   "tallyrus_detection_batch_size", "tallyrus_cache_requests"):
+        assert series in body
+
+
+def test_server_timing_lists_the_request_stages(scorer, monkeypatch):
+    client = scorer.application.test_client()
+    with client.post("/ai-detection", json={"text": ESSAY}) as response:
+        assert "Server-Timing" not in response.headers
+
+    monkeypatch.setattr(scorer, "SERVER_TIMING", True)
+    with client.post("/ai-detection", json={"text": ESSAY + " Revised."}) as response:
+        timing = response.headers["Server-Timing"]
+    names = [entry.split(";")[0] for entry in timing.split(", ")]
+    assert names[-1] == "total"
+    assert {"split", "inference", "aggregate"} <= set(names)
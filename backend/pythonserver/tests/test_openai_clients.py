@@ -0,0 +1,113 @@
+import threading
+import time
+
+import openai
+import pytest
+
+import admission
+import openai_clients
+from admission import DeadlineExceeded
+
+MESSAGES = [{"role": "user", "content": "Grade this essay."}]
+
+
+def test_rate_limits_are_retried_after_retry_after(fake_openai):
+    server_stats = fake_openai(fail_first=2, retry_after=1.5)
+    response = openai_clients.chat_completion(model="gpt-4o", messages=MESSAGES)
+
+    assert response.choices[0].message.content.startswith("Fake feedback")
+    assert fake_openai.sleeps == [1.5, 1.5]
+    assert server_stats()["chat"] == 3
+    assert openai_clients.stats() == {"requests": 3, "retries": 2, "failures": 0}
+
+
+def test_retry_after_is_capped_at_the_backoff_limit(fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_clients, "OPENAI_BACKOFF_MAX", 3.0)
+    fake_openai(fail_first=1, retry_after=100)
+    openai_clients.chat_completion(model="gpt-4o", messages=MESSAGES)
+    assert fake_openai.sleeps == [3.0]
+
+
+def test_server_errors_back_off_with_jitter(fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_clients, "OPENAI_BACKOFF_BASE", 0.1)
+    server_stats = fake_openai(fail_first=3, fail_status=500)
+    openai_clients.create_embeddings(["an essay"], "text-embedding-ada-002")
+
+    assert len(fake_openai.sleeps) == 3
+    for attempt, delay in enumerate(fake_openai.sleeps):
+        assert 0 <= delay <= 0.1 * 2 ** attempt
+    assert server_stats()["embeddings"] == 4
+
+
+def test_retries_stop_after_max_retries(fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_clients, "OPENAI_MAX_RETRIES", 2)
+    server_stats = fake_openai(fail_rate=1.0)
+    with pytest.raises(openai.RateLimitError):
+        openai_clients.chat_completion(model="gpt-4o", messages=MESSAGES)
+    assert server_stats()["chat"] == 3
+    assert openai_clients.stats() == {"requests": 3, "retries": 2, "failures": 1}
+
+
+def test_client_errors_are_not_retried(fake_openai):
+    server_stats = fake_openai(fail_first=1, fail_status=400)
+    with pytest.raises(openai.BadRequestError):
+        openai_clients.chat_completion(model="gpt-4o", messages=MESSAGES)
+    assert fake_openai.sleeps == []
+    assert server_stats()["chat"] == 1
+
+
+def test_a_retry_that_would_pass_the_deadline_is_not_attempted(fake_openai):
+    server_stats = fake_openai(fail_first=1, retry_after=10)
+    admission.start_deadline(5)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            openai_clients.chat_completion(model="gpt-4o", messages=MESSAGES)
+    finally:
+        admission.start_deadline(None)
+    assert fake_openai.sleeps == []
+    assert server_stats()["chat"] == 1
+
+
+def test_concurrent_calls_share_one_client_within_the_endpoint_limit(fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_clients, "OPENAI_CONCURRENCY", {"chat": 2, "embeddings": 4})
+    server_stats = fake_openai(latency_ms=100)
+    client = openai_clients.get_client()
+    replies = []
+    threads = [
+        threading.Thread(target=lambda: replies.append(openai_clients.chat_completion(model="gpt-4o", messages=MESSAGES)))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(replies) == 6
+    assert openai_clients.get_client() is client
+    assert server_stats()["peak_in_flight"] == 2
+
+
+def test_open_streams_count_as_in_flight_and_hold_their_slot(fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_clients, "OPENAI_CONCURRENCY", {"chat": 1, "embeddings": 4})
+    server_stats = fake_openai(token_latency_ms=20)
+    stream = openai_clients.stream_chat_completion(model="gpt-4o", messages=MESSAGES)
+    parts = [next(stream)]
+    assert server_stats()["in_flight"] == 1
+
+    # The one chat slot is taken until the stream has been read to the end.
+    replies = []
+    waiting = threading.Thread(
+        target=lambda: replies.append(openai_clients.chat_completion(model="gpt-4o", messages=MESSAGES)))
+    waiting.start()
+    waiting.join(0.2)
+    assert replies == []
+
+    parts.extend(stream)
+    assert "".join(parts).startswith("Fake feedback")
+    waiting.join(10)
+    assert len(replies) == 1
+    deadline = time.monotonic() + 5
+    while server_stats()["in_flight"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert server_stats()["peak_in_flight"] == 1
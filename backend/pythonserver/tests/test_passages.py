@@ -0,0 +1,30 @@
+from benchmark import synthetic_corpus
+from passages import count_tokens, pack_context, split_passages
+
+ESSAYS = synthetic_corpus(6, seed=9)
+
+
+def test_packed_context_stays_within_the_budget():
+    for budget in (0, 50, 400, 1500, 5000):
+        context, used = pack_context(ESSAYS, budget)
+        assert count_tokens(context) <= budget
+        assert used == sum(essay in context for essay in ESSAYS)
+
+
+def test_a_passage_that_does_not_fit_is_skipped_for_smaller_ones():
+    big, small, medium = "word " * 400, "a short passage.", "a medium passage " * 10
+    budget = count_tokens(small) + count_tokens(medium) + count_tokens("\n\n") + 5
+    context, used = pack_context([big, small, medium], budget)
+    assert (context, used) == (small + "\n\n" + medium, 2)
+    assert pack_context([big], count_tokens(big)) == (big, 1)
+    assert pack_context([big], count_tokens(big) - 1) == ("", 0)
+
+
+def test_passages_fit_the_token_limit_and_keep_the_text():
+    for essay in ESSAYS:
+        assert split_passages(essay, 10000) == [essay.strip()]
+        passages = split_passages(essay, 120)
+        assert len(passages) > 1
+        assert all(count_tokens(passage) <= 120 for passage in passages)
+        assert "".join(passages).replace(" ", "") == essay.replace("\n", "").replace(" ", "")
+    assert split_passages("  \n\n ", 100) == []
@@ -0,0 +1,31 @@
+import copy
+
+from benchmark import synthetic_corpus
+from precision import apply_precision, compare_scores, model_size_mb
+
+TEXTS = synthetic_corpus(4, seed=8)
+
+
+def test_int8_scores_stay_within_tolerance_of_fp32(scorer):
+    fp32 = scorer.model
+    int8, applied = apply_precision(copy.deepcopy(fp32), "int8", "cpu")
+    assert applied == "int8"
+    assert model_size_mb(int8) < model_size_mb(fp32)
+
+    reference = [scorer.score_document(text, detector_model=fp32)["Real"] for text in TEXTS]
+    candidate = [scorer.score_document(text, detector_model=int8)["Real"] for text in TEXTS]
+    # The tolerance precision.py checks by default.
+    assert compare_scores(TEXTS, reference, candidate)["max_abs_diff"] <= 0.05
+
+
+def test_unavailable_precisions_fall_back_to_fp32(tiny_model):
+    model = tiny_model[2]
+    assert apply_precision(model, "int8", "cuda") == (model, "fp32")
+    assert apply_precision(model, "fp16", "cpu") == (model, "fp32")
+
+
+def test_compare_scores_counts_verdict_flips():
+    report = compare_scores(["a", "b", "c"], [0.2, 0.55, 0.9], [0.25, 0.45, 0.9])
+    assert report["verdict_flips"] == 1
+    assert report["flipped_documents"] == [1]
+    assert abs(report["max_abs_diff"] - 0.1) < 1e-9
@@ -0,0 +1,21 @@
+from benchmark import synthetic_corpus
+
+# Lengths from a few words to past the 512-token limit, so batched rows are
+# padded to very different widths.
+TEXTS = ["Short one.", synthetic_corpus(1, seed=6)[0][:300], synthetic_corpus(1, seed=7)[0][:3000]]
+
+
+def test_a_batch_scores_like_single_predictions(scorer):
+    single = [scorer.predict(text) for text in TEXTS]
+    for batch_size in (1, 2, 3):
+        batched = scorer.predict_batch(TEXTS, batch_size=batch_size)
+        assert all(abs(a - b) <= 1e-6 for a, b in zip(batched, single))
+
+
+def test_scores_come_back_in_the_callers_order(scorer):
+    encoded = scorer.encode_chunks(TEXTS)
+    assert len({len(ids) for ids in encoded}) == 3
+    forward = scorer.predict_encoded(encoded)
+    backward = scorer.predict_encoded(encoded[::-1])
+    assert all(abs(a - b) <= 1e-6 for a, b in zip(forward, backward[::-1]))
+    assert scorer.predict_batch([]) == []
@@ -0,0 +1,84 @@
+from result_cache import ResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = ResultCache("test", max_entries=8, ttl_seconds=60, timer=clock)
+    cache.set("a", {"Real": 0.5})
+    clock.now += 59
+    assert cache.get("a") == {"Real": 0.5}
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_entries_expire_after_the_ttl(tmp_path):
+    clock = FakeClock()
+    cache = ResultCache("test", max_entries=0, ttl_seconds=60, db_path=str(tmp_path / "cache.db"), timer=clock)
+    cache.set("a", [1, 2])
+    clock.now += 59
+    assert cache.get("a") == [1, 2]
+    clock.now += 2
+    assert cache.get("a") is None
+    # The expired row is gone, not just skipped.
+    clock.now -= 2
+    assert cache.get("a") is None
+
+
+def test_the_least_recently_used_entry_is_evicted_at_capacity():
+    cache = ResultCache("test", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_a_disk_hit_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = ResultCache("test", db_path=path)
+    key = first.make_key("model", "text")
+    first.set(key, {"Real": 0.25})
+
+    second = ResultCache("test", db_path=path)
+    assert second.get(key) == {"Real": 0.25}
+    assert second.stats()["disk_hits"] == 1
+    # Promoted to memory, so the next lookup does not touch the file.
+    assert second.get(key) == {"Real": 0.25}
+    assert second.stats()["memory_hits"] == 1
+    # Caches sharing a file keep their keys apart.
+    assert ResultCache("other", db_path=path).make_key("model", "text") != key
+
+
+def test_the_disk_tier_is_trimmed_by_least_recent_access(tmp_path, monkeypatch):
+    monkeypatch.setattr(ResultCache, "PRUNE_EVERY", 1)
+    clock = FakeClock()
+    cache = ResultCache("test", max_entries=0, db_path=str(tmp_path / "cache.db"), max_disk_entries=2, timer=clock)
+    for key in ("a", "b"):
+        cache.set(key, key)
+        clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.set("c", "c")
+    assert [cache.get(key) for key in ("a", "b", "c")] == ["a", None, "c"]
+
+
+def test_token_chunking_keys_on_whitespace_but_character_chunking_does_not(scorer, monkeypatch):
+    paragraphs = "First paragraph.\n\nSecond paragraph."
+    one_line = "First paragraph.  Second paragraph."
+    assert scorer.detection_cache_key(paragraphs) != scorer.detection_cache_key(one_line)
+
+    monkeypatch.setattr(scorer, "DETECTION_CHUNKING", "chars")
+    assert scorer.detection_cache_key(paragraphs) == scorer.detection_cache_key(one_line)
+    assert scorer.detection_cache_key(paragraphs) != scorer.detection_cache_key("First paragraph. Second paragraph.")
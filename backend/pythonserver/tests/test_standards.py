@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+STANDARDS = [
+    ("Writing - Grade 5", [("W.5.1", "Write opinion pieces on topics or texts, supporting a point of view with reasons."),
+                           ("W.5.2", "Write informative texts to examine a topic and convey ideas clearly.")]),
+    ("Reading Literature - Grade 5", [("RL.5.2", "Determine a theme of a story, drama, or poem from details in the text.")]),
+    ("Writing - Grade 6", [("W.6.1", "Write arguments to support claims with clear reasons and relevant evidence.")]),
+]
+
+
+def write_template(path, categories):
+    values = [{"name": name, "Criteria": [], "Standards": [{"id": i, "description": d} for i, d in standards]}
+              for name, standards in categories]
+    path.write_text(json.dumps({"Template": "ELA", "values": values}), encoding="utf-8")
+
+
+@pytest.fixture
+def standards(monkeypatch, tmp_path):
+    """
+    The application module reading a small template from tmp_path with the
+    local embedder. Returns (application, path).
+    """
+    import application
+    from embeddings import make_embedder
+
+    path = tmp_path / "ela_standards.json"
+    write_template(path, STANDARDS)
+    monkeypatch.setattr(application, "embedder", make_embedder("local", cache_path=""))
+    monkeypatch.setattr(application, "STANDARDS_PATH", str(path))
+    monkeypatch.setattr(application, "standards_store", None)
+    return application, path
+
+
+def test_standards_are_listed_and_filtered(standards):
+    client = standards[0].application.test_client()
+    assert client.get("/standards").get_json()["count"] == 4
+    by_grade = client.get("/standards?grade=Grade 5").get_json()
+    assert [standard["id"] for standard in by_grade["standards"]] == ["W.5.1", "W.5.2", "RL.5.2"]
+    both = client.get("/standards?grade=5&prefix=W").get_json()
+    assert [standard["id"] for standard in both["standards"]] == ["W.5.1", "W.5.2"]
+
+    standard = client.get("/standards/RL.5.2").get_json()
+    assert standard == {"id": "RL.5.2", "grade": "5", "prefix": "RL", "category": "Grade 5",
+                        "description": STANDARDS[1][1][0][1]}
+    assert client.get("/standards/W.9.9").status_code == 404
+
+
+def test_search_ranks_the_closest_standard_first(standards):
+    client = standards[0].application.test_client()
+    found = client.post("/standards/search", json={"prompt": "Determine a theme of the story from details.", "k": 2})
+    results = found.get_json()["standards"]
+    assert [standard["id"] for standard in results][0] == "RL.5.2"
+    assert len(results) == 2 and results[0]["score"] >= results[1]["score"]
+
+    within = client.post("/standards/search", json={"prompt": "Write arguments with reasons.", "grade": "6"})
+    assert [standard["id"] for standard in within.get_json()["standards"]] == ["W.6.1"]
+    assert client.post("/standards/search", json={"prompt": " "}).status_code == 400
+
+
+def test_a_changed_file_is_reindexed_on_the_next_request(standards):
+    application, path = standards
+    client = application.application.test_client()
+    assert client.get("/standards/W.6.2").status_code == 404
+
+    write_template(path, STANDARDS + [("Writing - Grade 6", [("W.6.2", "Write informative texts about a topic.")])])
+    # Move the mtime on as well, in case the filesystem clock is coarse.
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000_000))
+    assert client.get("/standards/W.6.2").status_code == 200
+
+    stats = client.get("/standards/stats").get_json()
+    assert stats["builds"] == 2
+    assert stats["standards"] == 5
+    # Only the new description went to the embedder.
+    assert stats["embedded"] == 1 and stats["reused"] == 4
@@ -0,0 +1,23 @@
+import pytest
+
+import application
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 7, 8, 9, 100, 257])
+def test_order_is_a_permutation(count):
+    assert sorted(application.stratified_order(count)) == list(range(count))
+
+
+def test_starts_in_the_middle():
+    assert application.stratified_order(9)[:3] == [4, 1, 6]
+
+
+def test_every_prefix_is_spread_across_the_document():
+    # However early adaptive scoring stops, no stretch of the document much
+    # longer than count / n chunks is left without a scored chunk.
+    for count in range(1, 200):
+        order = application.stratified_order(count)
+        for n in range(1, count + 1):
+            scored = sorted(order[:n])
+            gaps = [scored[0] + 1, count - scored[-1]] + [b - a for a, b in zip(scored, scored[1:])]
+            assert max(gaps) <= 3 * count / n
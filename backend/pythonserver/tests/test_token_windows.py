@@ -0,0 +1,63 @@
+import pytest
+
+from benchmark import synthetic_corpus
+
+
+def token_positions(detector, text, windows):
+    # (first, last) token range of each window within the whole document's encoding.
+    encoding = detector.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    ids = encoding["input_ids"]
+    by_start = {start: position for position, (start, _) in enumerate(encoding["offset_mapping"])}
+    ranges = []
+    for start, end, window_ids in windows:
+        first = by_start[start]
+        assert ids[first:first + len(window_ids)] == list(window_ids)
+        ranges.append((first, first + len(window_ids)))
+    return ranges, len(ids)
+
+
+@pytest.mark.parametrize("anchored", [False, True])
+@pytest.mark.parametrize("max_tokens, stride", [(None, 0), (None, 16), (40, 0), (40, 8)])
+def test_windows_cover_every_token_within_the_limit(detector, max_tokens, stride, anchored):
+    limit = max_tokens or detector.tokenizer.model_max_length - 2
+    for text in synthetic_corpus(5, seed=1):
+        windows = detector.token_windows(text, max_tokens, stride, anchored=anchored)
+        ranges, total = token_positions(detector, text, windows)
+
+        assert len(windows) > 1
+        assert all(last - first <= limit for first, last in ranges)
+        assert ranges[0][0] == 0 and ranges[-1][1] == total
+        for (_, previous_last), (first, _) in zip(ranges, ranges[1:]):
+            # No gaps, and any overlap stays within the stride.
+            assert first <= previous_last
+            assert previous_last - first <= stride
+
+
+def test_windows_end_at_sentence_boundaries(detector):
+    text = synthetic_corpus(1, seed=2)[0]
+    for start, end, _ in detector.token_windows(text)[:-1]:
+        assert text[:end].rstrip()[-1] in ".?"
+
+
+def test_a_sentence_longer_than_a_window_is_split(detector):
+    text = " ".join(["students learn together"] * 60) + "."
+    windows = detector.token_windows(text, 32, 4)
+    ranges, total = token_positions(detector, text, windows)
+
+    assert len(windows) > 2
+    assert all(last - first <= 32 for first, last in ranges)
+    assert ranges[-1][1] == total
+    for (_, previous_last), (first, _) in zip(ranges, ranges[1:]):
+        assert previous_last - first == 4
+
+
+def test_anchored_windows_realign_after_an_edit(detector):
+    for text in synthetic_corpus(5, seed=0):
+        edited = "Note that " + text[0].lower() + text[1:]
+        before = detector.token_windows(text, anchored=True)
+        after = detector.token_windows(edited, anchored=True)
+        assert before[-1][2] == after[-1][2]
+
+
+def test_empty_text_has_no_windows(detector):
+    assert detector.token_windows("") == []
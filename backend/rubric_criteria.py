@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import openai
+
+from pythonserver.sqlite_util import thread_connection
+
+logger = logging.getLogger(__name__)
+
+# Part of every memo key: bump it whenever the prompt or the expected answer
+# changes, so criteria written for the old prompt are generated again.
+PROMPT_VERSION = "1"
+
+# Model, requests in flight at once and standards per prompt.
+CRITERIA_MODEL = os.getenv('CRITERIA_MODEL', 'gpt-4')
+CRITERIA_CONCURRENCY = int(os.getenv('CRITERIA_CONCURRENCY', '4'))
+CRITERIA_BATCH_SIZE = int(os.getenv('CRITERIA_BATCH_SIZE', '4'))
+# Retries on rate limits, server errors and dropped connections (the client backs off between them).
+CRITERIA_MAX_RETRIES = int(os.getenv('CRITERIA_MAX_RETRIES', '4'))
+# SQLite file memoizing generated criteria; empty keeps them in memory for this run only.
+CRITERIA_CACHE_DB = os.getenv('CRITERIA_CACHE_DB', 'criteria_cache.db')
+# Optional OpenAI-compatible endpoint, e.g. the fake in fake_cde.py.
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+
+Standard = Tuple[str, str]
+
+
+def fallback_criteria(standard_id: str, description: str) -> List[Dict]:
+    """
+    The generic five-level criteria used when OpenAI is off or fails.
+    """
+    return [
+        {
+            "point": 5,
+            "description": f"Exceeds the standard - {standard_id}: Demonstrates exceptional mastery of {description}"
+        },
+        {
+            "point": 4,
+            "description": f"Meets the standard - {standard_id}: Demonstrates proficient understanding of {description}"
+        },
+        {
+            "point": 3,
+            "description": f"Approaching the standard - {standard_id}: Shows basic understanding of {description}"
+        },
+        {
+            "point": 2,
+            "description": f"Partially meets the standard - {standard_id}: Shows limited understanding of {description}"
+        },
+        {
+            "point": 1,
+            "description": f"Does not meet the standard - {standard_id}: Shows minimal understanding of {description}"
+        }
+    ]
+
+
+def valid_criteria(criteria) -> bool:
+    return (
+        isinstance(criteria, list) and len(criteria) == 5
+        and all(isinstance(item, dict) and isinstance(item.get("point"), int)
+                and isinstance(item.get("description"), str) and item["description"]
+                for item in criteria)
+        and sorted(item["point"] for item in criteria) == [1, 2, 3, 4, 5]
+    )
+
+
+def memo_key(standard_id: str, description: str) -> Tuple[str, str, str]:
+    return standard_id, hashlib.sha256(description.encode("utf-8")).hexdigest(), PROMPT_VERSION
+
+
+def build_prompt(standards: Sequence[Standard]) -> str:
+    listed = "\n\n".join(
+        f"Standard ID: {standard_id}\nDescription: {description}" for standard_id, description in standards
+    )
+    return f"""
+Create a 5-point scoring rubric for each of the following educational standards:
+
+{listed}
+
+Answer with a single JSON object whose keys are the standard IDs above and whose values are arrays of 5 objects, where each object has:
+- "point": score from 5 (highest) to 1 (lowest)
+- "description": detailed description of what performance at this level looks like
+
+The descriptions should:
+- Be specific to this standard's content
+- Show clear progression between levels
+- Include concrete examples or indicators
+- Use educational assessment language
+"""
+
+
+def parse_answer(content: str) -> Dict:
+    # Models sometimes wrap JSON in a markdown code fence.
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1] if "\n" in content else ""
+        content = content.rsplit("```", 1)[0]
+    answer = json.loads(content)
+    if not isinstance(answer, dict):
+        raise ValueError("Expected a JSON object keyed by standard ID")
+    return answer
+
+
+class CriteriaMemo:
+    """
+    Generated criteria keyed by (standard_id, description hash, prompt version),
+    so a re-scrape only pays for standards that are new or whose text changed.
+
+    Args:
+        db_path (str, optional): SQLite file holding the memo, None for memory only
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        self._memory: Dict[Tuple[str, str, str], List[Dict]] = {}
+        if self.db_path:
+            self._connect().execute(
+                "CREATE TABLE IF NOT EXISTS criteria ("
+                " standard_id TEXT NOT NULL, description_hash TEXT NOT NULL, prompt_version TEXT NOT NULL,"
+                " criteria TEXT NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (standard_id, description_hash, prompt_version))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return thread_connection(self.db_path)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[List[Dict]]:
+        if key in self._memory or not self.db_path:
+            return self._memory.get(key)
+        row = self._connect().execute(
+            "SELECT criteria FROM criteria WHERE standard_id = ? AND description_hash = ? AND prompt_version = ?",
+            key,
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: Tuple[str, str, str], criteria: List[Dict]) -> None:
+        self._memory[key] = criteria
+        if self.db_path:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO criteria (standard_id, description_hash, prompt_version, criteria, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (*key, json.dumps(criteria), time.time()),
+            )
+
+
+class CriteriaGenerator:
+    """
+    Generates rubric criteria for many standards with OpenAI.
+
+    Standards already in the memo are not sent again. The rest are grouped
+    batch_size to a prompt, and at most `concurrency` prompts are in flight
+    at once. Standards a batched answer leaves out or gets wrong are asked
+    for again one per prompt; if that fails too they get fallback_criteria,
+    which is not memoized so the next run tries again.
+
+    Args:
+        memo (CriteriaMemo): Memo of earlier results
+        model (str): Chat model name
+        concurrency (int): Prompts in flight at once
+        batch_size (int): Standards per prompt
+        max_retries (int): Client retries per prompt on 429/5xx/connection errors
+    """
+
+    def __init__(self, memo: CriteriaMemo, model: str = CRITERIA_MODEL, concurrency: int = CRITERIA_CONCURRENCY,
+                 batch_size: int = CRITERIA_BATCH_SIZE, max_retries: int = CRITERIA_MAX_RETRIES):
+        self.memo = memo
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.stats = {"memoized": 0, "generated": 0, "fallback": 0, "prompts": 0}
+
+    async def _ask(self, client: openai.AsyncOpenAI, semaphore: asyncio.Semaphore,
+                   batch: Sequence[Standard]) -> Dict[str, List[Dict]]:
+        # Criteria for the standards of one prompt that came back well formed.
+        async with semaphore:
+            self.stats["prompts"] += 1
+            try:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": "You are an expert in educational assessment and rubric design."},
+                        {"role": "user", "content": build_prompt(batch)}
+                    ],
+                    temperature=0.7,
+                    max_tokens=1000 * len(batch)
+                )
+                answer = parse_answer(response.choices[0].message.content)
+            except Exception as e:
+                logger.error(f"Error generating rubric criteria for {', '.join(sid for sid, _ in batch)}: {str(e)}")
+                return {}
+        return {
+            standard_id: answer[standard_id]
+            for standard_id, _ in batch
+            if valid_criteria(answer.get(standard_id))
+        }
+
+    async def generate(self, standards: Sequence[Standard]) -> List[List[Dict]]:
+        """
+        Returns the criteria for each (standard_id, description), in order.
+        """
+        keys = [memo_key(standard_id, description) for standard_id, description in standards]
+        results: List[Optional[List[Dict]]] = [self.memo.get(key) for key in keys]
+        self.stats["memoized"] += sum(criteria is not None for criteria in results)
+
+        # Each distinct standard is asked for once, however often it appears.
+        missing: Dict[Tuple[str, str, str], Standard] = {}
+        for key, standard, criteria in zip(keys, standards, results):
+            if criteria is None:
+                missing.setdefault(key, standard)
+
+        if missing:
+            generated: Dict[Tuple[str, str, str], List[Dict]] = {}
+            async with openai.AsyncOpenAI(api_key=openai.api_key or os.getenv('OPENAI_API_KEY'),
+                                          base_url=OPENAI_BASE_URL,
+                                          max_retries=self.max_retries) as client:
+                semaphore = asyncio.Semaphore(self.concurrency)
+                pending = list(missing.items())
+                for batch_size in sorted({self.batch_size, 1}, reverse=True):
+                    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+                    answers = await asyncio.gather(*[
+                        self._ask(client, semaphore, [standard for _, standard in batch]) for batch in batches
+                    ])
+                    for batch, answer in zip(batches, answers):
+                        for key, (standard_id, _) in batch:
+                            if standard_id in answer:
+                                generated[key] = answer[standard_id]
+                    pending = [(key, standard) for key, standard in pending if key not in generated]
+                    if not pending:
+                        break
+
+            for key, criteria in generated.items():
+                self.memo.put(key, criteria)
+            self.stats["generated"] += len(generated)
+            for key, (standard_id, description) in missing.items():
+                if key not in generated:
+                    logger.warning(f"Using fallback criteria for {standard_id}")
+                    self.stats["fallback"] += 1
+                    generated[key] = fallback_criteria(standard_id, description)
+
+            results = [criteria if criteria is not None else generated[key] for key, criteria in zip(keys, results)]
+
+        return results
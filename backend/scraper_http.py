@@ -0,0 +1,268 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pythonserver.backoff import retry_delay
+from pythonserver.sqlite_util import thread_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Responses worth asking for again; anything else is a permanent failure.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Requests in flight at once, requests per second across all of them, and
+# retries per page on 429/5xx and connection errors.
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', '4'))
+SCRAPE_RATE = float(os.getenv('SCRAPE_RATE', '2'))
+SCRAPE_MAX_RETRIES = int(os.getenv('SCRAPE_MAX_RETRIES', '4'))
+# SQLite file keeping every fetched page with its ETag/Last-Modified, so
+# later runs only download pages that changed. Empty disables it.
+SCRAPE_CACHE_DB = os.getenv('SCRAPE_CACHE_DB', 'scrape_cache.db')
+# Replay: parse the cached pages only, without touching the network.
+SCRAPE_OFFLINE = os.getenv('SCRAPE_OFFLINE', 'false').lower() == 'true'
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: on average `rate` acquisitions per second,
+    with bursts of up to `capacity` after a quiet period.
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (float): Most tokens the bucket holds
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available and takes it.
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """
+    On-disk cache of page bodies keyed by URL, with the validators (ETag,
+    Last-Modified) needed to revalidate them with a conditional request.
+
+    Args:
+        db_path (str): SQLite file holding the cache
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+            " fetched_at REAL NOT NULL, validated_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        return thread_connection(self.db_path)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Returns the cached body, etag and last_modified for url, or None.
+        """
+        row = self._connect().execute(
+            "SELECT body, etag, last_modified FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"body": row[0], "etag": row[1], "last_modified": row[2]}
+
+    def put(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, fetched_at, validated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (url, body, etag, last_modified, now, now),
+        )
+
+    def touch(self, url: str) -> None:
+        # The server confirmed the cached copy is still current.
+        self._connect().execute("UPDATE responses SET validated_at = ? WHERE url = ?", (time.time(), url))
+
+class PageFetcher:
+    """
+    Fetches pages over one pooled keep-alive session, a bounded number at a
+    time, with every request (retries included) drawn from a shared token
+    bucket so the server sees a steady, polite request rate.
+
+    Rate limits (429), server errors and dropped connections are retried with
+    full-jitter exponential backoff, honoring Retry-After when the server
+    sends it.
+
+    With a ResponseCache, pages seen before are requested conditionally
+    (If-None-Match / If-Modified-Since) and a 304 answer is served from the
+    cache. With offline=True nothing is requested at all: pages come from the
+    cache alone and uncached pages count as failures.
+
+    Args:
+        concurrency (int): Requests in flight at once
+        rate (float): Requests per second across all threads, 0 for no limit
+        burst (float): Requests allowed back to back before the rate applies
+        max_retries (int): Retries per page after the first attempt
+        backoff_base (float): First backoff ceiling in seconds, doubled per retry
+        backoff_max (float): Longest wait between retries in seconds
+        timeout (float): Per-request timeout in seconds
+        headers (dict, optional): Headers sent with every request
+        cache (ResponseCache, optional): Cache for conditional requests and replay
+        offline (bool): Serve pages from the cache only
+    """
+
+    def __init__(self, concurrency: int = 4, rate: float = 2.0, burst: float = 1.0, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0, timeout: float = 10.0,
+                 headers: Optional[Dict[str, str]] = None, cache: Optional[ResponseCache] = None,
+                 offline: bool = False):
+        if offline and cache is None:
+            raise ValueError("Offline replay needs a response cache")
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.bucket = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "not_modified": 0, "cache_hits": 0}
+
+    def _retry_delay(self, response: Optional[requests.Response], attempt: int) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        return retry_delay(retry_after, attempt, self.backoff_base, self.backoff_max)
+
+    def fetch(self, url: str) -> Optional[str]:
+        """
+        Fetches one page.
+
+        Returns:
+            str: The response body, or None if the page could not be fetched
+        """
+        cached = self.cache.get(url) if self.cache else None
+        if self.offline:
+            with self._lock:
+                self.stats["cache_hits" if cached else "failures"] += 1
+            if cached is None:
+                logger.error(f"{url} is not in the response cache")
+                return None
+            return cached["body"]
+
+        conditional = {}
+        if cached and cached["etag"]:
+            conditional['If-None-Match'] = cached["etag"]
+        if cached and cached["last_modified"]:
+            conditional['If-Modified-Since'] = cached["last_modified"]
+
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self._lock:
+                self.stats["requests"] += 1
+            response = None
+            try:
+                response = self.session.get(url, headers=conditional, timeout=self.timeout)
+                if response.status_code == 304 and cached:
+                    self.cache.touch(url)
+                    with self._lock:
+                        self.stats["not_modified"] += 1
+                    logger.info(f"{url} not modified, using the cached copy")
+                    return cached["body"]
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    logger.info(f"Successfully fetched {url}")
+                    if self.cache:
+                        self.cache.put(url, response.text, response.headers.get('ETag'),
+                                       response.headers.get('Last-Modified'))
+                    return response.text
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            except requests.RequestException as e:
+                logger.error(f"Error fetching {url}: {str(e)}")
+                with self._lock:
+                    self.stats["failures"] += 1
+                return None
+
+            if attempt >= self.max_retries:
+                logger.error(f"Error fetching {url}: {error}, giving up after {attempt + 1} attempts")
+                with self._lock:
+                    self.stats["failures"] += 1
+                return None
+            delay = self._retry_delay(response, attempt)
+            logger.warning(f"Fetching {url} failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+            with self._lock:
+                self.stats["retries"] += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def iter_fetch(self, urls: Sequence[str]) -> Iterator[Optional[str]]:
+        """
+        Fetches every URL concurrently, yielding each body (None for pages
+        that failed) in the order of urls as soon as it and all earlier ones
+        have arrived, so the caller can process pages while later ones are
+        still downloading.
+        """
+        if not urls:
+            return iter(())
+        # Everything is queued now; the workers drain the queue after shutdown.
+        executor = ThreadPoolExecutor(min(self.concurrency, len(urls)))
+        futures = [executor.submit(self.fetch, url) for url in urls]
+        executor.shutdown(wait=False)
+        return (future.result() for future in futures)
+
+    def fetch_all(self, urls: Sequence[str]) -> List[Optional[str]]:
+        """
+        Fetches every URL concurrently.
+
+        Returns:
+            list: Response bodies in the order of urls, None for pages that failed
+        """
+        return list(self.iter_fetch(urls))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def make_fetcher(headers: Optional[Dict[str, str]] = None) -> PageFetcher:
+    """
+    PageFetcher configured from the SCRAPE_* environment variables.
+    """
+    cache = ResponseCache(SCRAPE_CACHE_DB) if SCRAPE_CACHE_DB else None
+    if SCRAPE_OFFLINE and cache is None:
+        raise ValueError("SCRAPE_OFFLINE needs SCRAPE_CACHE_DB")
+    return PageFetcher(concurrency=SCRAPE_CONCURRENCY, rate=SCRAPE_RATE, max_retries=SCRAPE_MAX_RETRIES,
+                       headers=headers, cache=cache, offline=SCRAPE_OFFLINE)
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StandardsJsonlWriter:
+    """
+    Appends scraped categories to a JSONL file as each page is finished, so
+    nothing is held in memory and an interrupted run can pick up where it
+    stopped.
+
+    Each page is written as its category records followed by a "page_done"
+    record, flushed to disk before the next page starts. When an existing
+    file is opened, anything after the last page_done record belongs to a
+    page that never finished and is cut off; the pages with a page_done
+    record are reported by completed_pages and need not be scraped again.
+
+    Args:
+        path (str): JSONL file to write, created if missing
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed_pages = set()
+        self.total_pages: Optional[int] = None
+        self._recover()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _recover(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        keep = 0
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get("type") == "page_done":
+                    self.completed_pages.add(record["page"])
+                    self.total_pages = record["total_pages"]
+                    keep = offset
+        if keep < os.path.getsize(self.path):
+            logger.info(f"Dropping the unfinished page at the end of {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(keep)
+        if self.completed_pages:
+            logger.info(f"Resuming: {len(self.completed_pages)} of {self.total_pages} pages already in {self.path}")
+
+    def write_page(self, page: int, total_pages: int, categories: Iterable[Dict]) -> None:
+        for category in categories:
+            self._file.write(json.dumps({"type": "category", "page": page, **category}, ensure_ascii=False) + "\n")
+        self._file.write(json.dumps({"type": "page_done", "page": page, "total_pages": total_pages}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed_pages.add(page)
+        self.total_pages = total_pages
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def compact_jsonl(jsonl_path: str, output_file: str, template_name: str = "California ELA Standards") -> int:
+    """
+    Writes the categories of a JSONL file to output_file in the rubric
+    template shape save_to_json produces, ordered by page. Categories are
+    read back one at a time, so memory does not grow with the catalog, and
+    output_file is replaced only once it is complete.
+
+    Returns:
+        int: Number of categories written
+    """
+    # Byte offsets of every category record, grouped by page.
+    offsets: Dict[int, List[int]] = {}
+    with open(jsonl_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            record = json.loads(line)
+            if record.get("type") == "category":
+                offsets.setdefault(record["page"], []).append(offset)
+            offset += len(line)
+
+    count = 0
+    partial = output_file + ".tmp"
+    with open(jsonl_path, 'rb') as source, open(partial, 'w', encoding='utf-8') as out:
+        out.write('{\n  "Template": ' + json.dumps(template_name, ensure_ascii=False) + ',\n  "values": [')
+        for page in sorted(offsets):
+            for offset in offsets[page]:
+                source.seek(offset)
+                record = json.loads(source.readline())
+                del record["type"], record["page"]
+                # Same layout as json.dump(..., indent=2) of the whole template.
+                body = json.dumps(record, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+                out.write((",\n    " if count else "\n    ") + body)
+                count += 1
+        out.write("\n  ]\n}" if count else "]\n}")
+    os.replace(partial, output_file)
+    return count
@@ -0,0 +1,33 @@
+import json
+import os
+import sys
+import urllib.request
+
+import pytest
+
+# The scraper modules live in backend/, next to this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_cde():
+    """
+    Starts fake_cde with the given options. start returns the scraper's base
+    URL and a reader for the server's /stats.
+    """
+    from fake_cde import serve_in_thread
+
+    servers = []
+
+    def start(**options):
+        server, base_url = serve_in_thread(**options)
+        servers.append(server)
+
+        def stats():
+            with urllib.request.urlopen(base_url.split("/cacs/")[0] + "/stats") as response:
+                return json.load(response)
+        return base_url, stats
+
+    yield start
+    for server in servers:
+        server.shutdown()
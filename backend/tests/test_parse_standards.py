@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from bs4 import BeautifulSoup
+
+import webscraperCADOE
+from fake_cde import render_page, synthetic_standards
+
+SECTION = '<div style="padding-left:3px; padding-right:3px;">{}</div>'
+ODD_SECTIONS = "".join([
+    # Not ELA, skipped.
+    SECTION.format('<h4><a href="#">MA.5.1</a></h4><div style="white-space: pre-wrap;">Fractions.</div>'),
+    # No h4, an error for this section only.
+    SECTION.format('<div style="white-space: pre-wrap;">No identifier.</div>'),
+    # No description.
+    SECTION.format('<h4><a href="#">W.7.9</a></h4>'),
+    # Category given on the page, nested markup in the description.
+    SECTION.format('<h4><a href="#">RI.8.3</a></h4><div class="row"><div class="col-md-6"><b>English Language Arts'
+                   '</b></div><div class="col-md-6"><b>Key Ideas</b></div></div>'
+                   '<div style="white-space: pre-wrap;">Analyze <i>how</i> a text\n makes connections.</div>'),
+])
+
+
+def scan_section_by_search(section):
+    # What process_standard looked up before scan_section: one search per element.
+    h4 = section.find('h4')
+    return {"h4": h4, "content_divs": section.find_all('div', class_='col-md-6'),
+            "description": section.find('div', style="white-space: pre-wrap;")}
+
+
+def fixture_pages():
+    catalog = synthetic_standards(250, seed=4)
+    pages = [render_page(catalog[page * 100:(page + 1) * 100], page, 3) for page in range(3)]
+    pages.append(pages[0].replace("<footer>", ODD_SECTIONS + "<footer>"))
+    pages.append(render_page([], 0, 1).replace("Page 1 of 1", "No results"))
+    return pages
+
+
+@pytest.mark.parametrize("html", fixture_pages())
+def test_strained_parsing_matches_the_full_page_html_parser(html, monkeypatch):
+    monkeypatch.setattr(webscraperCADOE, "USE_OPENAI", False)
+    strained = webscraperCADOE.extract_ela_standards(webscraperCADOE.parse_standards_page(html))
+    total_pages = webscraperCADOE.parse_total_pages(html)
+
+    full_page = BeautifulSoup(html, 'html.parser')
+    monkeypatch.setattr(webscraperCADOE, "scan_section", scan_section_by_search)
+    assert json.dumps(strained) == json.dumps(webscraperCADOE.extract_ela_standards(full_page))
+    assert total_pages == webscraperCADOE.get_total_pages(full_page)
+
+
+def test_odd_sections_are_skipped_or_categorized(monkeypatch):
+    monkeypatch.setattr(webscraperCADOE, "USE_OPENAI", False)
+    html = render_page([], 0, 1).replace("<footer>", ODD_SECTIONS + "<footer>")
+    template = webscraperCADOE.extract_ela_standards(webscraperCADOE.parse_standards_page(html))
+    assert [category["name"] for category in template["values"]] == ["Grade 8 - Key Ideas"]
+    assert template["values"][0]["Standards"] == [{"id": "RI.8.3", "description": "Analyze how a text\n makes connections."}]
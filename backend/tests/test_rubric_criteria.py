@@ -0,0 +1,43 @@
+import asyncio
+
+import rubric_criteria
+from fake_cde import synthetic_standards
+from rubric_criteria import CriteriaGenerator, CriteriaMemo, memo_key
+
+
+def generate(memo, standards):
+    generator = CriteriaGenerator(memo, concurrency=2, batch_size=4, max_retries=0)
+    return asyncio.run(generator.generate(standards)), generator.stats
+
+
+def test_a_second_run_is_served_from_the_memo(fake_cde, monkeypatch, tmp_path):
+    base_url, stats = fake_cde()
+    monkeypatch.setattr(rubric_criteria, "OPENAI_BASE_URL", base_url.split("/cacs/")[0] + "/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    standards = synthetic_standards(10, seed=1)
+    db_path = str(tmp_path / "criteria_cache.db")
+
+    first, first_stats = generate(CriteriaMemo(db_path), standards + standards[:2])
+    assert first_stats == {"memoized": 0, "generated": 10, "fallback": 0, "prompts": 3}
+    assert stats()["completions"] == 3
+    assert first[10:] == first[:2]
+
+    # A new memo over the same file, as in the next scrape.
+    second, second_stats = generate(CriteriaMemo(db_path), standards)
+    assert second == first[:10]
+    assert second_stats == {"memoized": 10, "generated": 0, "fallback": 0, "prompts": 0}
+    assert stats()["completions"] == 3
+
+
+def test_a_changed_description_is_generated_again(fake_cde, monkeypatch):
+    base_url, stats = fake_cde()
+    monkeypatch.setattr(rubric_criteria, "OPENAI_BASE_URL", base_url.split("/cacs/")[0] + "/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    memo = CriteriaMemo()
+    standard_id, description = synthetic_standards(1)[0]
+    generate(memo, [(standard_id, description)])
+
+    _, run_stats = generate(memo, [(standard_id, description + " Revised.")])
+    assert run_stats["generated"] == 1 and run_stats["memoized"] == 0
+    assert memo.get(memo_key(standard_id, description)) is not None
+    assert stats()["completions"] == 2
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from scraper_http import PageFetcher, ResponseCache, TokenBucket
+from webscraperCADOE import page_url
+
+
+def test_the_token_bucket_paces_acquisitions_after_the_burst():
+    bucket = TokenBucket(rate=50, capacity=2)
+    started = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    # Two from the full bucket, then five more at 50 per second.
+    assert time.monotonic() - started >= 0.09
+
+
+def test_requests_are_spread_at_the_configured_rate(fake_cde):
+    base_url, stats = fake_cde(standards=60)
+    fetcher = PageFetcher(concurrency=4, rate=20, burst=1)
+    started = time.monotonic()
+    pages = fetcher.fetch_all([page_url(base_url, page, 10) for page in range(6)])
+    elapsed = time.monotonic() - started
+    fetcher.close()
+
+    assert all(pages)
+    assert elapsed >= 5 / 20
+    assert stats()["requests_per_second"] <= 20 * 1.2
+
+
+def test_server_errors_are_retried_until_the_page_arrives(fake_cde):
+    base_url, stats = fake_cde(standards=100, fail_rate=0.4, fail_status=500, seed=2)
+    fetcher = PageFetcher(concurrency=2, rate=0, max_retries=20, backoff_base=0.001, backoff_max=0.01)
+    pages = fetcher.fetch_all([page_url(base_url, page, 10) for page in range(10)])
+    fetcher.close()
+
+    server = stats()
+    assert all(page and "Page" in page for page in pages)
+    assert server["failures"] > 0
+    assert fetcher.stats["retries"] == server["failures"]
+    assert fetcher.stats["requests"] == server["requests"] == 10 + server["failures"]
+    assert fetcher.stats["failures"] == 0
+
+
+def test_a_page_that_keeps_failing_is_given_up(fake_cde):
+    base_url, stats = fake_cde(fail_rate=1.0, fail_status=503)
+    fetcher = PageFetcher(concurrency=1, rate=0, max_retries=2)
+    assert fetcher.fetch(page_url(base_url, 0, 10)) is None
+    fetcher.close()
+    assert stats()["requests"] == 3
+    assert fetcher.stats == {"requests": 3, "retries": 2, "failures": 1, "not_modified": 0, "cache_hits": 0}
+
+
+def test_cached_pages_are_revalidated_with_their_etag(fake_cde, tmp_path):
+    base_url, stats = fake_cde(standards=30)
+    urls = [page_url(base_url, page, 10) for page in range(3)]
+    cache = ResponseCache(str(tmp_path / "scrape_cache.db"))
+
+    first = PageFetcher(rate=0, cache=cache)
+    pages = first.fetch_all(urls)
+    first.close()
+    assert cache.get(urls[0])["etag"].startswith('"')
+
+    second = PageFetcher(rate=0, cache=ResponseCache(str(tmp_path / "scrape_cache.db")))
+    assert second.fetch_all(urls) == pages
+    second.close()
+    assert second.stats["not_modified"] == 3
+    assert stats()["not_modified"] == 3
+
+
+def test_offline_replay_serves_the_cache_without_requests(fake_cde, tmp_path):
+    base_url, stats = fake_cde(standards=30)
+    urls = [page_url(base_url, page, 10) for page in range(3)]
+    cache = ResponseCache(str(tmp_path / "scrape_cache.db"))
+    online = PageFetcher(rate=0, cache=cache)
+    pages = online.fetch_all(urls[:2])
+    online.close()
+
+    offline = PageFetcher(rate=0, cache=cache, offline=True)
+    assert offline.fetch_all(urls) == pages + [None]
+    assert offline.stats["cache_hits"] == 2
+    assert offline.stats["failures"] == 1
+    assert offline.stats["requests"] == 0
+    assert stats()["requests"] == 2
+
+    with pytest.raises(ValueError):
+        PageFetcher(offline=True)
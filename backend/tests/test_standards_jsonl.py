@@ -0,0 +1,62 @@
+import json
+
+from standards_jsonl import StandardsJsonlWriter, compact_jsonl
+
+
+def category(page, number):
+    return {"name": f"Page {page} - Category {number}", "Criteria": [{"points": 1, "description": "Meets – ok"}]}
+
+
+def write_pages(path, pages, total_pages=3):
+    writer = StandardsJsonlWriter(str(path))
+    for page in pages:
+        writer.write_page(page, total_pages, [category(page, 0), category(page, 1)])
+    writer.close()
+
+
+def test_a_torn_page_is_cut_off_and_the_run_resumes(tmp_path):
+    path = tmp_path / "standards.jsonl"
+    write_pages(path, [0, 1])
+    complete = path.read_bytes()
+    # Killed partway through page 2: one category written, the next one torn.
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "category", "page": 2, **category(2, 0)}) + "\n")
+        f.write('{"type": "category", "page": 2, "na')
+
+    writer = StandardsJsonlWriter(str(path))
+    assert writer.completed_pages == {0, 1}
+    assert writer.total_pages == 3
+    assert path.read_bytes() == complete
+
+    writer.write_page(2, 3, [category(2, 0), category(2, 1)])
+    writer.close()
+    assert StandardsJsonlWriter(str(path)).completed_pages == {0, 1, 2}
+
+
+def test_a_missing_file_starts_empty(tmp_path):
+    writer = StandardsJsonlWriter(str(tmp_path / "standards.jsonl"))
+    assert writer.completed_pages == set()
+    assert writer.total_pages is None
+    writer.close()
+
+
+def test_compact_orders_pages_and_matches_json_dump(tmp_path):
+    path = tmp_path / "standards.jsonl"
+    output = tmp_path / "standards.json"
+    write_pages(path, [2, 0, 1])
+
+    assert compact_jsonl(str(path), str(output), "Template") == 6
+    expected = {"Template": "Template", "values": [category(page, n) for page in range(3) for n in range(2)]}
+    assert output.read_text(encoding="utf-8") == json.dumps(expected, indent=2, ensure_ascii=False)
+    assert not (tmp_path / "standards.json.tmp").exists()
+
+
+def test_compact_of_no_categories(tmp_path):
+    path = tmp_path / "standards.jsonl"
+    output = tmp_path / "standards.json"
+    writer = StandardsJsonlWriter(str(path))
+    writer.write_page(0, 1, [])
+    writer.close()
+
+    assert compact_jsonl(str(path), str(output), "Template") == 0
+    assert json.loads(output.read_text(encoding="utf-8")) == {"Template": "Template", "values": []}
@@ -1,15 +1,20 @@
-import requests
 from bs4 import BeautifulSoup
 import logging
 from typing import Optional, List, Dict
+from scraper_http import PageFetcher, make_fetcher
 
-def scrape_website(url: str, headers: Optional[Dict[str, str]] = None) -> Optional[BeautifulSoup]:
+def scrape_website(url: str, headers: Optional[Dict[str, str]] = None,
+                   fetcher: Optional[PageFetcher] = None) -> Optional[BeautifulSoup]:
     """
     Scrapes a website and returns its HTML content as a BeautifulSoup object.
     
+    The page goes through the on-disk response cache, so an unchanged page
+    costs a 304, and SCRAPE_OFFLINE=true parses the cached copy only.
+    
     Args:
         url (str): The URL of the website to scrape
         headers (dict, optional): Custom headers for the HTTP request
+        fetcher (PageFetcher, optional): Fetcher to use instead of one built from the SCRAPE_* settings
         
     Returns:
         BeautifulSoup: Parsed HTML content, or None if the request fails
@@ -22,18 +27,22 @@ def scrape_website(url: str, headers: Optional[Dict[str, str]] = None) -> Option
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
     
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = make_fetcher(headers)
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        logger.info(f"Successfully scraped {url}")
-        
-        return soup
-        
-    except requests.RequestException as e:
-        logger.error(f"Error scraping {url}: {str(e)}")
+        html = fetcher.fetch(url)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+    if html is None:
+        logger.error(f"Error scraping {url}")
         return None
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    logger.info(f"Successfully scraped {url}")
+    
+    return soup
 
 def extract_ela_standards(soup: BeautifulSoup) -> List[Dict]:
     """
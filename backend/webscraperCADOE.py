@@ -1,13 +1,14 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 import logging
 import json
-import time
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Set, Tuple
 import openai
 import os
-from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import importlib.util
+from scraper_http import PageFetcher, make_fetcher
+from standards_jsonl import StandardsJsonlWriter, compact_jsonl
+from rubric_criteria import CRITERIA_CACHE_DB, CriteriaGenerator, CriteriaMemo, fallback_criteria
 
 # Configure logging
 logging.basicConfig(
@@ -18,7 +19,30 @@ logger = logging.getLogger(__name__)
 
 # Configure OpenAI
 openai.api_key = os.getenv('OPENAI_API_KEY')
-USE_OPENAI = False  # Set to True when you want to use OpenAI for generating criteria
+# Set USE_OPENAI=true to have OpenAI write criteria for each standard (see rubric_criteria.py)
+USE_OPENAI = os.getenv('USE_OPENAI', 'false').lower() == 'true'
+
+# Work file the scrape is streamed to; kept after an incomplete run so the next one resumes
+SCRAPE_JSONL = os.getenv('SCRAPE_JSONL', 'ela_standards.jsonl')
+
+_criteria_generator = None
+
+def get_criteria_generator() -> CriteriaGenerator:
+    global _criteria_generator
+    if _criteria_generator is None:
+        _criteria_generator = CriteriaGenerator(CriteriaMemo(CRITERIA_CACHE_DB or None))
+    return _criteria_generator
+
+async def generate_criteria(standards: List[Tuple[str, str]]) -> List[List[Dict]]:
+    """
+    Rubric criteria for each (standard_id, description), in order. With
+    OpenAI enabled, standards are batched into a few concurrent prompts and
+    results are memoized; otherwise every standard gets the basic scoring
+    levels.
+    """
+    if not USE_OPENAI or not openai.api_key:
+        return [fallback_criteria(standard_id, description) for standard_id, description in standards]
+    return await get_criteria_generator().generate(standards)
 
 async def generate_rubric_criteria(standard_id: str, description: str) -> List[Dict]:
     """
@@ -34,93 +58,77 @@ async def generate_rubric_criteria(standard_id: str, description: str) -> List[D
     """
     if not USE_OPENAI or not openai.api_key:
         logger.info(f"Using fallback criteria for {standard_id} (OpenAI not configured)")
-        return [
-            {
-                "point": 5,
-                "description": f"Exceeds the standard - {standard_id}: Demonstrates exceptional mastery of {description}"
-            },
-            {
-                "point": 4,
-                "description": f"Meets the standard - {standard_id}: Demonstrates proficient understanding of {description}"
-            },
-            {
-                "point": 3,
-                "description": f"Approaching the standard - {standard_id}: Shows basic understanding of {description}"
-            },
-            {
-                "point": 2,
-                "description": f"Partially meets the standard - {standard_id}: Shows limited understanding of {description}"
-            },
-            {
-                "point": 1,
-                "description": f"Does not meet the standard - {standard_id}: Shows minimal understanding of {description}"
-            }
-        ]
-
-    try:
-        logger.info(f"Generating rubric criteria for standard {standard_id}")
-        prompt = f"""
-        Create a 5-point scoring rubric for the following educational standard:
-        Standard ID: {standard_id}
-        Description: {description}
-
-        Format the rubric criteria as a JSON array with 5 objects, where each object has:
-        - "point": score from 5 (highest) to 1 (lowest)
-        - "description": detailed description of what performance at this level looks like
-
-        The descriptions should:
-        - Be specific to this standard's content
-        - Show clear progression between levels
-        - Include concrete examples or indicators
-        - Use educational assessment language
-        """
-
-        response = await openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert in educational assessment and rubric design."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-
-        criteria = json.loads(response.choices[0].message.content)
-        logger.info(f"Successfully generated criteria for {standard_id}")
-        return criteria
+    return (await generate_criteria([(standard_id, description)]))[0]
 
-    except Exception as e:
-        logger.error(f"Error generating rubric criteria for {standard_id}: {str(e)}")
-        return generate_rubric_criteria(standard_id, description)  # Use fallback criteria
-
-def scrape_website(url: str, headers: Optional[Dict[str, str]] = None) -> Optional[BeautifulSoup]:
+def scrape_website(url: str, headers: Optional[Dict[str, str]] = None,
+                   fetcher: Optional[PageFetcher] = None) -> Optional[BeautifulSoup]:
     """
     Scrapes a website and returns its HTML content as a BeautifulSoup object.
     
+    The page goes through the same fetcher as the full scrape, so it shares
+    its rate limit, retries and response cache.
+    
     Args:
         url (str): The URL of the website to scrape
         headers (dict, optional): Custom headers for the HTTP request
+        fetcher (PageFetcher, optional): Fetcher to use instead of one built from the SCRAPE_* settings
         
     Returns:
         BeautifulSoup: Parsed HTML content, or None if the request fails
     """
-    if headers is None:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-    
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = make_fetcher(headers)
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        logger.info(f"Successfully scraped {url}")
-        
-        return soup
-        
-    except requests.RequestException as e:
-        logger.error(f"Error scraping {url}: {str(e)}")
+        html = fetcher.fetch(url)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+    if html is None:
+        logger.error(f"Error scraping {url}")
         return None
+    
+    soup = BeautifulSoup(html, HTML_PARSER)
+    logger.info(f"Successfully scraped {url}")
+    
+    return soup
+
+# lxml builds trees several times faster than the pure Python html.parser
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+# Only these parts of a results page are turned into a tree; the navigation,
+# scripts and footer around them are skipped while parsing
+STANDARD_SECTIONS = SoupStrainer('div', attrs={'style': "padding-left:3px; padding-right:3px;"})
+PAGINATION = SoupStrainer('div', class_='col-md-4 text-right')
+
+def parse_standards_page(html: str) -> BeautifulSoup:
+    """
+    Parses just the standard sections of a results page, which is all
+    extract_ela_standards reads.
+    """
+    return BeautifulSoup(html, HTML_PARSER, parse_only=STANDARD_SECTIONS)
+
+def parse_total_pages(html: str) -> int:
+    return get_total_pages(BeautifulSoup(html, HTML_PARSER, parse_only=PAGINATION))
+
+def scan_section(section: Tag) -> Dict:
+    """
+    Collects the elements of a standard section that process_standard reads
+    (first h4, the col-md-6 divs, the first pre-wrap div) in one walk over
+    the section, rather than one full search per element.
+    """
+    found = {"h4": None, "content_divs": [], "description": None}
+    for element in section.descendants:
+        if not isinstance(element, Tag):
+            continue
+        if element.name == 'h4':
+            if found["h4"] is None:
+                found["h4"] = element
+        elif element.name == 'div':
+            if 'col-md-6' in element.get('class', ()):
+                found["content_divs"].append(element)
+            if found["description"] is None and element.get('style') == "white-space: pre-wrap;":
+                found["description"] = element
+    return found
 
 def extract_grade_from_id(standard_id: str) -> str:
     """
@@ -154,8 +162,10 @@ def extract_ela_standards(soup: BeautifulSoup) -> Dict:
 
     async def process_standard(section):
         try:
+            parts = scan_section(section)
+
             # Extract standard identifier
-            standard_id_elem = section.find('h4').find('a')
+            standard_id_elem = parts["h4"].find('a')
             if not standard_id_elem:
                 logger.warning("No standard identifier found")
                 return None
@@ -169,7 +179,7 @@ def extract_ela_standards(soup: BeautifulSoup) -> Dict:
                 return None
 
             # Extract content area and category
-            content_divs = section.find_all('div', class_='col-md-6')
+            content_divs = parts["content_divs"]
             content_area = ""
             category = ""
             
@@ -199,7 +209,7 @@ def extract_ela_standards(soup: BeautifulSoup) -> Dict:
                 return None
 
             # Extract the standard description
-            desc_div = section.find('div', style="white-space: pre-wrap;")
+            desc_div = parts["description"]
             if not desc_div:
                 logger.warning(f"No description found for standard {standard_id}")
                 return None
@@ -213,41 +223,11 @@ def extract_ela_standards(soup: BeautifulSoup) -> Dict:
             if category_key not in categories:
                 categories[category_key] = {
                     "name": category_key,
-                    "Criteria": []
+                    "Criteria": [],
+                    "Standards": []
                 }
 
-            # For testing purposes, use fallback criteria instead of OpenAI
-            criteria = [
-                {
-                    "point": 5,
-                    "description": f"Exceeds the standard - {standard_id}: Demonstrates exceptional mastery of {description}"
-                },
-                {
-                    "point": 4,
-                    "description": f"Meets the standard - {standard_id}: Demonstrates proficient understanding of {description}"
-                },
-                {
-                    "point": 3,
-                    "description": f"Approaching the standard - {standard_id}: Shows basic understanding of {description}"
-                },
-                {
-                    "point": 2,
-                    "description": f"Partially meets the standard - {standard_id}: Shows limited understanding of {description}"
-                },
-                {
-                    "point": 1,
-                    "description": f"Does not meet the standard - {standard_id}: Shows minimal understanding of {description}"
-                }
-            ]
-            
-            # Uncomment this section when ready to use OpenAI
-            # criteria = await generate_rubric_criteria(standard_id, description)
-            
-            if criteria:
-                categories[category_key]["Criteria"].extend(criteria)
-                logger.info(f"Added criteria for standard {standard_id} to {category_key}")
-            else:
-                logger.error(f"Failed to generate criteria for standard {standard_id}")
+            return category_key, standard_id, description
 
         except Exception as e:
             logger.error(f"Error processing standard: {str(e)}")
@@ -257,7 +237,20 @@ def extract_ela_standards(soup: BeautifulSoup) -> Dict:
     async def process_all_standards():
         try:
             tasks = [process_standard(section) for section in standard_sections]
-            await asyncio.gather(*[task for task in tasks if task is not None])
+            found = [standard for standard in await asyncio.gather(*tasks) if standard is not None]
+
+            # Criteria for the whole page in one stage, so OpenAI prompts can
+            # be batched and run concurrently
+            criteria_lists = await generate_criteria([(standard_id, description)
+                                                      for _, standard_id, description in found])
+            for (category_key, standard_id, description), criteria in zip(found, criteria_lists):
+                # Kept next to the criteria so the Python server can index standards by ID
+                categories[category_key]["Standards"].append({"id": standard_id, "description": description})
+                if criteria:
+                    categories[category_key]["Criteria"].extend(criteria)
+                    logger.info(f"Added criteria for standard {standard_id} to {category_key}")
+                else:
+                    logger.error(f"Failed to generate criteria for standard {standard_id}")
             logger.info(f"Processed {len(categories)} categories")
         except Exception as e:
             logger.error(f"Error in process_all_standards: {str(e)}")
@@ -300,55 +293,110 @@ def get_total_pages(soup: BeautifulSoup) -> int:
     # Default to 1 page if we can't determine the total
     return 1
 
-def scrape_all_pages(base_url: str, per_page: int = 100) -> Dict:
+def page_url(base_url: str, page: int, per_page: int) -> str:
+    return f"{base_url}&page={page}&perpage={per_page}"
+
+def iter_page_templates(base_url: str, per_page: int, fetcher: PageFetcher, done_pages: Set[int] = frozenset(),
+                        total_pages: Optional[int] = None) -> Iterator[Tuple[int, int, Optional[Dict]]]:
+    """
+    Scrapes every page not in done_pages and yields (page, total_pages,
+    template) in page order, with template None for pages that failed.
+    
+    The first page gives the page count (unless total_pages is already known
+    and the first page is done); the rest are fetched concurrently through a
+    rate-limited PageFetcher, each page being parsed while the following ones
+    are still downloading. Pages that have not changed since the last run are
+    served from the response cache, and with SCRAPE_OFFLINE=true only cached
+    pages are parsed.
+    """
+    html = None
+    if total_pages is None or 0 not in done_pages:
+        html = fetcher.fetch(page_url(base_url, 0, per_page))
+        if not html and total_pages is None:
+            logger.error("Failed to scrape the first page. Exiting.")
+            return
+        if html:
+            total_pages = parse_total_pages(html)
+    logger.info(f"Found {total_pages} total pages to scrape")
+    
+    # Start downloading the rest before parsing the first one
+    remaining = [page for page in range(1, total_pages) if page not in done_pages]
+    pages = fetcher.iter_fetch([page_url(base_url, page, per_page) for page in remaining])
+    
+    if 0 not in done_pages:
+        yield 0, total_pages, extract_ela_standards(parse_standards_page(html)) if html else None
+    
+    # Pages arrive in page order as soon as they (and the ones before them)
+    # are downloaded; the fetch workers keep going while each one is parsed
+    for page, html in zip(remaining, pages):
+        yield page, total_pages, extract_ela_standards(parse_standards_page(html)) if html else None
+    
+    logger.info(f"Fetch stats: {fetcher.stats}")
+    if _criteria_generator is not None:
+        logger.info(f"Criteria stats: {_criteria_generator.stats}")
+
+def scrape_all_pages(base_url: str, per_page: int = 100, fetcher: Optional[PageFetcher] = None) -> Dict:
     """
-    Scrapes all pages of standards and combines the results.
+    Scrapes all pages of standards and combines the results in memory.
     
     Args:
         base_url (str): Base URL for the first page
         per_page (int): Number of items per page
+        fetcher (PageFetcher, optional): Fetcher to use instead of one built from the SCRAPE_* settings
     
     Returns:
         Dict: Combined standards in rubric template format
     """
-    template = None
-    page = 0
-    
-    # Scrape the first page
-    first_url = f"{base_url}&page={page}&perpage={per_page}"
-    soup = scrape_website(first_url)
-    
-    if not soup:
-        logger.error("Failed to scrape the first page. Exiting.")
-        return {"Template": "California ELA Standards", "values": []}
-    
-    # Get standards from the first page
-    template = extract_ela_standards(soup)
-    logger.info(f"Scraped page {page+1}")
-    
-    # Get total number of pages
-    total_pages = get_total_pages(soup)
-    logger.info(f"Found {total_pages} total pages to scrape")
+    template = {"Template": "California ELA Standards", "values": []}
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = make_fetcher()
+    try:
+        for page, _, page_template in iter_page_templates(base_url, per_page, fetcher):
+            if page_template:
+                # Merge the values from this page into the main template
+                template["values"].extend(page_template["values"])
+                logger.info(f"Scraped page {page+1}")
+            else:
+                logger.error(f"Failed to scrape page {page+1}")
+    finally:
+        if own_fetcher:
+            fetcher.close()
+    return template
+
+def scrape_to_jsonl(base_url: str, jsonl_path: str, per_page: int = 100,
+                    fetcher: Optional[PageFetcher] = None) -> Tuple[int, Optional[int]]:
+    """
+    Scrapes all pages of standards, appending each page's categories to
+    jsonl_path as soon as it is parsed. Pages already completed in
+    jsonl_path by an earlier, interrupted run are skipped.
     
-    # Scrape remaining pages
-    for page in range(1, total_pages):
-        # Construct URL for this page
-        page_url = f"{base_url}&page={page}&perpage={per_page}"
-        
-        # Add a short delay to be respectful to the server
-        time.sleep(1)
-        
-        # Scrape the page
-        soup = scrape_website(page_url)
-        if soup:
-            page_template = extract_ela_standards(soup)
-            # Merge the values from this page into the main template
-            template["values"].extend(page_template["values"])
-            logger.info(f"Scraped page {page+1}")
-        else:
-            logger.error(f"Failed to scrape page {page+1}")
+    Args:
+        base_url (str): Base URL for the first page
+        jsonl_path (str): JSONL file to append to (see StandardsJsonlWriter)
+        per_page (int): Number of items per page
+        fetcher (PageFetcher, optional): Fetcher to use instead of one built from the SCRAPE_* settings
     
-    return template
+    Returns:
+        Tuple[int, Optional[int]]: Pages completed so far and the total number of pages (None if unknown)
+    """
+    writer = StandardsJsonlWriter(jsonl_path)
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = make_fetcher()
+    try:
+        for page, total_pages, page_template in iter_page_templates(
+                base_url, per_page, fetcher, frozenset(writer.completed_pages), writer.total_pages):
+            if page_template:
+                writer.write_page(page, total_pages, page_template["values"])
+                logger.info(f"Scraped page {page+1}")
+            else:
+                logger.error(f"Failed to scrape page {page+1}")
+    finally:
+        writer.close()
+        if own_fetcher:
+            fetcher.close()
+    return len(writer.completed_pages), writer.total_pages
 
 def save_to_json(standards: Dict, output_file: str = "ela_standards.json") -> None:
     """
@@ -371,7 +419,7 @@ if __name__ == "__main__":
         if USE_OPENAI:
             if not openai.api_key:
                 logger.warning("OpenAI API key not found. Using fallback criteria generation.")
-                logger.warning("To use OpenAI, set the OPENAI_API_KEY environment variable and USE_OPENAI=True")
+                logger.warning("To use OpenAI, set the OPENAI_API_KEY environment variable and USE_OPENAI=true")
             else:
                 logger.info("OpenAI integration enabled")
         else:
@@ -380,15 +428,22 @@ if __name__ == "__main__":
         # Base URL without page and perpage parameters
         base_url = "https://www2.cde.ca.gov/cacs/ela?order=0&page=0&perpage=100&mingrade=0&maxgrade=12&dl=0"
         
-        # Scrape all pages
+        # Scrape all pages, streaming them to the JSONL work file (and
+        # resuming from it if an earlier run was interrupted)
         logger.info("Starting scraping process")
-        all_standards = scrape_all_pages(base_url)
+        completed_pages, total_pages = scrape_to_jsonl(base_url, SCRAPE_JSONL)
         
-        # Save to JSON file
-        if all_standards and all_standards["values"]:
-            save_to_json(all_standards)
-            print(f"\nScraping complete! Found {len(all_standards['values'])} categories.")
+        # Compact into the rubric template JSON file
+        categories = compact_jsonl(SCRAPE_JSONL, "ela_standards.json") if completed_pages else 0
+        if categories:
+            logger.info(f"Successfully saved rubric template with {categories} categories to ela_standards.json")
+            print(f"\nScraping complete! Found {categories} categories.")
             print(f"Results saved to ela_standards.json")
+            if completed_pages == total_pages:
+                # Done; the next run starts a fresh scrape
+                os.remove(SCRAPE_JSONL)
+            else:
+                print(f"{total_pages - completed_pages} pages failed; run again to retry just those.")
         else:
             logger.error("No standards were collected or processing failed")
             print("\nError: No standards were collected. Check the logs for details.")